@@ -0,0 +1,76 @@
+"""Measures memory used by symbol prices and specifications kept in terminal states with and without compact
+records.
+
+Run from the repository root:
+
+    python -m benchmarks.compactRecordsMemory [accounts] [symbols]
+"""
+from lib.metaApi.terminalState import TerminalState
+from lib.metaApi.compactModels import CompactSymbolPrice, CompactSymbolSpecification
+import asyncio
+import gc
+import json
+import sys
+import tracemalloc
+
+PRICE = json.dumps({
+    'symbol': 'EURUSD', 'bid': 1.18873, 'ask': 1.18877, 'profitTickValue': 1, 'lossTickValue': 1,
+    'accountCurrencyExchangeRate': 1, 'time': '2020-04-15T02:45:06.521Z', 'brokerTime': '2020-04-15 05:45:06.521'
+})
+SPECIFICATION = json.dumps({
+    'symbol': 'EURUSD', 'tickSize': 0.00001, 'minVolume': 0.01, 'maxVolume': 200, 'volumeStep': 0.01,
+    'fillingModes': ['SYMBOL_FILLING_FOK'], 'executionMode': 'SYMBOL_TRADE_EXECUTION_INSTANT',
+    'contractSize': 100000, 'quoteSessions': {'MONDAY': [{'from': '00:00:00.000', 'to': '23:58:59.999'}]},
+    'tradeSessions': {'MONDAY': [{'from': '00:00:00.000', 'to': '23:58:59.999'}]},
+    'tradeMode': 'SYMBOL_TRADE_MODE_FULL', 'initialMargin': 0, 'maintenanceMargin': 0, 'hedgedMargin': 50000,
+    'hedgedMarginUsesLargerLeg': False, 'marginCurrency': 'EUR', 'priceCalculationMode': 'SYMBOL_CALC_MODE_FOREX',
+    'baseCurrency': 'EUR', 'profitCurrency': 'USD', 'swapMode': 'SYMBOL_SWAP_MODE_POINTS', 'swapLong': -6.5,
+    'swapShort': 1.14, 'swapRollover3Days': 'WEDNESDAY',
+    'allowedExpirationModes': ['SYMBOL_EXPIRATION_GTC', 'SYMBOL_EXPIRATION_DAY'],
+    'allowedOrderTypes': ['SYMBOL_ORDER_MARKET', 'SYMBOL_ORDER_LIMIT', 'SYMBOL_ORDER_STOP'],
+    'orderGTCMode': 'SYMBOL_ORDERS_GTC', 'digits': 5, 'path': 'Forex\\EURUSD', 'description': 'Euro vs US Dollar'
+})
+
+
+async def fill_states(accounts: int, symbols: int, compact: bool) -> list:
+    states = []
+    for i in range(accounts):
+        state = TerminalState()
+        for j in range(symbols):
+            symbol = f'SYMBOL{j}'
+            specification = json.loads(SPECIFICATION)
+            specification['symbol'] = symbol
+            price = json.loads(PRICE)
+            price['symbol'] = symbol
+            if compact:
+                specification = CompactSymbolSpecification.from_dict(specification)
+                price = CompactSymbolPrice.from_dict(price)
+            await state.on_symbol_specification_updated(specification)
+            await state.on_symbol_price_updated(price)
+        states.append(state)
+    return states
+
+
+def measure(accounts: int, symbols: int, compact: bool) -> int:
+    gc.collect()
+    tracemalloc.start()
+    states = asyncio.run(fill_states(accounts, symbols, compact))
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del states
+    return size
+
+
+def main():
+    accounts = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    symbols = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    dict_size = measure(accounts, symbols, False)
+    compact_size = measure(accounts, symbols, True)
+    print(f'{accounts} accounts x {symbols} symbols')
+    print(f'dict records:    {dict_size / 2 ** 20:8.1f} MiB')
+    print(f'compact records: {compact_size / 2 ** 20:8.1f} MiB ({compact_size / dict_size:.0%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Measures time MemoryHistoryStorage takes to synchronize shuffled deals.
+
+Run from the repository root:
+
+    python -m benchmarks.historyStorageSync [deals]
+"""
+from lib.metaApi.memoryHistoryStorage import MemoryHistoryStorage
+from lib.metaApi.models import format_date
+from datetime import datetime, timedelta
+import asyncio
+import pytz
+import random
+import sys
+import time
+
+
+def generate_deals(count: int) -> list:
+    start = datetime(2020, 1, 1, tzinfo=pytz.UTC)
+    deals = []
+    for i in range(count):
+        deals.append({
+            'id': str(1000000 + i), 'type': 'DEAL_TYPE_BUY', 'entryType': 'DEAL_ENTRY_IN', 'symbol': 'EURUSD',
+            'magic': 0, 'time': format_date(start + timedelta(seconds=i * 30)), 'volume': 0.01, 'price': 1.1,
+            'commission': 0, 'swap': 0, 'profit': 0, 'positionId': str(1000000 + i), 'platform': 'mt5'
+        })
+    return deals
+
+
+async def synchronize(deals: list) -> float:
+    storage = MemoryHistoryStorage('benchmark')
+    storage._fileManager.stop_update_job()
+    started_at = time.perf_counter()
+    for deal in deals:
+        await storage.on_deal_added(deal)
+    elapsed = time.perf_counter() - started_at
+    assert len(storage.deals) == len(deals)
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    deals = generate_deals(count)
+    print(f'in order: {asyncio.run(synchronize(deals)):8.2f} s for {count} deals')
+    random.seed(0)
+    random.shuffle(deals)
+    print(f'shuffled: {asyncio.run(synchronize(deals)):8.2f} s for {count} deals')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,13 @@
 from .metaApi.metaApi import MetaApi
 from .metaApi.historyStorage import HistoryStorage
 from .metaApi.memoryHistoryStorage import MemoryHistoryStorage
+from .metaApi.sqliteHistoryStorage import SqliteHistoryStorage
+from .metaApi.historyDirectory import HistoryDirectory
 from .clients.metaApi.synchronizationListener import SynchronizationListener
+from .metaApi.barAggregator import BarAggregator
+from .metaApi.barListener import BarListener
 from .copyFactory.copyFactory import CopyFactory
+from .clients.retryPolicy import RetryPolicy
+from .clients.requestListener import RequestListener
+from .clients.rateLimiter import RateLimiter
+from .clients.responseCache import ResponseCache
@@ -2,8 +2,6 @@ from ..httpClient import HttpClient
 from .configuration_client import ConfigurationClient
 from ...metaApi.models import date
 import pytest
-import responses
-import json
 from mock import AsyncMock
 from copy import deepcopy
 
@@ -40,18 +38,16 @@ class TestConfigurationClient:
                 }
             ]
         }
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.PUT, f'{copy_factory_api_url}/users/current/configuration/accounts/' +
-                                    '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef',
-                     json=account, status=200)
-
-            await copy_factory_client.update_account('0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef',
-                                                     account)
-            assert rsps.calls[0].request.url == f'{copy_factory_api_url}/users/current/configuration/accounts/' + \
-                                                '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef'
-            assert rsps.calls[0].request.method == 'PUT'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert rsps.calls[0].request.body == json.dumps(account).encode('utf-8')
+        http_client.request = AsyncMock(return_value=account)
+        await copy_factory_client.update_account('0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef',
+                                                 account)
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/configuration/accounts/' +
+                   '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef',
+            'method': 'PUT',
+            'headers': {'auth-token': 'header.payload.sign'},
+            'body': account
+        })
 
     @pytest.mark.asyncio
     async def test_not_update_copyfactory_account_with_account_token(self):
@@ -80,14 +76,14 @@ class TestConfigurationClient:
             }
           ]
         }]
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.GET, f'{copy_factory_api_url}/users/current/configuration/accounts',
-                     json=expected, status=200)
-            accounts = await copy_factory_client.get_accounts()
-            assert rsps.calls[0].request.url == f'{copy_factory_api_url}/users/current/configuration/accounts'
-            assert rsps.calls[0].request.method == 'GET'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert accounts == expected
+        http_client.request = AsyncMock(return_value=expected)
+        accounts = await copy_factory_client.get_accounts()
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/configuration/accounts',
+            'method': 'GET',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
+        assert accounts == expected
 
     @pytest.mark.asyncio
     async def test_not_retrieve_copyfactory_accounts_with_account_token(self):
@@ -103,15 +99,15 @@ class TestConfigurationClient:
     @pytest.mark.asyncio
     async def test_remove_copyfactory_account(self):
         """Should remove CopyFactory account via API."""
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.DELETE, f'{copy_factory_api_url}/users/current/configuration/accounts/' +
-                     '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef', status=204)
-            await copy_factory_client\
-                .remove_account('0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef')
-            assert rsps.calls[0].request.url == f'{copy_factory_api_url}/users/current/configuration/accounts/' + \
-                   '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef'
-            assert rsps.calls[0].request.method == 'DELETE'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
+        http_client.request = AsyncMock(return_value=None)
+        await copy_factory_client\
+            .remove_account('0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef')
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/configuration/accounts/' +
+                   '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef',
+            'method': 'DELETE',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
 
     @pytest.mark.asyncio
     async def test_not_remove_copyfactory_account_with_account_token(self):
@@ -130,14 +126,14 @@ class TestConfigurationClient:
         expected = {
             'id': 'ABCD'
         }
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.GET, f'{copy_factory_api_url}/users/current/configuration/unused-strategy-id',
-                     json=expected, status=200)
-            id = await copy_factory_client.generate_strategy_id()
-            assert rsps.calls[0].request.url == f'{copy_factory_api_url}/users/current/configuration/unused-strategy-id'
-            assert rsps.calls[0].request.method == 'GET'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert id == expected
+        http_client.request = AsyncMock(return_value=expected)
+        id = await copy_factory_client.generate_strategy_id()
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/configuration/unused-strategy-id',
+            'method': 'GET',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
+        assert id == expected
 
     @pytest.mark.asyncio
     async def test_not_generate_strategy_id_with_account_token(self):
@@ -167,15 +163,14 @@ class TestConfigurationClient:
                 'openingIntervalInMinutes': 5
             }
         }
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.PUT, f'{copy_factory_api_url}/users/current/configuration/strategies/ABCD',
-                     json=strategy, status=200)
-
-            await copy_factory_client.update_strategy('ABCD', strategy)
-            assert rsps.calls[0].request.url == f'{copy_factory_api_url}/users/current/configuration/strategies/ABCD'
-            assert rsps.calls[0].request.method == 'PUT'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert rsps.calls[0].request.body == json.dumps(strategy).encode('utf-8')
+        http_client.request = AsyncMock(return_value=strategy)
+        await copy_factory_client.update_strategy('ABCD', strategy)
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/configuration/strategies/ABCD',
+            'method': 'PUT',
+            'headers': {'auth-token': 'header.payload.sign'},
+            'body': strategy
+        })
 
     @pytest.mark.asyncio
     async def test_not_update_strategy_with_account_token(self):
@@ -208,14 +203,14 @@ class TestConfigurationClient:
             'openingIntervalInMinutes': 5
           }
         }]
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.GET, f'{copy_factory_api_url}/users/current/configuration/strategies',
-                     json=expected, status=200)
-            strategies = await copy_factory_client.get_strategies()
-            assert rsps.calls[0].request.url == f'{copy_factory_api_url}/users/current/configuration/strategies'
-            assert rsps.calls[0].request.method == 'GET'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert strategies == expected
+        http_client.request = AsyncMock(return_value=expected)
+        strategies = await copy_factory_client.get_strategies()
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/configuration/strategies',
+            'method': 'GET',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
+        assert strategies == expected
 
     @pytest.mark.asyncio
     async def test_not_retrieve_strategies_with_account_token(self):
@@ -231,13 +226,13 @@ class TestConfigurationClient:
     @pytest.mark.asyncio
     async def test_remove_strategy(self):
         """Should remove strategy via API."""
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.DELETE, f'{copy_factory_api_url}/users/current/configuration/strategies/ABCD',
-                     status=204)
-            await copy_factory_client.remove_strategy('ABCD')
-            assert rsps.calls[0].request.url == f'{copy_factory_api_url}/users/current/configuration/strategies/ABCD'
-            assert rsps.calls[0].request.method == 'DELETE'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
+        http_client.request = AsyncMock(return_value=None)
+        await copy_factory_client.remove_strategy('ABCD')
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/configuration/strategies/ABCD',
+            'method': 'DELETE',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
 
     @pytest.mark.asyncio
     async def test_not_remove_strategy_with_account_token(self):
@@ -265,15 +260,15 @@ class TestConfigurationClient:
             'createdAt': date('2020-08-25T00:00:00.000Z'),
             'status': 'EXECUTING'
         }]
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.GET, f'{copy_factory_api_url}/users/current/configuration/connections/' +
-                     'accountId/active-resynchronization-tasks', json=result, status=200)
-            strategies = await copy_factory_client.get_active_resynchronization_tasks('accountId')
-            assert rsps.calls[0].request.url == f'{copy_factory_api_url}/users/current/configuration/connections/' + \
-                'accountId/active-resynchronization-tasks'
-            assert rsps.calls[0].request.method == 'GET'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert strategies == expected
+        http_client.request = AsyncMock(return_value=result)
+        strategies = await copy_factory_client.get_active_resynchronization_tasks('accountId')
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/configuration/connections/' +
+                   'accountId/active-resynchronization-tasks',
+            'method': 'GET',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
+        assert strategies == expected
 
     @pytest.mark.asyncio
     async def test_not_retrieve_resync_tasks_with_account_token(self):
@@ -1,9 +1,12 @@
 from ..metaApi_client import MetaApiClient
 from ...metaApi.models import date, format_date
 from .copyFactory_models import CopyFactoryTransaction, CopyFactoryStrategyIdAndName, CopyFactorySubscriberOrProvider
-from datetime import datetime
-from typing import List
+from ..errorHandler import ValidationException
+from datetime import datetime, timedelta
+from typing import List, AsyncIterator, Tuple
 from requests import Response
+from itertools import chain
+import asyncio
 
 
 class HistoryClient(MetaApiClient):
@@ -126,15 +129,8 @@ class HistoryClient(MetaApiClient):
             qs['offset'] = offset
         if limit:
             qs['limit'] = limit
-        opts = {
-          'url': f'{self._host}/users/current/provided-strategies/transactions',
-          'method': 'GET',
-          'headers': {
-            'auth-token': self._token
-          },
-          'params': qs
-        }
-        transactions = await self._httpClient.request(opts)
+        url = f'{self._host}/users/current/provided-strategies/transactions'
+        transactions = await self._request_transactions(url, qs)
         for transaction in transactions:
             transaction['time'] = date(transaction['time'])
         return transactions
@@ -172,15 +168,249 @@ class HistoryClient(MetaApiClient):
             qs['offset'] = offset
         if limit:
             qs['limit'] = limit
+        url = f'{self._host}/users/current/strategies-subscribed/transactions'
+        transactions = await self._request_transactions(url, qs)
+        for transaction in transactions:
+            transaction['time'] = date(transaction['time'])
+        return transactions
+
+    def iterate_provided_strategies_transactions(self, time_from: datetime, time_till: datetime,
+                                                 strategy_ids: List[str] = None, subscriber_ids: List[str] = None,
+                                                 page_size: int = 1000) -> AsyncIterator[CopyFactoryTransaction]:
+        """Iterates over transactions on the strategies the current user provides to other users, loading them page
+        by page. The next page is loaded while the current one is processed.
+
+        Args:
+            time_from: Time to load transactions from.
+            time_till: Time to load transactions till.
+            strategy_ids: Optional list of strategy ids to filter transactions by.
+            subscriber_ids: Optional list of subscribers to filter transactions by.
+            page_size: Number of transactions to load per request, default is 1000.
+
+        Returns:
+            An async iterator over transactions found.
+        """
+        if self._is_not_jwt_token():
+            return self._handle_no_access_exception('iterate_provided_strategies_transactions')
+        qs = {
+            'from': format_date(time_from),
+            'till': format_date(time_till)
+        }
+        if strategy_ids:
+            qs['strategyId'] = strategy_ids
+        if subscriber_ids:
+            qs['subscriberId'] = subscriber_ids
+        return self._iterate_transactions(f'{self._host}/users/current/provided-strategies/transactions', qs,
+                                          page_size)
+
+    def iterate_strategies_subscribed_transactions(self, time_from: datetime, time_till: datetime,
+                                                   strategy_ids: List[str] = None, provider_ids: List[str] = None,
+                                                   page_size: int = 1000) -> AsyncIterator[CopyFactoryTransaction]:
+        """Iterates over transactions on the strategies the current user subscribed to, loading them page by page.
+        The next page is loaded while the current one is processed.
+
+        Args:
+            time_from: Time to load transactions from.
+            time_till: Time to load transactions till.
+            strategy_ids: Optional list of strategy ids to filter transactions by.
+            provider_ids: Optional list of providers to filter transactions by.
+            page_size: Number of transactions to load per request, default is 1000.
+
+        Returns:
+            An async iterator over transactions found.
+        """
+        if self._is_not_jwt_token():
+            return self._handle_no_access_exception('iterate_strategies_subscribed_transactions')
+        qs = {
+            'from': format_date(time_from),
+            'till': format_date(time_till)
+        }
+        if strategy_ids:
+            qs['strategyId'] = strategy_ids
+        if provider_ids:
+            qs['providerId'] = provider_ids
+        return self._iterate_transactions(f'{self._host}/users/current/strategies-subscribed/transactions', qs,
+                                          page_size)
+
+    async def fetch_provided_strategies_transactions(self, time_from: datetime, time_till: datetime,
+                                                     strategy_ids: List[str] = None, subscriber_ids: List[str] = None,
+                                                     slice_duration: timedelta = timedelta(days=7),
+                                                     max_concurrency: int = 4, page_size: int = 1000) -> \
+            List[CopyFactoryTransaction]:
+        """Returns all transactions on the strategies the current user provides to other users. The time range is
+        split into slices which are loaded concurrently, requests are subject to the rate limiter of the HTTP client.
+
+        Args:
+            time_from: Time to load transactions from.
+            time_till: Time to load transactions till.
+            strategy_ids: Optional list of strategy ids to filter transactions by.
+            subscriber_ids: Optional list of subscribers to filter transactions by.
+            slice_duration: Duration of a time slice, default is 7 days.
+            max_concurrency: Maximum number of slices loaded at once, default is 4.
+            page_size: Number of transactions to load per request, default is 1000.
+
+        Returns:
+            A coroutine resolving with transactions found, sorted by time.
+        """
+        if self._is_not_jwt_token():
+            return self._handle_no_access_exception('fetch_provided_strategies_transactions')
+        qs = {}
+        if strategy_ids:
+            qs['strategyId'] = strategy_ids
+        if subscriber_ids:
+            qs['subscriberId'] = subscriber_ids
+        return await self._fetch_transactions(f'{self._host}/users/current/provided-strategies/transactions', qs,
+                                              time_from, time_till, slice_duration, max_concurrency, page_size)
+
+    async def fetch_strategies_subscribed_transactions(self, time_from: datetime, time_till: datetime,
+                                                       strategy_ids: List[str] = None, provider_ids: List[str] = None,
+                                                       slice_duration: timedelta = timedelta(days=7),
+                                                       max_concurrency: int = 4, page_size: int = 1000) -> \
+            List[CopyFactoryTransaction]:
+        """Returns all transactions on the strategies the current user subscribed to. The time range is split into
+        slices which are loaded concurrently, requests are subject to the rate limiter of the HTTP client.
+
+        Args:
+            time_from: Time to load transactions from.
+            time_till: Time to load transactions till.
+            strategy_ids: Optional list of strategy ids to filter transactions by.
+            provider_ids: Optional list of providers to filter transactions by.
+            slice_duration: Duration of a time slice, default is 7 days.
+            max_concurrency: Maximum number of slices loaded at once, default is 4.
+            page_size: Number of transactions to load per request, default is 1000.
+
+        Returns:
+            A coroutine resolving with transactions found, sorted by time.
+        """
+        if self._is_not_jwt_token():
+            return self._handle_no_access_exception('fetch_strategies_subscribed_transactions')
+        qs = {}
+        if strategy_ids:
+            qs['strategyId'] = strategy_ids
+        if provider_ids:
+            qs['providerId'] = provider_ids
+        return await self._fetch_transactions(f'{self._host}/users/current/strategies-subscribed/transactions', qs,
+                                              time_from, time_till, slice_duration, max_concurrency, page_size)
+
+    async def _request_transactions(self, url: str, qs: dict) -> List[dict]:
+        """Requests a page of transactions without converting them.
+
+        Args:
+            url: Transactions URL.
+            qs: Query parameters.
+
+        Returns:
+            A coroutine resolving with transactions found.
+        """
         opts = {
-          'url': f'{self._host}/users/current/strategies-subscribed/transactions',
+          'url': url,
           'method': 'GET',
           'headers': {
             'auth-token': self._token
           },
           'params': qs
         }
-        transactions = await self._httpClient.request(opts)
-        for transaction in transactions:
-            transaction['time'] = date(transaction['time'])
-        return transactions
+        return await self._httpClient.request(opts)
+
+    async def _iterate_transactions(self, url: str, qs: dict, page_size: int) -> AsyncIterator[CopyFactoryTransaction]:
+        """Iterates over transactions page by page, requesting the next page before the transactions of the current
+        one are yielded. Transaction time is converted when a transaction is yielded.
+
+        Args:
+            url: Transactions URL.
+            qs: Query parameters without pagination.
+            page_size: Number of transactions to load per request.
+
+        Returns:
+            An async iterator over transactions found.
+        """
+        offset = 0
+        next_page = asyncio.ensure_future(self._request_transactions(url, dict(qs, offset=offset, limit=page_size)))
+        try:
+            while next_page is not None:
+                page = await next_page
+                offset += len(page)
+                next_page = asyncio.ensure_future(
+                    self._request_transactions(url, dict(qs, offset=offset, limit=page_size))) \
+                    if len(page) >= page_size else None
+                for transaction in page:
+                    transaction['time'] = date(transaction['time'])
+                    yield transaction
+                page = None
+        finally:
+            if next_page is not None:
+                if next_page.done():
+                    if not next_page.cancelled():
+                        next_page.exception()
+                else:
+                    next_page.cancel()
+
+    async def _fetch_transactions(self, url: str, qs: dict, time_from: datetime, time_till: datetime,
+                                  slice_duration: timedelta, max_concurrency: int, page_size: int) -> \
+            List[CopyFactoryTransaction]:
+        """Loads transactions of a time range in concurrent time slices and merges them. Transactions found in
+        several slices, e.g. on a slice boundary, are returned once.
+
+        Args:
+            url: Transactions URL.
+            qs: Query parameters without time range and pagination.
+            time_from: Time to load transactions from.
+            time_till: Time to load transactions till.
+            slice_duration: Duration of a time slice.
+            max_concurrency: Maximum number of slices loaded at once.
+            page_size: Number of transactions to load per request.
+
+        Returns:
+            A coroutine resolving with transactions found, sorted by time.
+        """
+        if slice_duration <= timedelta(0):
+            raise ValidationException('slice_duration must be positive')
+        if max_concurrency < 1:
+            raise ValidationException('max_concurrency must be positive')
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch_slice(time_range: Tuple[datetime, datetime]) -> List[dict]:
+            async with semaphore:
+                slice_qs = dict(qs, **{'from': format_date(time_range[0]), 'till': format_date(time_range[1])})
+                transactions = []
+                while True:
+                    page = await self._request_transactions(url, dict(slice_qs, offset=len(transactions),
+                                                                      limit=page_size))
+                    transactions.extend(page)
+                    if len(page) < page_size:
+                        return transactions
+
+        tasks = [asyncio.ensure_future(fetch_slice(time_range))
+                 for time_range in self._split_time_range(time_from, time_till, slice_duration)]
+        try:
+            slices = await asyncio.gather(*tasks)
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            raise
+        transactions = {}
+        for transaction in chain.from_iterable(slices):
+            if transaction['id'] not in transactions:
+                transaction['time'] = date(transaction['time'])
+                transactions[transaction['id']] = transaction
+        return sorted(transactions.values(), key=lambda transaction: transaction['time'])
+
+    def _split_time_range(self, time_from: datetime, time_till: datetime, slice_duration: timedelta) -> \
+            List[Tuple[datetime, datetime]]:
+        """Splits a time range into consecutive slices.
+
+        Args:
+            time_from: Start of the time range.
+            time_till: End of the time range.
+            slice_duration: Duration of a slice, the last slice can be shorter.
+
+        Returns:
+            List of slice starts and ends.
+        """
+        time_ranges = []
+        start = time_from
+        while start < time_till:
+            end = min(start + slice_duration, time_till)
+            time_ranges.append((start, end))
+            start = end
+        return time_ranges or [(time_from, time_till)]
@@ -1,9 +1,11 @@
 from ..httpClient import HttpClient
 from .history_client import HistoryClient
 from ...metaApi.models import date, format_date
-from datetime import datetime
+from datetime import datetime, timedelta
+from copy import deepcopy
+import asyncio
 import pytest
-import responses
+from mock import AsyncMock
 copy_factory_api_url = 'https://trading-api-v1.agiliumtrade.agiliumtrade.ai'
 http_client = HttpClient()
 history_client = HistoryClient(http_client, 'header.payload.sign')
@@ -29,14 +31,14 @@ class TestHistoryClient:
                 'name': 'Test strategy'
             }]
         }]
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.GET, f'{copy_factory_api_url}/users/current/providers',
-                     json=expected, status=200)
-            accounts = await history_client.get_providers()
-            assert rsps.calls[0].request.url == f'{copy_factory_api_url}/users/current/providers'
-            assert rsps.calls[0].request.method == 'GET'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert accounts == expected
+        http_client.request = AsyncMock(return_value=expected)
+        accounts = await history_client.get_providers()
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/providers',
+            'method': 'GET',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
+        assert accounts == expected
 
     @pytest.mark.asyncio
     async def test_not_retrieve_providers_with_account_token(self):
@@ -60,14 +62,14 @@ class TestHistoryClient:
             'name': 'Test strategy'
           }]
         }]
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.GET, f'{copy_factory_api_url}/users/current/subscribers',
-                     json=expected, status=200)
-            accounts = await history_client.get_subscribers()
-            assert rsps.calls[0].request.url == f'{copy_factory_api_url}/users/current/subscribers'
-            assert rsps.calls[0].request.method == 'GET'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert accounts == expected
+        http_client.request = AsyncMock(return_value=expected)
+        accounts = await history_client.get_subscribers()
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/subscribers',
+            'method': 'GET',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
+        assert accounts == expected
 
     @pytest.mark.asyncio
     async def test_not_retrieve_subscribers_with_account_token(self):
@@ -87,14 +89,14 @@ class TestHistoryClient:
             'id': 'ABCD',
             'name': 'Test strategy'
         }]
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.GET, f'{copy_factory_api_url}/users/current/strategies-subscribed',
-                     json=expected, status=200)
-            accounts = await history_client.get_strategies_subscribed()
-            assert rsps.calls[0].request.url == f'{copy_factory_api_url}/users/current/strategies-subscribed'
-            assert rsps.calls[0].request.method == 'GET'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert accounts == expected
+        http_client.request = AsyncMock(return_value=expected)
+        accounts = await history_client.get_strategies_subscribed()
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/strategies-subscribed',
+            'method': 'GET',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
+        assert accounts == expected
 
     @pytest.mark.asyncio
     async def test_not_retrieve_strategies_subscribed_to_with_account_token(self):
@@ -114,14 +116,14 @@ class TestHistoryClient:
             'id': 'ABCD',
             'name': 'Test strategy'
         }]
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.GET, f'{copy_factory_api_url}/users/current/provided-strategies',
-                     json=expected, status=200)
-            accounts = await history_client.get_provided_strategies()
-            assert rsps.calls[0].request.url == f'{copy_factory_api_url}/users/current/provided-strategies'
-            assert rsps.calls[0].request.method == 'GET'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert accounts == expected
+        http_client.request = AsyncMock(return_value=expected)
+        accounts = await history_client.get_provided_strategies()
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/provided-strategies',
+            'method': 'GET',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
+        assert accounts == expected
 
     @pytest.mark.asyncio
     async def test_not_retrieve_provided_strategies_with_account_token(self):
@@ -168,19 +170,18 @@ class TestHistoryClient:
         }]
         time_from = datetime.now()
         time_till = datetime.now()
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.GET, f'{copy_factory_api_url}/users/current/provided-strategies/transactions',
-                     json=expected, status=200, match_querystring=False)
-            accounts = await history_client.get_provided_strategies_transactions(time_from, time_till, ['ABCD'],
-                                                                                 ['subscriberId'], 100, 200)
-            assert rsps.calls[0].request.url == f'{copy_factory_api_url}/users/current/provided-strategies/' \
-                                                f'transactions?from={format_date(time_from).replace(":", "%3A")}&' \
-                                                f'till={format_date(time_till).replace(":", "%3A")}&strategyId=ABCD&' \
-                                                f'subscriberId=subscriberId&offset=100&limit=200'
-            assert rsps.calls[0].request.method == 'GET'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            expected[0]['time'] = date(expected[0]['time'])
-            assert accounts == expected
+        http_client.request = AsyncMock(return_value=deepcopy(expected))
+        accounts = await history_client.get_provided_strategies_transactions(time_from, time_till, ['ABCD'],
+                                                                             ['subscriberId'], 100, 200)
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/provided-strategies/transactions',
+            'method': 'GET',
+            'headers': {'auth-token': 'header.payload.sign'},
+            'params': {'from': format_date(time_from), 'till': format_date(time_till), 'strategyId': ['ABCD'],
+                       'subscriberId': ['subscriberId'], 'offset': 100, 'limit': 200}
+        })
+        expected[0]['time'] = date(expected[0]['time'])
+        assert accounts == expected
 
     @pytest.mark.asyncio
     async def test_not_retrieve_transactions_for_provided_strategies_with_account_token(self):
@@ -227,19 +228,18 @@ class TestHistoryClient:
         }]
         time_from = datetime.now()
         time_till = datetime.now()
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.GET, f'{copy_factory_api_url}/users/current/strategies-subscribed/transactions',
-                     json=expected, status=200)
-            accounts = await history_client.get_strategies_subscribed_transactions(time_from, time_till, ['ABCD'],
-                                                                                   ['subscriberId'], 100, 200)
-            assert rsps.calls[0].request.url == f'{copy_factory_api_url}/users/current/strategies-subscribed/' \
-                                                f'transactions?from={format_date(time_from).replace(":", "%3A")}&' \
-                                                f'till={format_date(time_till).replace(":", "%3A")}&strategyId=ABCD&' \
-                                                f'providerId=subscriberId&offset=100&limit=200'
-            assert rsps.calls[0].request.method == 'GET'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            expected[0]['time'] = date(expected[0]['time'])
-            assert accounts == expected
+        http_client.request = AsyncMock(return_value=deepcopy(expected))
+        accounts = await history_client.get_strategies_subscribed_transactions(time_from, time_till, ['ABCD'],
+                                                                               ['subscriberId'], 100, 200)
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/strategies-subscribed/transactions',
+            'method': 'GET',
+            'headers': {'auth-token': 'header.payload.sign'},
+            'params': {'from': format_date(time_from), 'till': format_date(time_till), 'strategyId': ['ABCD'],
+                       'providerId': ['subscriberId'], 'offset': 100, 'limit': 200}
+        })
+        expected[0]['time'] = date(expected[0]['time'])
+        assert accounts == expected
 
     @pytest.mark.asyncio
     async def test_not_retrieve_transactions_for_subscribed_strategies_with_account_token(self):
@@ -251,3 +251,133 @@ class TestHistoryClient:
             assert err.__str__() == 'You can not invoke get_strategies_subscribed_transactions method, ' + \
                    'because you have connected with account access token. Please use API access token from ' + \
                    'https://app.metaapi.cloud/token page to invoke this method.'
+
+    @pytest.mark.asyncio
+    async def test_iterate_transactions_for_subscribed_strategies(self):
+        """Should iterate over transactions on subscribed strategies page by page with prefetch."""
+        transactions = [{'id': str(i), 'time': f'2020-08-02T21:01:0{i}.000Z'} for i in range(5)]
+
+        async def request(opts):
+            return deepcopy(transactions[opts['params']['offset']:][:opts['params']['limit']])
+
+        http_client.request = AsyncMock(side_effect=request)
+        time_from = datetime.now()
+        time_till = datetime.now()
+        iterator = history_client.iterate_strategies_subscribed_transactions(time_from, time_till, ['ABCD'],
+                                                                             ['providerId'], page_size=2)
+        first = await iterator.__anext__()
+        assert first == {'id': '0', 'time': date(transactions[0]['time'])}
+        await asyncio.sleep(0)
+        assert http_client.request.call_count == 2
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/strategies-subscribed/transactions',
+            'method': 'GET',
+            'headers': {'auth-token': 'header.payload.sign'},
+            'params': {'from': format_date(time_from), 'till': format_date(time_till), 'strategyId': ['ABCD'],
+                       'providerId': ['providerId'], 'offset': 2, 'limit': 2}
+        })
+        rest = [transaction async for transaction in iterator]
+        assert [transaction['id'] for transaction in rest] == ['1', '2', '3', '4']
+        assert all(isinstance(transaction['time'], datetime) for transaction in rest)
+        assert http_client.request.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_convert_time_of_consumed_transactions_only(self):
+        """Should convert time only for transactions consumed."""
+        page = [{'id': '0', 'time': '2020-08-02T21:01:00.000Z'}, {'id': '1', 'time': '2020-08-02T21:01:01.000Z'}]
+        http_client.request = AsyncMock(return_value=page)
+        iterator = history_client.iterate_provided_strategies_transactions(datetime.now(), datetime.now())
+        await iterator.__anext__()
+        assert isinstance(page[0]['time'], datetime)
+        assert page[1]['time'] == '2020-08-02T21:01:01.000Z'
+        await iterator.aclose()
+
+    @pytest.mark.asyncio
+    async def test_cancel_prefetch_when_iteration_stops(self):
+        """Should cancel loading next page when iteration stops."""
+        requests = []
+
+        async def request(opts):
+            if opts['params']['offset']:
+                requests.append(asyncio.get_event_loop().create_future())
+                await requests[-1]
+            return [{'id': '0', 'time': '2020-08-02T21:01:00.000Z'}]
+
+        http_client.request = AsyncMock(side_effect=request)
+        iterator = history_client.iterate_provided_strategies_transactions(datetime.now(), datetime.now(),
+                                                                           page_size=1)
+        async for transaction in iterator:
+            await asyncio.sleep(0)
+            break
+        await iterator.aclose()
+        await asyncio.sleep(0)
+        assert len(requests) == 1 and requests[0].cancelled()
+
+    @pytest.mark.asyncio
+    async def test_not_iterate_transactions_with_account_token(self):
+        """Should not iterate over transactions with account token."""
+        history_client = HistoryClient(http_client, 'token')
+        with pytest.raises(Exception) as err:
+            history_client.iterate_strategies_subscribed_transactions(datetime.now(), datetime.now())
+        assert err.value.__str__().startswith('You can not invoke iterate_strategies_subscribed_transactions method')
+
+    @pytest.mark.asyncio
+    async def test_fetch_transactions_for_subscribed_strategies_in_time_slices(self):
+        """Should fetch transactions on subscribed strategies in concurrent time slices."""
+        time_from = date('2020-08-01T00:00:00.000Z')
+        transactions = [{'id': str(i), 'time': format_date(time_from + timedelta(hours=12 * i))} for i in range(28)]
+        running = 0
+        max_running = 0
+
+        async def request(opts):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            params = opts['params']
+            found = [t for t in transactions if date(params['from']) <= date(t['time']) <= date(params['till'])]
+            return deepcopy(list(reversed(found))[params['offset']:][:params['limit']])
+
+        http_client.request = AsyncMock(side_effect=request)
+        result = await history_client.fetch_strategies_subscribed_transactions(
+            time_from, time_from + timedelta(days=14), ['ABCD'], slice_duration=timedelta(days=3),
+            max_concurrency=2, page_size=4)
+        assert [t['id'] for t in result] == [str(i) for i in range(28)]
+        assert all(isinstance(t['time'], datetime) for t in result)
+        assert max_running == 2
+        params = [call[0][0]['params'] for call in http_client.request.call_args_list]
+        assert {(p['from'], p['till']) for p in params} == {
+            (format_date(time_from + timedelta(days=i)), format_date(time_from + timedelta(days=min(i + 3, 14))))
+            for i in range(0, 14, 3)}
+        assert all(p['strategyId'] == ['ABCD'] and p['limit'] == 4 for p in params)
+        assert http_client.request.call_args_list[0][0][0]['url'] == \
+            f'{copy_factory_api_url}/users/current/strategies-subscribed/transactions'
+
+    @pytest.mark.asyncio
+    async def test_cancel_fetching_slices_on_error(self):
+        """Should cancel fetching remaining time slices if a slice fails."""
+        started = []
+
+        async def request(opts):
+            started.append(opts['params']['from'])
+            if len(started) == 1:
+                raise Exception('test')
+            await asyncio.sleep(1)
+            return []
+
+        http_client.request = AsyncMock(side_effect=request)
+        time_from = datetime.now()
+        with pytest.raises(Exception, match='test'):
+            await history_client.fetch_provided_strategies_transactions(time_from, time_from + timedelta(days=30),
+                                                                        max_concurrency=2)
+        await asyncio.sleep(0.05)
+        assert len(started) < 5
+
+    @pytest.mark.asyncio
+    async def test_not_fetch_transactions_with_account_token(self):
+        """Should not fetch transactions with account token."""
+        history_client = HistoryClient(http_client, 'token')
+        with pytest.raises(Exception) as err:
+            await history_client.fetch_strategies_subscribed_transactions(datetime.now(), datetime.now())
+        assert err.value.__str__().startswith('You can not invoke fetch_strategies_subscribed_transactions method')
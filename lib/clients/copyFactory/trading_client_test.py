@@ -1,7 +1,7 @@
 from ..httpClient import HttpClient
 from .trading_client import TradingClient
 import pytest
-import responses
+from mock import AsyncMock
 copy_factory_api_url = 'https://trading-api-v1.agiliumtrade.agiliumtrade.ai'
 http_client = HttpClient()
 trading_client = TradingClient(http_client, 'header.payload.sign')
@@ -18,14 +18,16 @@ async def run_around_tests():
 class TestTradingClient:
     @pytest.mark.asyncio
     async def test_resynchronize_copyfactory_account(self):
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.POST, f'{copy_factory_api_url}/users/current/accounts/' +
-                     '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef/resynchronize?strategyId=ABCD',
-                     status=200)
-            await trading_client.resynchronize('0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef',
-                                               ['ABCD'])
-            assert rsps.calls[0].request.method == 'POST'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
+        http_client.request = AsyncMock(return_value=None)
+        await trading_client.resynchronize('0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef',
+                                           ['ABCD'])
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/accounts/' +
+                   '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef/resynchronize',
+            'method': 'POST',
+            'headers': {'auth-token': 'header.payload.sign'},
+            'params': {'strategyId': ['ABCD']}
+        })
 
     @pytest.mark.asyncio
     async def test_not_resynchronize_account_with_account_token(self):
@@ -51,17 +53,16 @@ class TestTradingClient:
           },
           'reasonDescription': 'total strategy equity drawdown exceeded limit'
         }]
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.GET, f'{copy_factory_api_url}/users/current/accounts/' +
-                     '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef/stopouts',
-                     json=expected, status=200)
-            stopouts = await trading_client.get_stopouts('0123456789abcdef0123456789abcdef0123456789abcdef' +
-                                                         '0123456789abcdef')
-            assert rsps.calls[0].request.url == f'{copy_factory_api_url}/users/current/accounts/' + \
-                '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef/stopouts'
-            assert rsps.calls[0].request.method == 'GET'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert stopouts == expected
+        http_client.request = AsyncMock(return_value=expected)
+        stopouts = await trading_client.get_stopouts('0123456789abcdef0123456789abcdef0123456789abcdef' +
+                                                     '0123456789abcdef')
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/accounts/' +
+                   '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef/stopouts',
+            'method': 'GET',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
+        assert stopouts == expected
 
     @pytest.mark.asyncio
     async def test_not_retrieve_stopouts_with_account_token(self):
@@ -76,14 +77,15 @@ class TestTradingClient:
 
     @pytest.mark.asyncio
     async def test_reset_stopout(self):
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.POST, f'{copy_factory_api_url}/users/current/accounts/' +
-                     '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef/stopouts/daily-equity/reset',
-                     status=200)
-            await trading_client.reset_stopout('0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef',
-                                               'daily-equity')
-            assert rsps.calls[0].request.method == 'POST'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
+        http_client.request = AsyncMock(return_value=None)
+        await trading_client.reset_stopout('0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef',
+                                           'daily-equity')
+        http_client.request.assert_called_with({
+            'url': f'{copy_factory_api_url}/users/current/accounts/' +
+                   '0123456789abcdef0123456789abcdef0123456789abcdef0123456789abcdef/stopouts/daily-equity/reset',
+            'method': 'POST',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
 
     @pytest.mark.asyncio
     async def test_not_reset_stopout_with_account_token(self):
@@ -1,10 +1,18 @@
 from .errorHandler import UnauthorizedException, ForbiddenException, ApiException, ConflictException, \
     ValidationException, InternalException, NotFoundException
-import requests
+from .timeoutException import TimeoutException
+from .retryPolicy import RetryPolicy, parse_retry_after
+from .rateLimiter import RateLimiter
+from .responseCache import ResponseCache
+from .requestListener import RequestListener, RequestAttempt
 from typing_extensions import TypedDict
-from typing import Optional
+from typing import Optional, List, Tuple, Coroutine
 from ..metaApi.models import ExceptionMessage
+from datetime import datetime
+import aiohttp
+import asyncio
 import json
+import time
 
 
 class RequestOptions(TypedDict):
@@ -15,65 +23,256 @@ class RequestOptions(TypedDict):
     params: Optional[dict]
     body: Optional[dict]
     files: Optional[dict]
+    """Files to upload as multipart form data indexed by field name. A file is file contents or a tuple of file
+    name, file contents and optionally content type."""
+    cache: Optional[bool]
+    """Whether a GET response can be served from the response cache, default is True. If False, the request is sent
+    to the server and its response replaces the cached one."""
+
+
+def run_until_closed(close: Coroutine) -> Optional['asyncio.Future']:
+    """Runs a coroutine which closes a client. If the event loop is running the coroutine is scheduled in it,
+    otherwise it is run to completion in the current event loop or, if there is none, in a new one.
+
+    Args:
+        close: Coroutine which closes the client.
+
+    Returns:
+        A future resolving when the client is closed if the event loop is running, otherwise None.
+    """
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = None
+    if loop is not None and loop.is_running():
+        return asyncio.ensure_future(close)
+    if loop is not None and not loop.is_closed():
+        loop.run_until_complete(close)
+        return None
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(close)
+    finally:
+        loop.close()
+    return None
 
 
 class HttpClient:
-    """HTTP client library based on requests module."""
-    def __init__(self, timeout: float = 60):
+    """HTTP client library based on aiohttp module. Requests are sent through a shared session which keeps
+    connections alive in a pool, so that subsequent requests to the same host do not repeat TCP and TLS handshakes.
+    Failed requests are retried according to the retry policy. Request attempts can be throttled by a client-side
+    rate limiter and responses can be served from a response cache."""
+
+    def __init__(self, timeout: float = 60, max_connections: int = 100, max_connections_per_host: int = 0,
+                 keepalive_timeout: float = 15, retry_policy: RetryPolicy = None,
+                 rate_limiter: RateLimiter = None, response_cache: ResponseCache = None):
         """Inits HttpClient class instance.
 
         Args:
             timeout: Request timeout in seconds.
+            max_connections: Maximum number of open connections, default is 100.
+            max_connections_per_host: Maximum number of open connections to a single host, default is 0 which
+            means no limit except the total one.
+            keepalive_timeout: Time in seconds to keep an idle connection open for reuse, default is 15.
+            retry_policy: Policy of retrying failed requests, by default requests are retried with default options
+            of RetryPolicy.
+            rate_limiter: Rate limiter each request attempt waits for, by default requests are not limited.
+            response_cache: Cache of responses, by default responses are not cached.
         """
         self._timeout = timeout
+        self._maxConnections = max_connections
+        self._maxConnectionsPerHost = max_connections_per_host
+        self._keepaliveTimeout = keepalive_timeout
+        self._retryPolicy = retry_policy or RetryPolicy()
+        self._rateLimiter = rate_limiter
+        self._responseCache = response_cache
+        self._requestListeners = []
+        self._session = None
+        self._loop = None
 
-    async def request(self, options: RequestOptions) -> requests.Response:
+    async def request(self, options: RequestOptions) -> dict or List or str or bytes or None:
         """Performs a request. Response errors are returned as ApiError or subclasses.
 
         Args:
             options: Request options.
 
         Returns:
-            A request response.
+            Parsed JSON response body, response body text if the body is not JSON, response body bytes if the body is
+            not text either, or None if the response has no body.
         """
-        response = await self._make_request(options)
+        if self._responseCache is not None:
+            response, body = await self._responseCache.request(options, self._make_request_with_retries)
+        else:
+            response, body = await self._make_request_with_retries(options)
+        if response.status >= 400:
+            self._convert_error(response, body)
+        if not body:
+            return None
         try:
-            response.raise_for_status()
-            if response.content:
-                try:
-                    response = response.json()
-                except Exception as err:
-                    print('Error parsing json', err)
-        except requests.HTTPError as err:
-            self._convert_error(err)
-        return response
-
-    async def _make_request(self, options: RequestOptions) -> requests.Response:
-        req = requests.Request()
-        req.method = options['method'] if ('method' in options) else 'GET'
-        req.url = options['url']
+            return json.loads(body)
+        except Exception as err:
+            print('Error parsing json', err)
+        try:
+            return body.decode(response.charset or 'utf-8')
+        except (UnicodeDecodeError, LookupError):
+            return body
+
+    async def close(self):
+        """Closes the pooled connections. The pool is opened again on the next request. Connections opened in
+        another event loop are closed in that loop, if the loop is already closed its connections can not be closed
+        anymore."""
+        if self._session is not None:
+            session, loop = self._session, self._loop
+            self._session = None
+            self._loop = None
+            if loop is asyncio.get_event_loop():
+                await session.close()
+            elif loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), loop))
+            elif not loop.is_closed():
+                asyncio.run_coroutine_threadsafe(session.close(), loop)
+
+    def add_request_listener(self, listener: RequestListener):
+        """Adds request listener which is notified about each request attempt.
+
+        Args:
+            listener: Request listener to add.
+        """
+        self._requestListeners.append(listener)
+
+    def remove_request_listener(self, listener: RequestListener):
+        """Removes request listener.
+
+        Args:
+            listener: Listener to remove.
+        """
+        if listener in self._requestListeners:
+            self._requestListeners.remove(listener)
+
+    async def _make_request_with_retries(self, options: RequestOptions) -> Tuple[aiohttp.ClientResponse, bytes]:
+        """Sends a request, retrying failed attempts according to the retry policy.
+
+        Args:
+            options: Request options.
+
+        Returns:
+            Tuple of the response and the response body of the last attempt.
+        """
+        method = options['method'] if ('method' in options) else 'GET'
+        self._retryPolicy.record_request()
+        attempt = 0
+        while True:
+            attempt += 1
+            response = body = error = None
+            rate_limit_delay = await self._rateLimiter.acquire(options['url']) if self._rateLimiter else 0
+            started_at = time.perf_counter()
+            try:
+                response, body = await self._make_request(options)
+            except (aiohttp.ClientConnectionError, TimeoutException) as err:
+                error = err
+            latency = time.perf_counter() - started_at
+            status = response.status if response is not None else None
+            retry_delay = None
+            if error is not None or status >= 400:
+                retry_after = parse_retry_after(response.headers.get('Retry-After')) if response is not None \
+                    else None
+                retry_delay = self._retryPolicy.get_retry_delay(method, attempt, status, retry_after, error)
+                if status == 429 and retry_after is not None and self._rateLimiter:
+                    self._rateLimiter.pause(options['url'], retry_after)
+            await self._notify_request_listeners({'method': method, 'url': options['url'], 'attempt': attempt,
+                                                  'status': status, 'error': error, 'latency': latency,
+                                                  'rateLimitDelay': rate_limit_delay, 'retryDelay': retry_delay})
+            if retry_delay is None:
+                if error is not None:
+                    raise error
+                return response, body
+            await asyncio.sleep(retry_delay)
+
+    async def _notify_request_listeners(self, attempt: RequestAttempt):
+        """Notifies request listeners about a request attempt.
+
+        Args:
+            attempt: Request attempt.
+        """
+        for listener in self._requestListeners:
+            try:
+                await listener.on_request_attempt(attempt)
+            except Exception as err:
+                print(f'[{datetime.now().isoformat()}] Failed to notify request listener', err)
+
+    async def _make_request(self, options: RequestOptions) -> Tuple[aiohttp.ClientResponse, bytes]:
+        """Sends a request and reads the response body.
+
+        Args:
+            options: Request options.
+
+        Returns:
+            Tuple of the response and the response body.
+        """
+        kwargs = {}
         if 'params' in options:
-            req.params = options['params']
-        if 'files' in options:
-            req.files = options['files']
+            kwargs['params'] = self._format_params(options['params'])
         if 'headers' in options:
-            req.headers = options['headers']
+            kwargs['headers'] = options['headers']
+        if 'files' in options:
+            data = aiohttp.FormData()
+            for name, file in options['files'].items():
+                if isinstance(file, tuple):
+                    data.add_field(name, file[1], filename=file[0], content_type=file[2] if len(file) > 2 else None)
+                else:
+                    data.add_field(name, file, filename=name)
+            kwargs['data'] = data
         if 'body' in options:
-            req.json = options['body']
-        prepped = req.prepare()
-        s = requests.Session()
-        return s.send(prepped, timeout=self._timeout)
+            kwargs['json'] = options['body']
+        try:
+            async with self._get_session().request(options['method'] if ('method' in options) else 'GET',
+                                                   options['url'], **kwargs) as response:
+                return response, await response.read()
+        except asyncio.TimeoutError:
+            raise TimeoutException(f'Request to {options["url"]} timed out after {self._timeout} seconds')
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Returns the session of the current event loop, creating it on first use in the loop.
+
+        Returns:
+            Client session.
+        """
+        loop = asyncio.get_event_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._loop = loop
+            connector = aiohttp.TCPConnector(limit=self._maxConnections, limit_per_host=self._maxConnectionsPerHost,
+                                             keepalive_timeout=self._keepaliveTimeout)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self._timeout))
+        return self._session
+
+    def _format_params(self, params: dict) -> List[Tuple[str, str]]:
+        """Converts query parameters to strings. Parameters set to None are skipped and each value of a list parameter
+        is sent as a separate parameter.
+
+        Args:
+            params: Query parameters.
+
+        Returns:
+            List of parameter names and values.
+        """
+        result = []
+        for name, value in params.items():
+            for item in (value if isinstance(value, (list, tuple)) else [value]):
+                if item is not None:
+                    result.append((name, item if isinstance(item, str) else str(item)))
+        return result
 
-    def _convert_error(self, err: requests.HTTPError):
+    def _convert_error(self, response: aiohttp.ClientResponse, body: bytes):
         try:
-            response: ExceptionMessage or TypedDict = json.loads(err.response.text)
+            response_body: ExceptionMessage or TypedDict = json.loads(body)
         except Exception:
-            response = {}
+            response_body = {}
 
-        err_message = response['message'] if 'message' in response else err.response.reason
-        status = err.response.status_code
+        err_message = response_body['message'] if 'message' in response_body else response.reason
+        status = response.status
         if status == 400:
-            details = response['details'] if 'details' in response else []
+            details = response_body['details'] if 'details' in response_body else []
             raise ValidationException(err_message, details)
         elif status == 401:
             raise UnauthorizedException(err_message)
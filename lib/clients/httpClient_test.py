@@ -1,29 +1,108 @@
-from .httpClient import HttpClient
+from .httpClient import HttpClient, run_until_closed
+from .timeoutException import TimeoutException
+from .retryPolicy import RetryPolicy
+from .rateLimiter import RateLimiter
+from .responseCache import ResponseCache
+from .requestListener import RequestListener
+from aiohttp import web
+from mock import patch, AsyncMock, MagicMock
+import asyncio
+import threading
+import json
 import re
 import pytest
-import responses
 httpClient = None
-test_url = 'http://example.com'
+fake_server = None
+test_url = 'http://localhost:8081'
+
+
+class FakeServer:
+
+    def __init__(self):
+        self.app = web.Application()
+        self.runner = None
+        self.peers = []
+        self.response = None
+        self.responses = []
+        self.request = None
+        self.query = None
+        self.body = None
+        self.post = None
+
+    async def start(self):
+        port = 8081
+
+        async def handle(request: web.Request):
+            self.peers.append(request.transport.get_extra_info('peername'))
+            self.request = request
+            self.query = list(request.query.items())
+            if request.content_type == 'multipart/form-data':
+                self.post = {name: value.file.read() if isinstance(value, web.FileField) else value
+                             for name, value in (await request.post()).items()}
+            else:
+                self.body = await request.read()
+            if request.path == '/slow':
+                await asyncio.sleep(1)
+            if request.path == '/not-found':
+                raise web.HTTPNotFound()
+            if len(self.responses):
+                return self.responses.pop(0)
+            if self.response is not None:
+                return self.response
+            return web.Response(text='<!doctype html><html></html>', content_type='text/html')
+
+        self.app.router.add_route('*', '/{path:.*}', handle)
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, 'localhost', port)
+        await site.start()
+
+    async def stop(self):
+        await self.runner.cleanup()
 
 
 @pytest.fixture(autouse=True)
 async def run_around_tests():
     global httpClient
+    global fake_server
+    fake_server = FakeServer()
+    await fake_server.start()
     httpClient = HttpClient()
     yield
+    await httpClient.close()
+    await fake_server.stop()
 
 
 class TestHttpClient:
     @pytest.mark.asyncio
     async def test_load(self):
-        """Should load HTML page from example.com"""
+        """Should load HTML page"""
         opts = {
             'url': test_url
         }
-        response = await httpClient.request(opts)
-        text = response.text
+        text = await httpClient.request(opts)
         assert re.search('doctype html', text)
 
+    @pytest.mark.asyncio
+    async def test_return_body_without_json(self):
+        """Should return None for empty body and bytes for binary body"""
+        fake_server.responses = [web.Response(status=204),
+                                 web.Response(body=b'\xff\xfe\xfd', content_type='application/octet-stream')]
+        assert await httpClient.request({'url': test_url}) is None
+        assert await httpClient.request({'url': test_url}) == b'\xff\xfe\xfd'
+
+    @pytest.mark.asyncio
+    async def test_load_json(self):
+        """Should parse JSON response"""
+        fake_server.response = web.json_response({'id': 'accountId'})
+        opts = {
+            'method': 'POST',
+            'url': test_url,
+            'body': {'name': 'test'}
+        }
+        assert await httpClient.request(opts) == {'id': 'accountId'}
+        assert json.loads(fake_server.body) == {'name': 'test'}
+
     @pytest.mark.asyncio
     async def test_not_found(self):
         """Should return NotFound exception if server returns 404"""
@@ -38,57 +117,234 @@ class TestHttpClient:
 
     @pytest.mark.asyncio
     async def test_timeout(self):
-        """Should return ConnectTimeout exception if request is timed out"""
-        httpClient = HttpClient(0.001)
+        """Should return TimeoutException if request is timed out"""
+        http_client = HttpClient(0.1)
         opts = {
-            'url': test_url
+            'url': f'{test_url}/slow'
         }
         try:
-            await httpClient.request(opts)
-            raise Exception('ConnectTimeout is expected')
+            await http_client.request(opts)
+            raise Exception('TimeoutException is expected')
         except Exception as err:
-            assert err.__class__.__name__ == 'ConnectTimeout'
+            assert isinstance(err, TimeoutException)
+        await http_client.close()
 
     @pytest.mark.asyncio
     async def test_validation_exception(self):
         """Should return a validation exception"""
-        with responses.RequestsMock() as rsps:
-            error = {
-                'id': 1,
-                'error': 'error',
-                'message': 'test message',
-            }
-            rsps.add(responses.POST, test_url, json=error, status=400)
-            opts = {
-                'method': 'POST',
-                'url': test_url
-            }
-            try:
-                await httpClient.request(opts)
-                raise Exception('ValidationException is expected')
-            except Exception as err:
-                assert err.__class__.__name__ == 'ValidationException'
-                assert err.__str__() == 'test message'
+        error = {
+            'id': 1,
+            'error': 'error',
+            'message': 'test message',
+        }
+        fake_server.response = web.json_response(error, status=400)
+        opts = {
+            'method': 'POST',
+            'url': test_url
+        }
+        try:
+            await httpClient.request(opts)
+            raise Exception('ValidationException is expected')
+        except Exception as err:
+            assert err.__class__.__name__ == 'ValidationException'
+            assert err.__str__() == 'test message'
 
     @pytest.mark.asyncio
     async def test_validation_exception_details(self):
         """Should return a validation exception with details"""
-        with responses.RequestsMock() as rsps:
-            error = {
-                'id': 1,
-                'error': 'error',
-                'message': 'test',
-                'details': [{'parameter': 'password', 'value': 'wrong', 'message': 'Invalid value'}]
-            }
-            rsps.add(responses.POST, test_url, json=error, status=400)
-            opts = {
-                'method': 'POST',
-                'url': test_url
-            }
+        error = {
+            'id': 1,
+            'error': 'error',
+            'message': 'test',
+            'details': [{'parameter': 'password', 'value': 'wrong', 'message': 'Invalid value'}]
+        }
+        fake_server.response = web.json_response(error, status=400)
+        opts = {
+            'method': 'POST',
+            'url': test_url
+        }
+        try:
+            await httpClient.request(opts)
+            raise Exception('ValidationException is expected')
+        except Exception as err:
+            assert err.__class__.__name__ == 'ValidationException'
+            assert err.__str__() == 'test'
+            assert err._details == error['details']
+
+    @pytest.mark.asyncio
+    async def test_send_params_and_headers(self):
+        """Should send query parameters and headers"""
+        opts = {
+            'url': test_url,
+            'params': {'strategyId': ['ABCD', 'BCDE'], 'offset': 0, 'limit': None, 'includeRemoved': True},
+            'headers': {'auth-token': 'token'}
+        }
+        await httpClient.request(opts)
+        assert fake_server.query == [('strategyId', 'ABCD'), ('strategyId', 'BCDE'), ('offset', '0'),
+                                     ('includeRemoved', 'True')]
+        assert fake_server.request.headers['auth-token'] == 'token'
+
+    @pytest.mark.asyncio
+    async def test_upload_files(self):
+        """Should upload files as multipart form data"""
+        opts = {
+            'method': 'PUT',
+            'url': f'{test_url}/servers.dat',
+            'files': {'file': b'contents'}
+        }
+        await httpClient.request(opts)
+        assert fake_server.post == {'file': b'contents'}
+        opts['files'] = {'file': ('servers.dat', b'named contents')}
+        await httpClient.request(opts)
+        assert fake_server.post == {'file': b'named contents'}
+
+    @pytest.mark.asyncio
+    async def test_reuse_connections(self):
+        """Should send subsequent requests over a pooled connection"""
+        for i in range(3):
+            await httpClient.request({'url': test_url})
+        assert len(fake_server.peers) == 3
+        assert len(set(fake_server.peers)) == 1
+
+    @pytest.mark.asyncio
+    async def test_retry_transient_errors(self):
+        """Should retry idempotent request on transient errors"""
+        fake_server.responses = [web.Response(status=503), web.Response(status=502)]
+        fake_server.response = web.json_response({'id': 'accountId'})
+        with patch('lib.clients.httpClient.asyncio.sleep', new=AsyncMock()) as sleep:
+            assert await httpClient.request({'url': test_url}) == {'id': 'accountId'}
+            assert len(fake_server.peers) == 3
+            assert 0.25 <= sleep.call_args_list[0][0][0] <= 0.5
+            assert 0.5 <= sleep.call_args_list[1][0][0] <= 1
+
+    @pytest.mark.asyncio
+    async def test_honor_retry_after(self):
+        """Should wait for the time specified in Retry-After header before retrying"""
+        fake_server.responses = [web.Response(status=429, headers={'Retry-After': '3'})]
+        with patch('lib.clients.httpClient.asyncio.sleep', new=AsyncMock()) as sleep:
+            await httpClient.request({'method': 'POST', 'url': test_url})
+            sleep.assert_called_once_with(3)
+            assert len(fake_server.peers) == 2
+
+    @pytest.mark.asyncio
+    async def test_not_retry_non_idempotent_request(self):
+        """Should not retry non-idempotent request on server errors"""
+        fake_server.response = web.Response(status=503)
+        with patch('lib.clients.httpClient.asyncio.sleep', new=AsyncMock()) as sleep:
+            try:
+                await httpClient.request({'method': 'POST', 'url': test_url})
+                raise Exception('ApiException is expected')
+            except Exception as err:
+                assert err.__class__.__name__ == 'ApiException'
+                assert err.status_code == 503
+            sleep.assert_not_called()
+            assert len(fake_server.peers) == 1
+
+    @pytest.mark.asyncio
+    async def test_give_up_after_max_retries(self):
+        """Should throw the last error when retries are exhausted"""
+        http_client = HttpClient(retry_policy=RetryPolicy(max_retries=2))
+        fake_server.responses = [web.Response(status=500) for i in range(3)]
+        with patch('lib.clients.httpClient.asyncio.sleep', new=AsyncMock()) as sleep:
             try:
-                await httpClient.request(opts)
-                raise Exception('ValidationException is expected')
+                await http_client.request({'url': test_url})
+                raise Exception('InternalException is expected')
             except Exception as err:
-                assert err.__class__.__name__ == 'ValidationException'
-                assert err.__str__() == 'test'
-                assert err._details == error['details']
+                assert err.__class__.__name__ == 'InternalException'
+            assert sleep.call_count == 2
+            assert len(fake_server.peers) == 3
+        await http_client.close()
+
+    @pytest.mark.asyncio
+    async def test_close_session_in_owning_loop(self):
+        """Should close connections opened in another event loop in that loop"""
+        http_client = HttpClient()
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever)
+        thread.start()
+        try:
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(http_client.request({'url': test_url}), loop))
+            session = http_client._session
+            await http_client.close()
+            assert session.closed
+            assert http_client._session is None
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+    @pytest.mark.asyncio
+    async def test_notify_request_listeners(self):
+        """Should notify request listeners about attempts"""
+        class Listener(RequestListener):
+            async def on_request_attempt(self, attempt):
+                pass
+
+        listener = Listener()
+        listener.on_request_attempt = AsyncMock()
+        fake_server.responses = [web.Response(status=503)]
+        httpClient.add_request_listener(listener)
+        with patch('lib.clients.httpClient.asyncio.sleep', new=AsyncMock()):
+            await httpClient.request({'url': test_url})
+        attempts = [call[0][0] for call in listener.on_request_attempt.call_args_list]
+        assert [(a['method'], a['url'], a['attempt'], a['status']) for a in attempts] == \
+            [('GET', test_url, 1, 503), ('GET', test_url, 2, 200)]
+        assert attempts[0]['retryDelay'] > 0 and attempts[1]['retryDelay'] is None
+        assert all(a['latency'] > 0 and a['error'] is None and a['rateLimitDelay'] == 0 for a in attempts)
+        httpClient.remove_request_listener(listener)
+        await httpClient.request({'url': test_url})
+        assert listener.on_request_attempt.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_limit_request_rate(self):
+        """Should throttle requests with rate limiter"""
+        rate_limiter = RateLimiter(rate=20, burst=1)
+        http_client = HttpClient(rate_limiter=rate_limiter)
+        started_at = asyncio.get_event_loop().time()
+        await asyncio.gather(*[http_client.request({'url': test_url}) for i in range(3)])
+        assert asyncio.get_event_loop().time() - started_at >= 0.09
+        assert len(fake_server.peers) == 3
+        await http_client.close()
+
+    @pytest.mark.asyncio
+    async def test_pause_rate_limiter_on_429(self):
+        """Should pause rate limiter when server responds with 429 and Retry-After header"""
+        rate_limiter = RateLimiter(rate=20)
+        rate_limiter.pause = MagicMock()
+        http_client = HttpClient(rate_limiter=rate_limiter)
+        fake_server.responses = [web.Response(status=429, headers={'Retry-After': '2'})]
+        with patch('lib.clients.httpClient.asyncio.sleep', new=AsyncMock()):
+            await http_client.request({'url': test_url})
+        rate_limiter.pause.assert_called_once_with(test_url, 2)
+        await http_client.close()
+
+    @pytest.mark.asyncio
+    async def test_cache_responses(self):
+        """Should serve responses from cache and revalidate them with ETag"""
+        http_client = HttpClient(response_cache=ResponseCache([{'pattern': '/accounts', 'ttl': 0}]))
+        fake_server.responses = [web.json_response([{'_id': 'id'}], headers={'ETag': '"v1"'}), web.Response(status=304)]
+        opts = {'url': f'{test_url}/accounts'}
+        assert await http_client.request(opts) == [{'_id': 'id'}]
+        accounts = await http_client.request(opts)
+        assert accounts == [{'_id': 'id'}]
+        assert fake_server.request.headers['If-None-Match'] == '"v1"'
+        accounts[0]['name'] = 'changed'
+        fake_server.responses = [web.Response(status=304)]
+        assert await http_client.request(opts) == [{'_id': 'id'}]
+        await http_client.close()
+
+
+class TestRunUntilClosed:
+
+    def test_close_without_running_loop(self):
+        """Should run close to completion if the event loop is not running"""
+        close = AsyncMock()
+        assert run_until_closed(close()) is None
+        close.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_close_in_running_loop(self):
+        """Should return an awaitable future if the event loop is running"""
+        close = AsyncMock()
+        await run_until_closed(close())
+        close.assert_awaited_once()
@@ -8,6 +8,7 @@ from .reconnectListener import ReconnectListener
 from ...metaApi.models import MetatraderHistoryOrders, MetatraderDeals, date, random_id, \
     MetatraderSymbolSpecification, MetatraderTradeResponse, MetatraderSymbolPrice, MetatraderAccountInformation, \
     MetatraderPosition, MetatraderOrder, format_date
+from ...metaApi.compactModels import CompactSymbolPrice, CompactSymbolSpecification
 from .packetOrderer import PacketOrderer
 import socketio
 import asyncio
@@ -21,7 +22,7 @@ class MetaApiWebsocketClient:
     """MetaApi websocket API client (see https://metaapi.cloud/docs/client/websocket/overview/)"""
 
     def __init__(self, token: str, application: str = 'MetaApi', domain: str = 'agiliumtrade.agiliumtrade.ai',
-                 request_timeout: float = 60, connect_timeout: float = 60):
+                 request_timeout: float = 60, connect_timeout: float = 60, compact_records: bool = False):
         """Inits MetaApi websocket API client instance.
 
         Args:
@@ -29,11 +30,14 @@ class MetaApiWebsocketClient:
             domain: Domain to connect to, default is agiliumtrade.agiliumtrade.ai.
             request_timeout: Timeout for socket requests in seconds.
             connect_timeout: Timeout for connecting to server in seconds.
+            compact_records: Whether to pass symbol prices and specifications to synchronization listeners as
+            memory-efficient CompactSymbolPrice and CompactSymbolSpecification records instead of dicts.
         """
         self._application = application
         self._url = f'https://mt-client-api-v1.{domain}'
         self._request_timeout = request_timeout
         self._connect_timeout = connect_timeout
+        self._compact_records = compact_records
         self._token = token
         self._requestResolves = {}
         self._synchronizationListeners = {}
@@ -687,7 +691,21 @@ class MetaApiWebsocketClient:
                         if len(on_account_information_updated_tasks) > 0:
                             await asyncio.wait(on_account_information_updated_tasks)
                 elif data['type'] == 'deals':
-                    if 'deals' in data:
+                    if 'deals' in data and len(data['deals']) > 1:
+                        on_deals_added_tasks: List[asyncio.Task] = []
+
+                        async def run_on_deals_added(listener):
+                            try:
+                                await listener.on_deals_added(data['deals'])
+                            except Exception as err:
+                                print('Failed to notify listener about deals event', err)
+
+                        if data['accountId'] in self._synchronizationListeners:
+                            for listener in self._synchronizationListeners[data['accountId']]:
+                                on_deals_added_tasks.append(asyncio.create_task(run_on_deals_added(listener)))
+                        if len(on_deals_added_tasks) > 0:
+                            await asyncio.wait(on_deals_added_tasks)
+                    elif 'deals' in data:
                         for deal in data['deals']:
                             on_deal_added_tasks: List[asyncio.Task] = []
 
@@ -718,7 +736,22 @@ class MetaApiWebsocketClient:
                     if len(on_order_updated_tasks) > 0:
                         await asyncio.wait(on_order_updated_tasks)
                 elif data['type'] == 'historyOrders':
-                    if 'historyOrders' in data:
+                    if 'historyOrders' in data and len(data['historyOrders']) > 1:
+                        on_history_orders_added_tasks: List[asyncio.Task] = []
+
+                        async def run_on_history_orders_added(listener):
+                            try:
+                                await listener.on_history_orders_added(data['historyOrders'])
+                            except Exception as err:
+                                print('Failed to notify listener about historyOrders event', err)
+
+                        if data['accountId'] in self._synchronizationListeners:
+                            for listener in self._synchronizationListeners[data['accountId']]:
+                                on_history_orders_added_tasks.append(
+                                        asyncio.create_task(run_on_history_orders_added(listener)))
+                        if len(on_history_orders_added_tasks) > 0:
+                            await asyncio.wait(on_history_orders_added_tasks)
+                    elif 'historyOrders' in data:
                         for historyOrder in data['historyOrders']:
                             on_history_order_added_tasks: List[asyncio.Task] = []
 
@@ -829,7 +862,22 @@ class MetaApiWebsocketClient:
                                         asyncio.create_task(run_on_order_completed(listener)))
                             if len(on_order_completed_tasks) > 0:
                                 await asyncio.wait(on_order_completed_tasks)
-                    if 'historyOrders' in data:
+                    if 'historyOrders' in data and len(data['historyOrders']) > 1:
+                        on_history_orders_added_tasks: List[asyncio.Task] = []
+
+                        async def run_on_history_orders_added(listener):
+                            try:
+                                await listener.on_history_orders_added(data['historyOrders'])
+                            except Exception as err:
+                                print('Failed to notify listener about historyOrders event', err)
+
+                        if data['accountId'] in self._synchronizationListeners:
+                            for listener in self._synchronizationListeners[data['accountId']]:
+                                on_history_orders_added_tasks.append(
+                                        asyncio.create_task(run_on_history_orders_added(listener)))
+                        if len(on_history_orders_added_tasks) > 0:
+                            await asyncio.wait(on_history_orders_added_tasks)
+                    elif 'historyOrders' in data:
                         for historyOrder in data['historyOrders']:
                             on_history_order_added_tasks: List[asyncio.Task] = []
 
@@ -845,7 +893,21 @@ class MetaApiWebsocketClient:
                                         asyncio.create_task(run_on_history_order_added(listener)))
                             if len(on_history_order_added_tasks) > 0:
                                 await asyncio.wait(on_history_order_added_tasks)
-                    if 'deals' in data:
+                    if 'deals' in data and len(data['deals']) > 1:
+                        on_deals_added_tasks: List[asyncio.Task] = []
+
+                        async def run_on_deals_added(listener):
+                            try:
+                                await listener.on_deals_added(data['deals'])
+                            except Exception as err:
+                                print('Failed to notify listener about deals event', err)
+
+                        if data['accountId'] in self._synchronizationListeners:
+                            for listener in self._synchronizationListeners[data['accountId']]:
+                                on_deals_added_tasks.append(asyncio.create_task(run_on_deals_added(listener)))
+                        if len(on_deals_added_tasks) > 0:
+                            await asyncio.wait(on_deals_added_tasks)
+                    elif 'deals' in data:
                         for deal in data['deals']:
                             on_deal_added_tasks: List[asyncio.Task] = []
 
@@ -908,7 +970,9 @@ class MetaApiWebsocketClient:
                             await asyncio.wait(on_broker_connection_status_changed_tasks)
                 elif data['type'] == 'specifications':
                     if 'specifications' in data:
-                        for specification in data['specifications']:
+                        specifications = list(map(CompactSymbolSpecification.from_dict, data['specifications'])) \
+                            if self._compact_records else data['specifications']
+                        for specification in specifications:
                             on_symbol_specification_updated_tasks: List[asyncio.Task] = []
 
                             async def run_on_symbol_specification_updated(listener):
@@ -925,7 +989,9 @@ class MetaApiWebsocketClient:
                                     await asyncio.wait(on_symbol_specification_updated_tasks)
                 elif data['type'] == 'prices':
                     if 'prices' in data:
-                        for price in data['prices']:
+                        prices = list(map(CompactSymbolPrice.from_dict, data['prices'])) if self._compact_records \
+                            else data['prices']
+                        for price in prices:
                             on_symbol_price_updated_tasks: List[asyncio.Task] = []
 
                             async def run_on_symbol_price_updated(listener):
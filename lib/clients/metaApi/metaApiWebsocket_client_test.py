@@ -2,6 +2,7 @@ from .metaApiWebsocket_client import MetaApiWebsocketClient
 from socketio import AsyncServer
 from aiohttp import web
 from ...metaApi.models import date
+from ...metaApi.compactModels import CompactSymbolPrice
 import pytest
 import asyncio
 import copy
@@ -892,6 +893,32 @@ class TestMetaApiWebsocketClient:
         await client._socket.wait()
         listener.on_deal_added.assert_called_with(deals[0])
 
+    @pytest.mark.asyncio
+    async def test_synchronize_deals_in_bulk(self):
+        """Should synchronize a batch of deals in bulk."""
+
+        deals = [{
+            'id': '33230099',
+            'platform': 'mt5',
+            'symbol': 'GBPUSD',
+            'time': '2020-04-15T02:45:06.521Z',
+            'type': 'DEAL_TYPE_BUY',
+            'volume': 0.07
+        }, {
+            'id': '33230100',
+            'platform': 'mt5',
+            'symbol': 'GBPUSD',
+            'time': '2020-04-15T02:46:06.521Z',
+            'type': 'DEAL_TYPE_SELL',
+            'volume': 0.07
+        }]
+        listener = MagicMock()
+        listener.on_deals_added = FinalMock()
+        client.add_synchronization_listener('accountId', listener)
+        await sio.emit('synchronization', {'type': 'deals', 'accountId': 'accountId', 'deals': deals})
+        await client._socket.wait()
+        listener.on_deals_added.assert_called_with(deals)
+
     @pytest.mark.asyncio
     async def test_process_synchronization_updates(self):
         """Should process synchronization updates."""
@@ -1074,6 +1101,26 @@ class TestMetaApiWebsocketClient:
         await client._socket.wait()
         listener.on_symbol_price_updated.assert_called_with(prices[0])
 
+    @pytest.mark.asyncio
+    async def test_synchronize_compact_symbol_prices(self):
+        """Should synchronize symbol prices as compact records."""
+
+        prices = [{
+            'symbol': 'AUDNZD',
+            'bid': 1.05916,
+            'ask': 1.05927,
+            'profitTickValue': 0.602,
+            'lossTickValue': 0.60203
+        }]
+        client._compact_records = True
+        listener = MagicMock()
+        listener.on_symbol_price_updated = FinalMock()
+        client.add_synchronization_listener('accountId', listener)
+        await sio.emit('synchronization', {'type': 'prices', 'accountId': 'accountId', 'prices': prices})
+        await client._socket.wait()
+        listener.on_symbol_price_updated.assert_called_with(prices[0])
+        assert isinstance(listener.on_symbol_price_updated.call_args[0][0], CompactSymbolPrice)
+
     @pytest.mark.asyncio
     async def test_wait_for_server_side_sync(self):
         """Should wait for server-side terminal state synchronization."""
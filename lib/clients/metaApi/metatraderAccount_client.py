@@ -169,12 +169,13 @@ class MetatraderAccountClient(MetaApiClient):
         }
         return await self._httpClient.request(opts)
 
-    async def get_account(self, id: str) -> Response:
+    async def get_account(self, id: str, cache: bool = True) -> Response:
         """Retrieves a MetaTrader account by id (see https://metaapi.cloud/docs/provisioning/api/account/readAccount/).
         Throws an error if account is not found.
 
         Args:
             id: MetaTrader account id.
+            cache: Whether the account can be served from the response cache, default is True.
 
         Returns:
             A coroutine resolving with MetatraderAccountDto - MetaTrader account found.
@@ -186,6 +187,8 @@ class MetatraderAccountClient(MetaApiClient):
                 'auth-token': self._token
             }
         }
+        if not cache:
+            opts['cache'] = False
         return await self._httpClient.request(opts)
 
     async def get_account_by_token(self) -> 'Response[MetatraderAccountDto]':
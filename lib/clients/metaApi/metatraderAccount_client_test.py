@@ -1,8 +1,7 @@
-import responses
 import pytest
+from mock import AsyncMock
 from ..httpClient import HttpClient
 from .metatraderAccount_client import MetatraderAccountClient
-import json
 
 PROVISIONING_API_URL = 'https://mt-provisioning-api-v1.agiliumtrade.agiliumtrade.ai'
 http_client = HttpClient()
@@ -10,7 +9,6 @@ account_client = MetatraderAccountClient(http_client, 'header.payload.sign')
 
 
 class TestMetatraderAccountClient:
-    @responses.activate
     @pytest.mark.asyncio
     async def test_retrieve_many(self):
         """Should retrieve MetaTrader accounts from API."""
@@ -28,17 +26,16 @@ class TestMetatraderAccountClient:
             'tags': ['tag1', 'tag2']
         }]
 
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.GET, f'{PROVISIONING_API_URL}/users/current/accounts',
-                     json=expected, status=200)
-
-            accounts = await account_client.get_accounts({'provisioningProfileId':
-                                                          'f9ce1f12-e720-4b9a-9477-c2d4cb25f076'})
-            assert rsps.calls[0].request.url == f'{PROVISIONING_API_URL}/users/current/accounts' + \
-                '?provisioningProfileId=f9ce1f12-e720-4b9a-9477-c2d4cb25f076'
-            assert rsps.calls[0].request.method == 'GET'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert accounts == expected
+        http_client.request = AsyncMock(return_value=expected)
+        accounts = await account_client.get_accounts({'provisioningProfileId':
+                                                      'f9ce1f12-e720-4b9a-9477-c2d4cb25f076'})
+        http_client.request.assert_called_with({
+            'url': f'{PROVISIONING_API_URL}/users/current/accounts',
+            'method': 'GET',
+            'params': {'provisioningProfileId': 'f9ce1f12-e720-4b9a-9477-c2d4cb25f076'},
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
+        assert accounts == expected
 
     @pytest.mark.asyncio
     async def test_not_retrieve_mt_accounts_with_account_token(self):
@@ -51,7 +48,6 @@ class TestMetatraderAccountClient:
                                     'account access token. Please use API access token from ' + \
                                     'https://app.metaapi.cloud/token page to invoke this method.'
 
-    @responses.activate
     @pytest.mark.asyncio
     async def test_retrieve_one(self):
         """Should retrieve MetaTrader account from API."""
@@ -69,17 +65,22 @@ class TestMetatraderAccountClient:
             'tags': ['tag1', 'tag2']
         }
 
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.GET, f'{PROVISIONING_API_URL}/users/current/accounts/id',
-                     json=expected, status=200)
-
-            accounts = await account_client.get_account('id')
-            assert rsps.calls[0].request.url == f'{PROVISIONING_API_URL}/users/current/accounts/id'
-            assert rsps.calls[0].request.method == 'GET'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert accounts == expected
+        http_client.request = AsyncMock(return_value=expected)
+        accounts = await account_client.get_account('id')
+        http_client.request.assert_called_with({
+            'url': f'{PROVISIONING_API_URL}/users/current/accounts/id',
+            'method': 'GET',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
+        assert accounts == expected
+        await account_client.get_account('id', False)
+        http_client.request.assert_called_with({
+            'url': f'{PROVISIONING_API_URL}/users/current/accounts/id',
+            'method': 'GET',
+            'headers': {'auth-token': 'header.payload.sign'},
+            'cache': False
+        })
 
-    @responses.activate
     @pytest.mark.asyncio
     async def test_retrieve_by_token(self):
         """Should retrieve MetaTrader account by token from API."""
@@ -96,15 +97,14 @@ class TestMetatraderAccountClient:
             'type': 'cloud'
         }
 
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.GET, f'{PROVISIONING_API_URL}/users/current/accounts/accessToken/token',
-                     json=expected, status=200)
-
-            account_client = MetatraderAccountClient(http_client, 'token')
-            accounts = await account_client.get_account_by_token()
-            assert rsps.calls[0].request.url == f'{PROVISIONING_API_URL}/users/current/accounts/accessToken/token'
-            assert rsps.calls[0].request.method == 'GET'
-            assert accounts == expected
+        http_client.request = AsyncMock(return_value=expected)
+        account_client = MetatraderAccountClient(http_client, 'token')
+        accounts = await account_client.get_account_by_token()
+        http_client.request.assert_called_with({
+            'url': f'{PROVISIONING_API_URL}/users/current/accounts/accessToken/token',
+            'method': 'GET'
+        })
+        assert accounts == expected
 
     @pytest.mark.asyncio
     async def test_not_retrieve_account_by_token_with_api_token(self):
@@ -116,7 +116,6 @@ class TestMetatraderAccountClient:
             assert err.__str__() == 'You can not invoke get_account_by_token method, because you have connected ' + \
                    'with API access token. Please use account access token to invoke this method.'
 
-    @responses.activate
     @pytest.mark.asyncio
     async def test_create(self):
         """Should create MetaTrader account via API."""
@@ -134,15 +133,15 @@ class TestMetatraderAccountClient:
             'type': 'cloud',
             'tags': ['tag1']
         }
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.POST, f'{PROVISIONING_API_URL}/users/current/accounts',
-                     json=expected, status=201)
-
-            accounts = await account_client.create_account(account)
-            assert rsps.calls[0].request.url == f'{PROVISIONING_API_URL}/users/current/accounts'
-            assert rsps.calls[0].request.method == 'POST'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert accounts == expected
+        http_client.request = AsyncMock(return_value=expected)
+        accounts = await account_client.create_account(account)
+        http_client.request.assert_called_with({
+            'url': f'{PROVISIONING_API_URL}/users/current/accounts',
+            'method': 'POST',
+            'headers': {'auth-token': 'header.payload.sign'},
+            'body': account
+        })
+        assert accounts == expected
 
     @pytest.mark.asyncio
     async def test_not_create_mt_account_with_account_token(self):
@@ -155,17 +154,16 @@ class TestMetatraderAccountClient:
                                     'account access token. Please use API access token from ' + \
                                     'https://app.metaapi.cloud/token page to invoke this method.'
 
-    @responses.activate
     @pytest.mark.asyncio
     async def test_deploy(self):
         """Should deploy MetaTrader account via API."""
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.POST, f'{PROVISIONING_API_URL}/users/current/accounts/id/deploy', status=204)
-
-            await account_client.deploy_account('id')
-            assert rsps.calls[0].request.url == f'{PROVISIONING_API_URL}/users/current/accounts/id/deploy'
-            assert rsps.calls[0].request.method == 'POST'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
+        http_client.request = AsyncMock(return_value=None)
+        await account_client.deploy_account('id')
+        http_client.request.assert_called_with({
+            'url': f'{PROVISIONING_API_URL}/users/current/accounts/id/deploy',
+            'method': 'POST',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
 
     @pytest.mark.asyncio
     async def test_not_deploy_mt_account_with_account_token(self):
@@ -178,17 +176,16 @@ class TestMetatraderAccountClient:
                                     'account access token. Please use API access token from ' + \
                                     'https://app.metaapi.cloud/token page to invoke this method.'
 
-    @responses.activate
     @pytest.mark.asyncio
     async def test_undeploy(self):
         """Should undeploy MetaTrader account via API."""
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.POST, f'{PROVISIONING_API_URL}/users/current/accounts/id/undeploy', status=204)
-
-            await account_client.undeploy_account('id')
-            assert rsps.calls[0].request.url == f'{PROVISIONING_API_URL}/users/current/accounts/id/undeploy'
-            assert rsps.calls[0].request.method == 'POST'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
+        http_client.request = AsyncMock(return_value=None)
+        await account_client.undeploy_account('id')
+        http_client.request.assert_called_with({
+            'url': f'{PROVISIONING_API_URL}/users/current/accounts/id/undeploy',
+            'method': 'POST',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
 
     @pytest.mark.asyncio
     async def test_not_undeploy_mt_account_with_account_token(self):
@@ -201,17 +198,16 @@ class TestMetatraderAccountClient:
                                     'account access token. Please use API access token from ' + \
                                     'https://app.metaapi.cloud/token page to invoke this method.'
 
-    @responses.activate
     @pytest.mark.asyncio
     async def test_redeploy(self):
         """Should redeploy MetaTrader account via API."""
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.POST, f'{PROVISIONING_API_URL}/users/current/accounts/id/redeploy', status=204)
-
-            await account_client.redeploy_account('id')
-            assert rsps.calls[0].request.url == f'{PROVISIONING_API_URL}/users/current/accounts/id/redeploy'
-            assert rsps.calls[0].request.method == 'POST'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
+        http_client.request = AsyncMock(return_value=None)
+        await account_client.redeploy_account('id')
+        http_client.request.assert_called_with({
+            'url': f'{PROVISIONING_API_URL}/users/current/accounts/id/redeploy',
+            'method': 'POST',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
 
     @pytest.mark.asyncio
     async def test_not_redeploy_mt_account_with_account_token(self):
@@ -224,17 +220,16 @@ class TestMetatraderAccountClient:
                                     'account access token. Please use API access token from ' + \
                                     'https://app.metaapi.cloud/token page to invoke this method.'
 
-    @responses.activate
     @pytest.mark.asyncio
     async def test_delete(self):
         """Should delete MetaTrader account via API."""
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.DELETE, f'{PROVISIONING_API_URL}/users/current/accounts/id', status=204)
-
-            await account_client.delete_account('id')
-            assert rsps.calls[0].request.url == f'{PROVISIONING_API_URL}/users/current/accounts/id'
-            assert rsps.calls[0].request.method == 'DELETE'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
+        http_client.request = AsyncMock(return_value=None)
+        await account_client.delete_account('id')
+        http_client.request.assert_called_with({
+            'url': f'{PROVISIONING_API_URL}/users/current/accounts/id',
+            'method': 'DELETE',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
 
     @pytest.mark.asyncio
     async def test_not_delete_mt_account_with_account_token(self):
@@ -247,7 +242,6 @@ class TestMetatraderAccountClient:
                                     'account access token. Please use API access token from ' + \
                                     'https://app.metaapi.cloud/token page to invoke this method.'
 
-    @responses.activate
     @pytest.mark.asyncio
     async def test_update(self):
         """Should update MetaTrader account via API."""
@@ -257,14 +251,14 @@ class TestMetatraderAccountClient:
               'server': 'ICMarketsSC2-Demo',
               'tags': ['tag1']
             }
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.PUT, f'{PROVISIONING_API_URL}/users/current/accounts/id', status=204)
-
-            await account_client.update_account('id', update_account)
-            assert rsps.calls[0].request.url == f'{PROVISIONING_API_URL}/users/current/accounts/id'
-            assert rsps.calls[0].request.method == 'PUT'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert rsps.calls[0].request.body == json.dumps(update_account).encode('utf-8')
+        http_client.request = AsyncMock(return_value=None)
+        await account_client.update_account('id', update_account)
+        http_client.request.assert_called_with({
+            'url': f'{PROVISIONING_API_URL}/users/current/accounts/id',
+            'method': 'PUT',
+            'headers': {'auth-token': 'header.payload.sign'},
+            'body': update_account
+        })
 
     @pytest.mark.asyncio
     async def test_not_update_mt_account_with_account_token(self):
@@ -80,13 +80,14 @@ class ProvisioningProfileClient(MetaApiClient):
         }
         return await self._httpClient.request(opts)
 
-    async def get_provisioning_profile(self, id: str) -> 'Response[ProvisioningProfileDto]':
+    async def get_provisioning_profile(self, id: str, cache: bool = True) -> 'Response[ProvisioningProfileDto]':
         """Retrieves a provisioning profile by id (see
         https://metaapi.cloud/docs/provisioning/api/provisioningProfile/readProvisioningProfile/). Throws an error if
         profile is not found.
 
         Args:
             id: Provisioning profile id.
+            cache: Whether the profile can be served from the response cache, default is True.
 
         Returns:
             A coroutine resolving with provisioning profile found.
@@ -100,6 +101,8 @@ class ProvisioningProfileClient(MetaApiClient):
                 'auth-token': self._token
             }
         }
+        if not cache:
+            opts['cache'] = False
         return await self._httpClient.request(opts)
 
     async def create_provisioning_profile(self, provisioning_profile: NewProvisioningProfileDto) -> Response:
@@ -1,7 +1,6 @@
-import responses
-import json
 import mock as mock
 import pytest
+from mock import AsyncMock
 from ..httpClient import HttpClient
 from .provisioningProfile_client import ProvisioningProfileClient
 
@@ -20,14 +19,15 @@ class TestProvisioningProfileClient:
             'version': 4,
             'status': 'active'
         }]
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.GET, f'{PROVISIONING_API_URL}/users/current/provisioning-profiles',
-                     json=expected, status=200)
-            profiles = await provisioning_client.get_provisioning_profiles(5, 'active')
-            assert rsps.calls[0].request.url == \
-                f'{PROVISIONING_API_URL}/users/current/provisioning-profiles?version=5&status=active'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert profiles == expected
+        httpClient.request = AsyncMock(return_value=expected)
+        profiles = await provisioning_client.get_provisioning_profiles(5, 'active')
+        httpClient.request.assert_called_with({
+            'url': f'{PROVISIONING_API_URL}/users/current/provisioning-profiles',
+            'method': 'GET',
+            'params': {'version': 5, 'status': 'active'},
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
+        assert profiles == expected
 
     @pytest.mark.asyncio
     async def test_not_retrieve_profiles_with_account_token(self):
@@ -49,14 +49,14 @@ class TestProvisioningProfileClient:
             'version': 4,
             'status': 'active'
         }
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.GET, f'{PROVISIONING_API_URL}/users/current/provisioning-profiles/id',
-                     json=expected, status=200)
-            profile = await provisioning_client.get_provisioning_profile('id')
-            assert rsps.calls[0].request.url == \
-                f'{PROVISIONING_API_URL}/users/current/provisioning-profiles/id'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert profile == expected
+        httpClient.request = AsyncMock(return_value=expected)
+        profile = await provisioning_client.get_provisioning_profile('id')
+        httpClient.request.assert_called_with({
+            'url': f'{PROVISIONING_API_URL}/users/current/provisioning-profiles/id',
+            'method': 'GET',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
+        assert profile == expected
 
     @pytest.mark.asyncio
     async def test_not_retrieve_profile_with_account_token(self):
@@ -79,14 +79,15 @@ class TestProvisioningProfileClient:
             'name': 'name',
             'version': 4,
         }
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.POST, f'{PROVISIONING_API_URL}/users/current/provisioning-profiles',
-                     json=expected, status=200)
-            id = await provisioning_client.create_provisioning_profile(profile)
-            assert rsps.calls[0].request.url == f'{PROVISIONING_API_URL}/users/current/provisioning-profiles'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert rsps.calls[0].request.body == json.dumps(profile).encode('utf-8')
-            assert id == expected
+        httpClient.request = AsyncMock(return_value=expected)
+        id = await provisioning_client.create_provisioning_profile(profile)
+        httpClient.request.assert_called_with({
+            'url': f'{PROVISIONING_API_URL}/users/current/provisioning-profiles',
+            'method': 'POST',
+            'headers': {'auth-token': 'header.payload.sign'},
+            'body': profile
+        })
+        assert id == expected
 
     @pytest.mark.asyncio
     async def test_not_create_profile_with_account_token(self):
@@ -102,15 +103,16 @@ class TestProvisioningProfileClient:
     @pytest.mark.asyncio
     async def test_upload_file(self):
         """Should upload file to a provisioning profile via API."""
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.PUT, f'{PROVISIONING_API_URL}/users/current/provisioning-profiles/id/servers.dat',
-                     status=204)
-            with mock.patch('__main__.open', new=mock.mock_open(read_data='test')) as file:
-                file.return_value = 'test', 'test2'
-                await provisioning_client.upload_provisioning_profile_file('id', 'servers.dat', file())
-                assert rsps.calls[0].request.url == \
-                    f'{PROVISIONING_API_URL}/users/current/provisioning-profiles/id/servers.dat'
-                assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
+        httpClient.request = AsyncMock(return_value=None)
+        with mock.patch('__main__.open', new=mock.mock_open(read_data='test')) as file:
+            file.return_value = 'test', 'test2'
+            await provisioning_client.upload_provisioning_profile_file('id', 'servers.dat', file())
+            httpClient.request.assert_called_with({
+                'method': 'PUT',
+                'url': f'{PROVISIONING_API_URL}/users/current/provisioning-profiles/id/servers.dat',
+                'files': {'file': ('test', 'test2')},
+                'headers': {'auth-token': 'header.payload.sign'}
+            })
 
     @pytest.mark.asyncio
     async def test_not_upload_file_with_account_token(self):
@@ -126,13 +128,13 @@ class TestProvisioningProfileClient:
     @pytest.mark.asyncio
     async def test_delete(self):
         """Should delete provisioning profile via API."""
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.DELETE, f'{PROVISIONING_API_URL}/users/current/provisioning-profiles/id',
-                     status=204)
-            await provisioning_client.delete_provisioning_profile('id')
-            assert rsps.calls[0].request.url == \
-                f'{PROVISIONING_API_URL}/users/current/provisioning-profiles/id'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
+        httpClient.request = AsyncMock(return_value=None)
+        await provisioning_client.delete_provisioning_profile('id')
+        httpClient.request.assert_called_with({
+            'url': f'{PROVISIONING_API_URL}/users/current/provisioning-profiles/id',
+            'method': 'DELETE',
+            'headers': {'auth-token': 'header.payload.sign'}
+        })
 
     @pytest.mark.asyncio
     async def test_not_delete_with_account_token(self):
@@ -148,14 +150,14 @@ class TestProvisioningProfileClient:
     @pytest.mark.asyncio
     async def test_update(self):
         """Should update provisioning profile via API."""
-        with responses.RequestsMock() as rsps:
-            rsps.add(responses.PUT, f'{PROVISIONING_API_URL}/users/current/provisioning-profiles/id',
-                     status=204)
-            await provisioning_client.update_provisioning_profile('id', {'name': 'new name'})
-            assert rsps.calls[0].request.url == \
-                   f'{PROVISIONING_API_URL}/users/current/provisioning-profiles/id'
-            assert rsps.calls[0].request.headers['auth-token'] == 'header.payload.sign'
-            assert rsps.calls[0].request.body == json.dumps({'name': 'new name'}).encode('utf-8')
+        httpClient.request = AsyncMock(return_value=None)
+        await provisioning_client.update_provisioning_profile('id', {'name': 'new name'})
+        httpClient.request.assert_called_with({
+            'url': f'{PROVISIONING_API_URL}/users/current/provisioning-profiles/id',
+            'method': 'PUT',
+            'headers': {'auth-token': 'header.payload.sign'},
+            'body': {'name': 'new name'}
+        })
 
     @pytest.mark.asyncio
     async def test_not_update_with_account_token(self):
@@ -141,6 +141,32 @@ class SynchronizationListener(ABC):
         """
         pass
 
+    async def on_history_orders_added(self, history_orders: List[MetatraderOrder]):
+        """Invoked when a batch of new MetaTrader history orders is added, e.g. during history synchronization. By
+        default invokes on_history_order_added for each order in turn.
+
+        Args:
+            history_orders: New MetaTrader history orders.
+
+        Returns:
+            A coroutine which resolves when the asynchronous event is processed.
+        """
+        for history_order in history_orders:
+            await self.on_history_order_added(history_order)
+
+    async def on_deals_added(self, deals: List[MetatraderDeal]):
+        """Invoked when a batch of new MetaTrader history deals is added, e.g. during history synchronization. By
+        default invokes on_deal_added for each deal in turn.
+
+        Args:
+            deals: New MetaTrader history deals.
+
+        Returns:
+            A coroutine which resolves when the asynchronous event is processed.
+        """
+        for deal in deals:
+            await self.on_deal_added(deal)
+
     async def on_deal_synchronization_finished(self, synchronization_id: str):
         """Invoked when a synchronization of history deals on a MetaTrader account have finished.
 
@@ -0,0 +1,149 @@
+from typing_extensions import TypedDict
+from typing import Optional, List, Dict
+from urllib.parse import urlparse
+import asyncio
+import re
+import time
+
+
+class RateLimitRule(TypedDict):
+    """Rate limit of an endpoint group."""
+
+    pattern: str
+    """Regular expression searched in request URLs, e.g. a host name or a path of an endpoint group."""
+    rate: float
+    """Number of requests per second."""
+    burst: Optional[int]
+    """Number of requests which can be sent at once after a period of inactivity, by default equals to rate rounded
+    up."""
+
+
+class TokenBucket:
+    """Token bucket which holds up to burst tokens and is refilled with rate tokens per second. Each request takes a
+    token, a request arriving at an empty bucket reserves the next token which will be added and waits for it, so that
+    requests are served in the order they arrived. The bucket is not refilled while it is paused, so that a pause
+    delays both new requests and the requests already waiting for a token."""
+
+    def __init__(self, rate: float, burst: int = None):
+        """Inits the token bucket.
+
+        Args:
+            rate: Number of tokens added per second.
+            burst: Capacity of the bucket, by default equals to rate rounded up.
+        """
+        self._rate = rate
+        self._burst = burst or max(1, int(-(-rate // 1)))
+        self._tokens = self._burst
+        self._updatedAt = time.monotonic()
+        self._pausedUntil = 0
+        self._pausedFor = 0
+
+    async def acquire(self) -> float:
+        """Takes a token from the bucket, waiting for it if the bucket is empty or paused.
+
+        Returns:
+            Time in seconds spent waiting for the token.
+        """
+        self._refill()
+        self._tokens -= 1
+        started_at = time.monotonic()
+        ready_at = max(started_at, self._pausedUntil) + max(-self._tokens, 0) / self._rate
+        paused_for = self._pausedFor
+        try:
+            while True:
+                if ready_at > time.monotonic():
+                    await asyncio.sleep(ready_at - time.monotonic())
+                if self._pausedFor == paused_for:
+                    break
+                ready_at += self._pausedFor - paused_for
+                paused_for = self._pausedFor
+        except asyncio.CancelledError:
+            self._tokens += 1
+            raise
+        return ready_at - started_at
+
+    def pause(self, delay: float):
+        """Pauses the bucket so that subsequent requests and requests already waiting for a token are delayed at
+        least for the specified time.
+
+        Args:
+            delay: Time in seconds.
+        """
+        self._refill()
+        now = time.monotonic()
+        paused_until = max(self._pausedUntil, now + delay)
+        self._pausedFor += paused_until - max(self._pausedUntil, now)
+        self._pausedUntil = paused_until
+        self._tokens = min(self._tokens, 0)
+
+    def _refill(self):
+        """Adds tokens accumulated since the last update outside of pauses to the bucket."""
+        now = time.monotonic()
+        elapsed = now - max(self._updatedAt, self._pausedUntil)
+        if elapsed > 0:
+            self._tokens = min(self._burst, self._tokens + elapsed * self._rate)
+        self._updatedAt = now
+
+
+class RateLimiter:
+    """Client-side rate limiter of HTTP requests. Requests matching a rule share a token bucket of the rule, other
+    requests share a token bucket of their host if a default rate is set."""
+
+    def __init__(self, rate: float = None, burst: int = None, rules: List[RateLimitRule] = None):
+        """Inits the rate limiter.
+
+        Args:
+            rate: Number of requests per second to a single host for requests which do not match any rule, by
+            default such requests are not limited.
+            burst: Number of requests to a single host which can be sent at once after a period of inactivity, by
+            default equals to rate rounded up.
+            rules: Rate limits of endpoint groups. The first rule which pattern is found in the request URL applies.
+        """
+        self._rate = rate
+        self._burst = burst
+        self._rules = [(re.compile(rule['pattern']), TokenBucket(rule['rate'], rule.get('burst')))
+                       for rule in (rules or [])]
+        self._hostBuckets: Dict[str, TokenBucket] = {}
+
+    async def acquire(self, url: str) -> float:
+        """Waits until a request to the URL can be sent without exceeding the rate limit.
+
+        Args:
+            url: Request URL.
+
+        Returns:
+            Time in seconds spent waiting.
+        """
+        bucket = self._get_bucket(url)
+        return await bucket.acquire() if bucket is not None else 0
+
+    def pause(self, url: str, delay: float):
+        """Delays subsequent requests limited together with the URL, e.g. when the server responded that the rate
+        limit is exceeded.
+
+        Args:
+            url: Request URL.
+            delay: Time in seconds.
+        """
+        bucket = self._get_bucket(url)
+        if bucket is not None:
+            bucket.pause(delay)
+
+    def _get_bucket(self, url: str) -> Optional[TokenBucket]:
+        """Returns the token bucket limiting requests to the URL.
+
+        Args:
+            url: Request URL.
+
+        Returns:
+            Token bucket or None if requests to the URL are not limited.
+        """
+        for pattern, bucket in self._rules:
+            if pattern.search(url):
+                return bucket
+        if self._rate is None:
+            return None
+        host = urlparse(url).netloc
+        if host not in self._hostBuckets:
+            self._hostBuckets[host] = TokenBucket(self._rate, self._burst)
+        return self._hostBuckets[host]
@@ -0,0 +1,122 @@
+from .rateLimiter import RateLimiter, TokenBucket
+from mock import patch, AsyncMock
+import asyncio
+import pytest
+
+now = 0
+
+
+def monotonic():
+    return now
+
+
+async def sleep(delay):
+    global now
+    now += delay
+
+
+@pytest.fixture(autouse=True)
+async def run_around_tests():
+    global now
+    now = 0
+    with patch('lib.clients.rateLimiter.time.monotonic', new=monotonic):
+        with patch('lib.clients.rateLimiter.asyncio.sleep', new=sleep):
+            yield
+
+
+class TestTokenBucket:
+
+    @pytest.mark.asyncio
+    async def test_allow_burst(self):
+        """Should allow burst of requests without waiting"""
+        bucket = TokenBucket(2, 3)
+        assert [await bucket.acquire() for i in range(3)] == [0, 0, 0]
+
+    @pytest.mark.asyncio
+    async def test_queue_requests_in_order(self):
+        """Should make requests over the limit wait for tokens in order of arrival"""
+        bucket = TokenBucket(2, 1)
+        await bucket.acquire()
+        with patch('lib.clients.rateLimiter.asyncio.sleep', new=AsyncMock()):
+            delays = await asyncio.gather(*[bucket.acquire() for i in range(3)])
+        assert delays == [0.5, 1, 1.5]
+
+    @pytest.mark.asyncio
+    async def test_refill(self):
+        """Should refill bucket up to its capacity"""
+        global now
+        bucket = TokenBucket(10)
+        for i in range(10):
+            await bucket.acquire()
+        now += 0.5
+        assert [await bucket.acquire() for i in range(5)] == [0] * 5
+        assert await bucket.acquire() == pytest.approx(0.1)
+        now += 100
+        assert [await bucket.acquire() for i in range(10)] == [0] * 10
+
+    @pytest.mark.asyncio
+    async def test_return_token_on_cancel(self):
+        """Should return reserved token if waiting is cancelled"""
+        bucket = TokenBucket(1, 1)
+        await bucket.acquire()
+
+        async def cancelled_sleep(delay):
+            raise asyncio.CancelledError()
+
+        with patch('lib.clients.rateLimiter.asyncio.sleep', new=cancelled_sleep):
+            with pytest.raises(asyncio.CancelledError):
+                await bucket.acquire()
+        assert await bucket.acquire() == 1
+
+    @pytest.mark.asyncio
+    async def test_pause(self):
+        """Should delay subsequent requests when paused"""
+        bucket = TokenBucket(1, 5)
+        bucket.pause(3)
+        assert await bucket.acquire() == 4
+
+    @pytest.mark.asyncio
+    async def test_delay_waiting_requests_when_paused(self):
+        """Should delay requests already waiting for a token when paused"""
+        global now
+        bucket = TokenBucket(1, 1)
+        await bucket.acquire()
+
+        async def pausing_sleep(delay):
+            global now
+            if now == 0:
+                bucket.pause(5)
+            now += delay
+
+        with patch('lib.clients.rateLimiter.asyncio.sleep', new=pausing_sleep):
+            assert await bucket.acquire() == 6
+        assert now == 6
+        assert await bucket.acquire() == 1
+
+
+class TestRateLimiter:
+
+    @pytest.mark.asyncio
+    async def test_limit_endpoint_groups(self):
+        """Should limit requests matching a rule with a bucket of the rule"""
+        limiter = RateLimiter(rules=[{'pattern': r'/users/current/accounts/[^/]+/trade', 'rate': 1, 'burst': 1}])
+        assert await limiter.acquire('https://host/users/current/accounts/a/trade') == 0
+        assert await limiter.acquire('https://host/users/current/accounts/b/trade') == 1
+        assert await limiter.acquire('https://host/users/current/accounts') == 0
+        assert await limiter.acquire('https://host/users/current/accounts') == 0
+
+    @pytest.mark.asyncio
+    async def test_limit_hosts(self):
+        """Should limit requests to each host with a separate bucket if default rate is set"""
+        limiter = RateLimiter(rate=2, burst=1)
+        assert await limiter.acquire('https://host1/path') == 0
+        assert await limiter.acquire('https://host2/path') == 0
+        assert await limiter.acquire('https://host1/other') == 0.5
+
+    @pytest.mark.asyncio
+    async def test_pause(self):
+        """Should pause the bucket of the URL"""
+        limiter = RateLimiter(rate=1, burst=1)
+        limiter.pause('https://host1/path', 2)
+        assert await limiter.acquire('https://host2/path') == 0
+        assert await limiter.acquire('https://host1/path') == 3
@@ -0,0 +1,40 @@
+from abc import ABC, abstractmethod
+from typing_extensions import TypedDict
+from typing import Optional
+
+
+class RequestAttempt(TypedDict):
+    """HTTP request attempt."""
+
+    method: str
+    """Request method."""
+    url: str
+    """Request URL."""
+    attempt: int
+    """Number of the attempt, starting from 1."""
+    status: Optional[int]
+    """Response status or None if no response was received."""
+    error: Optional[Exception]
+    """Error which prevented a response from being received."""
+    latency: float
+    """Time in seconds from sending the request to receiving the response or the error."""
+    rateLimitDelay: float
+    """Time in seconds the attempt waited for the rate limiter before it was sent."""
+    retryDelay: Optional[float]
+    """Delay in seconds before the request is retried or None if the attempt is the last one."""
+
+
+class RequestListener(ABC):
+    """Defines interface for an HTTP request listener class."""
+
+    @abstractmethod
+    async def on_request_attempt(self, attempt: RequestAttempt):
+        """Invoked when an attempt to send an HTTP request is completed.
+
+        Args:
+            attempt: Request attempt.
+
+        Returns:
+            A coroutine which resolves when the asynchronous event is processed.
+        """
+        pass
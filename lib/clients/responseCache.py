@@ -0,0 +1,169 @@
+from typing_extensions import TypedDict
+from typing import List, Tuple, Callable, Awaitable, Optional
+from urllib.parse import urlparse
+from collections import OrderedDict
+import aiohttp
+import re
+import time
+
+
+class CacheRule(TypedDict):
+    """Caching rule of an endpoint group."""
+
+    pattern: str
+    """Regular expression searched in request URLs."""
+    ttl: float
+    """Time in seconds a response is used without contacting the server. After that the response is revalidated
+    with If-None-Match header if the server returned an ETag for it, or requested again otherwise."""
+
+
+DEFAULT_CACHE_RULES: List[CacheRule] = [
+    {'pattern': r'/users/current/accounts(/[^/]+)?$', 'ttl': 5},
+    {'pattern': r'/users/current/provisioning-profiles(/[^/]+)?$', 'ttl': 5}
+]
+"""Caching rules of MetaApi provisioning API reads."""
+
+
+class CacheEntry(TypedDict):
+    """Cached response."""
+
+    response: aiohttp.ClientResponse
+    """Response with the body read."""
+    body: bytes
+    """Response body."""
+    etag: Optional[str]
+    """ETag of the response."""
+    expiresAt: float
+    """Monotonic time after which the response has to be revalidated."""
+    path: str
+    """URL of the request without query, used to invalidate the response."""
+
+
+class ResponseCache:
+    """Cache of successful responses to GET requests matching caching rules. Any other request invalidates cached
+    responses of the same resource, i.e. of its URL, the URLs it is nested in and the URLs nested in it, so that
+    deploying, updating or deleting an account invalidates both the account and the account list. Requests with the
+    cache option set to False, e.g. account and provisioning profile reloads which poll for a state change, always
+    reach the server."""
+
+    def __init__(self, rules: List[CacheRule] = None, max_entries: int = 1000):
+        """Inits the response cache.
+
+        Args:
+            rules: Caching rules. The first rule which pattern is found in the request URL applies, requests not
+            matching any rule are not cached. By default accounts and provisioning profiles are cached for 5 seconds.
+            max_entries: Maximum number of cached responses, the least recently used responses are evicted first.
+        """
+        self._rules = [(re.compile(rule['pattern']), rule['ttl'])
+                       for rule in (rules if rules is not None else DEFAULT_CACHE_RULES)]
+        self._maxEntries = max_entries
+        self._entries: 'OrderedDict[tuple, CacheEntry]' = OrderedDict()
+        self._generation = 0
+
+    async def request(self, options: dict, send: Callable[[dict], Awaitable[Tuple[aiohttp.ClientResponse, bytes]]]) \
+            -> Tuple[aiohttp.ClientResponse, bytes]:
+        """Serves a request from the cache or sends it to the server.
+
+        Args:
+            options: Request options.
+            send: Function which sends a request to the server and returns the response and the response body.
+
+        Returns:
+            Tuple of the response and the response body.
+        """
+        method = options['method'] if ('method' in options) else 'GET'
+        if method.upper() != 'GET':
+            try:
+                return await send(options)
+            finally:
+                self.invalidate(options['url'])
+        ttl = self._get_ttl(options['url'])
+        if ttl is None:
+            return await send(options)
+        key = self._get_key(options)
+        entry = self._entries.get(key) if options.get('cache', True) else None
+        if entry is not None:
+            self._entries.move_to_end(key)
+            if entry['expiresAt'] > time.monotonic():
+                return entry['response'], entry['body']
+            if entry['etag'] is not None:
+                options = dict(options, headers=dict(options.get('headers') or {}, **{'If-None-Match': entry['etag']}))
+        generation = self._generation
+        response, body = await send(options)
+        if response.status == 304 and entry is not None:
+            if generation == self._generation:
+                entry['expiresAt'] = time.monotonic() + ttl
+            return entry['response'], entry['body']
+        if response.status == 200 and generation == self._generation:
+            self._entries[key] = {'response': response, 'body': body, 'etag': response.headers.get('ETag'),
+                                  'expiresAt': time.monotonic() + ttl, 'path': self._get_path(options['url'])}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._maxEntries:
+                self._entries.popitem(last=False)
+        return response, body
+
+    def invalidate(self, url: str = None):
+        """Removes cached responses of a resource.
+
+        Args:
+            url: Resource URL, by default all cached responses are removed.
+        """
+        self._generation += 1
+        if url is None:
+            self._entries.clear()
+            return
+        path = self._get_path(url)
+        for key in [key for key, entry in self._entries.items()
+                    if self._is_nested(entry['path'], path) or self._is_nested(path, entry['path'])]:
+            del self._entries[key]
+
+    def _get_ttl(self, url: str) -> Optional[float]:
+        """Returns the time to live of responses to requests to the URL.
+
+        Args:
+            url: Request URL.
+
+        Returns:
+            Time to live in seconds or None if responses are not cached.
+        """
+        for pattern, ttl in self._rules:
+            if pattern.search(url):
+                return ttl
+        return None
+
+    def _get_key(self, options: dict) -> tuple:
+        """Returns the cache key of a request. Headers and query parameters are a part of the key, so that responses
+        are not shared between auth tokens.
+
+        Args:
+            options: Request options.
+
+        Returns:
+            Cache key.
+        """
+        return (options['url'], tuple((name, repr(value)) for name, value in (options.get('params') or {}).items()),
+                tuple(sorted((options.get('headers') or {}).items())))
+
+    def _get_path(self, url: str) -> str:
+        """Returns the URL of a resource without query and trailing slash.
+
+        Args:
+            url: Request URL.
+
+        Returns:
+            Resource URL.
+        """
+        parsed = urlparse(url)
+        return f'{parsed.scheme}://{parsed.netloc}{parsed.path.rstrip("/")}'
+
+    def _is_nested(self, path: str, parent: str) -> bool:
+        """Checks if a resource is the parent resource or is nested in it.
+
+        Args:
+            path: Resource URL.
+            parent: Parent resource URL.
+
+        Returns:
+            True if the resource is nested in the parent resource.
+        """
+        return path == parent or path.startswith(parent + '/')
@@ -0,0 +1,143 @@
+from .responseCache import ResponseCache
+from mock import patch, AsyncMock, MagicMock
+import asyncio
+import pytest
+
+cache: ResponseCache = None
+send: AsyncMock = None
+now = 0
+accounts_url = 'https://host/users/current/accounts'
+
+
+def monotonic():
+    return now
+
+
+def create_response(status=200, etag=None):
+    response = MagicMock()
+    response.status = status
+    response.headers = {'ETag': etag} if etag else {}
+    return response
+
+
+@pytest.fixture(autouse=True)
+async def run_around_tests():
+    global cache, send, now
+    now = 0
+    cache = ResponseCache()
+    send = AsyncMock(side_effect=lambda opts: (create_response(), b'[]'))
+    with patch('lib.clients.responseCache.time.monotonic', new=monotonic):
+        yield
+
+
+class TestResponseCache:
+
+    @pytest.mark.asyncio
+    async def test_cache_get_requests(self):
+        """Should serve GET requests from cache until TTL expires"""
+        global now
+        opts = {'url': accounts_url, 'method': 'GET', 'headers': {'auth-token': 'token'}}
+        response, body = await cache.request(opts, send)
+        assert await cache.request(opts, send) == (response, body)
+        assert send.call_count == 1
+        now = 5.1
+        await cache.request(opts, send)
+        assert send.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_bypass_cache(self):
+        """Should send requests with cache option disabled to the server and cache their responses"""
+        opts = {'url': f'{accounts_url}/id', 'method': 'GET'}
+        await cache.request(opts, send)
+        response, body = await cache.request(dict(opts, cache=False), send)
+        assert send.call_count == 2
+        assert 'If-None-Match' not in (send.call_args[0][0].get('headers') or {})
+        assert await cache.request(opts, send) == (response, body)
+        assert send.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_not_cache_other_requests(self):
+        """Should not cache requests not matching rules, failed responses and responses of other tokens"""
+        opts = {'url': 'https://host/users/current/accounts/id/deploy', 'method': 'GET'}
+        await cache.request(opts, send)
+        await cache.request(opts, send)
+        assert send.call_count == 2
+        opts = {'url': accounts_url, 'method': 'GET', 'headers': {'auth-token': 'token'}}
+        await cache.request(opts, send)
+        await cache.request(dict(opts, headers={'auth-token': 'token2'}), send)
+        await cache.request(dict(opts, params={'state': ['DEPLOYED']}), send)
+        assert send.call_count == 5
+        send.side_effect = lambda opts: (create_response(500), b'')
+        opts = {'url': f'{accounts_url}/id'}
+        await cache.request(opts, send)
+        await cache.request(opts, send)
+        assert send.call_count == 7
+
+    @pytest.mark.asyncio
+    async def test_revalidate_with_etag(self):
+        """Should revalidate expired response with If-None-Match header"""
+        global now
+        send.side_effect = lambda opts: (create_response(etag='"v1"'), b'{"_id": "id"}')
+        opts = {'url': f'{accounts_url}/id', 'headers': {'auth-token': 'token'}}
+        response, body = await cache.request(opts, send)
+        now = 10
+        send.side_effect = lambda opts: (create_response(304), b'')
+        assert await cache.request(opts, send) == (response, body)
+        assert send.call_args[0][0]['headers'] == {'auth-token': 'token', 'If-None-Match': '"v1"'}
+        assert opts['headers'] == {'auth-token': 'token'}
+        assert await cache.request(opts, send) == (response, body)
+        assert send.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidate_on_mutation(self):
+        """Should invalidate cached responses of the resource on mutating requests"""
+        profiles_url = 'https://host/users/current/provisioning-profiles'
+        for url in [accounts_url, f'{accounts_url}/id', f'{accounts_url}/id2', profiles_url]:
+            await cache.request({'url': url}, send)
+        await cache.request({'url': f'{accounts_url}/id/deploy', 'method': 'POST'}, send)
+        send.reset_mock()
+        for url in [accounts_url, f'{accounts_url}/id', f'{accounts_url}/id2', profiles_url]:
+            await cache.request({'url': url}, send)
+        assert [call[0][0]['url'] for call in send.call_args_list] == [accounts_url, f'{accounts_url}/id']
+
+    @pytest.mark.asyncio
+    async def test_invalidate_on_failed_mutation(self):
+        """Should invalidate cached responses if mutating request failed"""
+        await cache.request({'url': f'{accounts_url}/id'}, send)
+        with pytest.raises(Exception):
+            await cache.request({'url': f'{accounts_url}/id', 'method': 'DELETE'},
+                                AsyncMock(side_effect=Exception('error')))
+        await cache.request({'url': f'{accounts_url}/id'}, send)
+        assert send.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_not_store_response_read_during_mutation(self):
+        """Should not store response of a request sent before concurrent mutation completed"""
+        read_sent = asyncio.Event()
+        mutated = asyncio.Event()
+
+        async def slow_send(opts):
+            read_sent.set()
+            await mutated.wait()
+            return create_response(), b'[]'
+
+        async def mutate():
+            await read_sent.wait()
+            await cache.request({'url': f'{accounts_url}/id', 'method': 'PUT'}, send)
+            mutated.set()
+
+        await asyncio.gather(cache.request({'url': f'{accounts_url}/id'}, slow_send), mutate())
+        send.reset_mock()
+        await cache.request({'url': f'{accounts_url}/id'}, send)
+        assert send.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_evict_least_recently_used(self):
+        """Should evict least recently used responses"""
+        cache = ResponseCache(max_entries=2)
+        for url in [f'{accounts_url}/1', f'{accounts_url}/2', f'{accounts_url}/1', f'{accounts_url}/3']:
+            await cache.request({'url': url}, send)
+        send.reset_mock()
+        await cache.request({'url': f'{accounts_url}/1'}, send)
+        await cache.request({'url': f'{accounts_url}/2'}, send)
+        assert [call[0][0]['url'] for call in send.call_args_list] == [f'{accounts_url}/2']
@@ -0,0 +1,133 @@
+from .timeoutException import TimeoutException
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Optional, Iterable
+import aiohttp
+import pytz
+import random
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+"""HTTP methods which can be repeated without changing the result of the request."""
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+"""HTTP statuses of responses to transient errors."""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses the value of a Retry-After response header.
+
+    Args:
+        value: Header value, number of seconds or HTTP date.
+
+    Returns:
+        Number of seconds to wait before retrying or None if the value is missing or invalid.
+    """
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(pytz.utc)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Decides whether failed HTTP requests are retried and how long to wait before each retry. Requests are retried
+    with exponential backoff and jitter, honoring the Retry-After header of the server. Requests with idempotent
+    methods are retried on transient errors. Requests with other methods are only retried if the server is known not
+    to have processed them, i.e. on 429 status or if the connection could not be established. Timed out requests are
+    not retried.
+
+    The number of retries is limited by a retry budget shared by all requests, so that an outage does not multiply
+    the load on the server. The budget holds up to retry_budget retries and each request adds retry_budget_ratio
+    retries to it."""
+
+    def __init__(self, max_retries: int = 3, min_delay: float = 0.5, max_delay: float = 60,
+                 retry_statuses: Iterable[int] = RETRY_STATUSES, idempotent_methods: Iterable[str] = IDEMPOTENT_METHODS,
+                 retry_budget: float = 10, retry_budget_ratio: float = 0.2):
+        """Inits the retry policy instance.
+
+        Args:
+            max_retries: Maximum number of retries of a request, default is 3. Set to 0 to disable retries.
+            min_delay: Delay in seconds before the first retry, doubled for each subsequent retry. Default is 0.5.
+            max_delay: Maximum delay in seconds before a retry, default is 60. Requests the server asks to retry
+            later than that are not retried.
+            retry_statuses: Response statuses which are retried, default is 429, 500, 502, 503 and 504.
+            idempotent_methods: Methods which are retried on any of retry statuses and on lost connections, default
+            is GET, HEAD, OPTIONS, PUT and DELETE.
+            retry_budget: Maximum number of retries the budget can hold, default is 10.
+            retry_budget_ratio: Number of retries added to the budget by each request, default is 0.2.
+        """
+        self._maxRetries = max_retries
+        self._minDelay = min_delay
+        self._maxDelay = max_delay
+        self._retryStatuses = set(retry_statuses)
+        self._idempotentMethods = set(method.upper() for method in idempotent_methods)
+        self._retryBudget = retry_budget
+        self._retryBudgetRatio = retry_budget_ratio
+        self._budget = retry_budget
+
+    @property
+    def budget(self) -> float:
+        """Returns number of retries left in the retry budget.
+
+        Returns:
+            Number of retries available.
+        """
+        return self._budget
+
+    def record_request(self):
+        """Adds retries to the retry budget for a new request."""
+        self._budget = min(self._budget + self._retryBudgetRatio, self._retryBudget)
+
+    def get_retry_delay(self, method: str, attempt: int, status: int = None, retry_after: float = None,
+                        error: Exception = None) -> Optional[float]:
+        """Decides whether a failed request attempt is retried, taking a retry from the retry budget if it is.
+
+        Args:
+            method: Request method.
+            attempt: Number of the failed attempt, starting from 1.
+            status: Response status or None if no response was received.
+            retry_after: Delay in seconds from the Retry-After header of the response.
+            error: Error which prevented a response from being received.
+
+        Returns:
+            Delay in seconds before the retry or None if the request is not retried.
+        """
+        if attempt > self._maxRetries or not self._is_retryable(method.upper(), status, error):
+            return None
+        if retry_after is not None:
+            if retry_after > self._maxDelay:
+                return None
+            delay = retry_after
+        else:
+            backoff = min(self._maxDelay, self._minDelay * 2 ** (attempt - 1))
+            delay = backoff / 2 + random.uniform(0, backoff / 2)
+        if self._budget < 1:
+            return None
+        self._budget -= 1
+        return delay
+
+    def _is_retryable(self, method: str, status: Optional[int], error: Optional[Exception]) -> bool:
+        """Checks if a failed request attempt can be retried.
+
+        Args:
+            method: Request method in upper case.
+            status: Response status or None if no response was received.
+            error: Error which prevented a response from being received.
+
+        Returns:
+            True if the request can be retried.
+        """
+        if error is not None:
+            if isinstance(error, TimeoutException):
+                return False
+            if isinstance(error, aiohttp.ClientConnectorError):
+                return True
+            return isinstance(error, aiohttp.ClientConnectionError) and method in self._idempotentMethods
+        if status not in self._retryStatuses:
+            return False
+        return status == 429 or method in self._idempotentMethods
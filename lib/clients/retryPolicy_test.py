@@ -0,0 +1,74 @@
+from .retryPolicy import RetryPolicy, parse_retry_after
+from .timeoutException import TimeoutException
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from mock import MagicMock
+import aiohttp
+import pytest
+
+policy: RetryPolicy = None
+
+
+@pytest.fixture(autouse=True)
+async def run_around_tests():
+    global policy
+    policy = RetryPolicy()
+    yield
+
+
+class TestRetryPolicy:
+
+    def test_backoff_exponentially(self):
+        """Should double retry delay for each attempt with jitter"""
+        for attempt, backoff in [(1, 0.5), (2, 1), (3, 2)]:
+            delay = policy.get_retry_delay('GET', attempt, 503)
+            assert backoff / 2 <= delay <= backoff
+
+    def test_limit_retries(self):
+        """Should not retry after max retries"""
+        assert policy.get_retry_delay('GET', 4, 503) is None
+        assert RetryPolicy(max_retries=0).get_retry_delay('GET', 1, 503) is None
+
+    def test_limit_delay(self):
+        """Should limit retry delay by max delay"""
+        policy = RetryPolicy(max_retries=20, max_delay=5)
+        assert 2.5 <= policy.get_retry_delay('GET', 10, 503) <= 5
+
+    def test_apply_idempotency_rules(self):
+        """Should retry non-idempotent requests only if they were not processed"""
+        assert policy.get_retry_delay('put', 1, 500) is not None
+        assert policy.get_retry_delay('POST', 1, 500) is None
+        assert policy.get_retry_delay('POST', 1, 429) is not None
+        assert policy.get_retry_delay('GET', 1, 404) is None
+        connector_error = aiohttp.ClientConnectorError(MagicMock(), OSError())
+        assert policy.get_retry_delay('POST', 1, error=connector_error) is not None
+        assert policy.get_retry_delay('POST', 1, error=aiohttp.ServerDisconnectedError()) is None
+        assert policy.get_retry_delay('GET', 1, error=aiohttp.ServerDisconnectedError()) is not None
+        assert policy.get_retry_delay('GET', 1, error=TimeoutException('timeout')) is None
+
+    def test_honor_retry_after(self):
+        """Should use delay from Retry-After header unless it exceeds max delay"""
+        assert policy.get_retry_delay('POST', 1, 429, 10) == 10
+        assert policy.get_retry_delay('POST', 1, 429, 61) is None
+
+    def test_limit_retries_by_budget(self):
+        """Should stop retrying when retry budget is exhausted and refill it with requests"""
+        policy = RetryPolicy(retry_budget=2, retry_budget_ratio=0.5)
+        assert policy.get_retry_delay('GET', 1, 503) is not None
+        assert policy.get_retry_delay('GET', 1, 503) is not None
+        assert policy.get_retry_delay('GET', 1, 503) is None
+        policy.record_request()
+        policy.record_request()
+        assert policy.budget == 1
+        assert policy.get_retry_delay('GET', 1, 503) is not None
+        for i in range(10):
+            policy.record_request()
+        assert policy.budget == 2
+
+    def test_parse_retry_after(self):
+        """Should parse Retry-After header"""
+        assert parse_retry_after('120') == 120
+        assert parse_retry_after(None) is None
+        assert parse_retry_after('invalid') is None
+        date = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+        assert 28 <= parse_retry_after(date) <= 30
@@ -1,21 +1,40 @@
-from ..clients.httpClient import HttpClient
+from ..clients.httpClient import HttpClient, run_until_closed
+from ..clients.retryPolicy import RetryPolicy
+from ..clients.rateLimiter import RateLimiter
+from ..clients.responseCache import ResponseCache
+from ..clients.requestListener import RequestListener
 from ..clients.copyFactory.configuration_client import ConfigurationClient
 from ..clients.copyFactory.history_client import HistoryClient
 from ..clients.copyFactory.trading_client import TradingClient
+from typing import Optional
+import asyncio
 
 
 class CopyFactory:
     """MetaApi CopyFactory copy trading API SDK"""
 
-    def __init__(self, token: str, domain: str = 'agiliumtrade.agiliumtrade.ai', request_timeout: float = 60):
+    def __init__(self, token: str, domain: str = 'agiliumtrade.agiliumtrade.ai', request_timeout: float = 60,
+                 max_connections_per_host: int = 0,
+                 retry_policy: RetryPolicy = None, rate_limiter: RateLimiter = None,
+                 response_cache: ResponseCache = None):
         """Inits CopyFactory class instance.
 
         Args:
             token: Authorization token.
             domain: Domain to connect to.
             request_timeout: Timeout for http requests in seconds.
+            max_connections_per_host: Maximum number of pooled HTTP connections to a single host, default is 0
+            which means no limit.
+            retry_policy: Policy of retrying failed http requests, by default requests are retried with default
+            options of RetryPolicy.
+            rate_limiter: Client-side rate limiter of http requests shared by all API clients, by default requests
+            are not limited.
+            response_cache: Cache of http responses shared by all API clients, by default responses are not cached.
         """
-        http_client = HttpClient(request_timeout)
+        http_client = HttpClient(request_timeout, max_connections_per_host=max_connections_per_host,
+                                 retry_policy=retry_policy, rate_limiter=rate_limiter,
+                                 response_cache=response_cache)
+        self._httpClient = http_client
         self._configurationClient = ConfigurationClient(http_client, token, domain)
         self._historyClient = HistoryClient(http_client, token, domain)
         self._tradingClient = TradingClient(http_client, token, domain)
@@ -46,3 +65,29 @@ class CopyFactory:
             History API.
         """
         return self._tradingClient
+
+    def add_request_listener(self, listener: RequestListener):
+        """Adds listener which is notified about each attempt of a REST API request.
+
+        Args:
+            listener: Request listener to add.
+        """
+        self._httpClient.add_request_listener(listener)
+
+    def remove_request_listener(self, listener: RequestListener):
+        """Removes request listener.
+
+        Args:
+            listener: Listener to remove.
+        """
+        self._httpClient.remove_request_listener(listener)
+
+    def close(self) -> Optional['asyncio.Future']:
+        """Closes pooled HTTP connections. If the event loop is not running, e.g. the method is invoked after the
+        application has finished, the connections are closed before the method returns.
+
+        Returns:
+            If the event loop is running, a future which resolves when the connections are closed. It can be awaited
+            to make sure the connections are released, e.g. before the event loop is closed.
+        """
+        return run_until_closed(self._httpClient.close())
@@ -0,0 +1,158 @@
+from ..clients.metaApi.synchronizationListener import SynchronizationListener
+from ..clients.errorHandler import ValidationException
+from .barListener import BarListener
+from .models import MetatraderSymbolPrice, MetatraderBar, date
+from .ringBuffer import RingBuffer
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import pytz
+import re
+
+TIMEFRAME_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def timeframe_seconds(timeframe: str) -> int:
+    """Converts a timeframe string such as 1s, 5m, 1h or 1d to its duration in seconds.
+
+    Args:
+        timeframe: Timeframe string.
+
+    Returns:
+        Timeframe duration in seconds.
+    """
+    match = re.fullmatch(r'(\d+)([smhd])', timeframe or '')
+    if not match or not int(match.group(1)):
+        raise ValidationException(f'Invalid timeframe {timeframe}, expected a positive number followed by s, m, h '
+                                  'or d, e.g. 1m')
+    return int(match.group(1)) * TIMEFRAME_UNITS[match.group(2)]
+
+
+class BarBuffer(RingBuffer):
+    """Fixed-capacity ring buffer of closed bars. Stores bar open time as a POSIX timestamp in seconds, open, high,
+    low, close and tickVolume fields."""
+
+    FIELDS = ('time', 'open', 'high', 'low', 'close', 'tickVolume')
+    """Names of the bar fields stored."""
+
+    def __init__(self, capacity: int):
+        """Inits the bar buffer instance.
+
+        Args:
+            capacity: Maximum number of bars to keep.
+        """
+        super().__init__(self.FIELDS, capacity)
+
+
+class BarAggregator(SynchronizationListener):
+    """Aggregates OHLC bars of chosen symbols and timeframes from symbol bid prices. Add the aggregator to a
+    connection via MetaApiConnection.add_synchronization_listener. A bar is closed when the first tick of a later
+    bar arrives, ticks older than the open bar are ignored. Bar times are aligned to UTC."""
+
+    def __init__(self, symbols: List[str], timeframes: List[str], history_size: int = 1000):
+        """Inits the bar aggregator instance.
+
+        Args:
+            symbols: Symbols to aggregate bars for.
+            timeframes: Timeframes to aggregate bars for, e.g. 1s, 1m, 5m.
+            history_size: Maximum number of closed bars to keep per symbol and timeframe, default is 1000.
+        """
+        super().__init__()
+        self._symbols = set(symbols)
+        self._timeframes = [(timeframe, timeframe_seconds(timeframe)) for timeframe in timeframes]
+        self._history: Dict[Tuple[str, str], BarBuffer] = {}
+        for symbol in self._symbols:
+            for timeframe, seconds in self._timeframes:
+                self._history[(symbol, timeframe)] = BarBuffer(history_size)
+        self._openBars: Dict[Tuple[str, str], list] = {}
+        self._listeners: List[BarListener] = []
+
+    def add_listener(self, listener: BarListener):
+        """Adds bar listener.
+
+        Args:
+            listener: Bar listener to add.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: BarListener):
+        """Removes bar listener.
+
+        Args:
+            listener: Bar listener to remove.
+        """
+        self._listeners = list(filter(lambda item: item != listener, self._listeners))
+
+    def history(self, symbol: str, timeframe: str) -> Optional[BarBuffer]:
+        """Returns closed bars of a symbol and timeframe.
+
+        Args:
+            symbol: Symbol (e.g. currency pair or an index).
+            timeframe: Timeframe, e.g. 1m.
+
+        Returns:
+            Buffer of closed bars or None if the symbol and timeframe are not aggregated.
+        """
+        return self._history.get((symbol, timeframe))
+
+    def current_bar(self, symbol: str, timeframe: str) -> Optional[MetatraderBar]:
+        """Returns the bar which is not closed yet.
+
+        Args:
+            symbol: Symbol (e.g. currency pair or an index).
+            timeframe: Timeframe, e.g. 1m.
+
+        Returns:
+            Open bar or None if no ticks were received for the symbol and timeframe.
+        """
+        bar = self._openBars.get((symbol, timeframe))
+        return self._to_bar(symbol, timeframe, bar) if bar else None
+
+    async def on_symbol_price_updated(self, price: MetatraderSymbolPrice):
+        """Invoked when a symbol price was updated.
+
+        Args:
+            price: Updated MetaTrader symbol price.
+        """
+        symbol = price['symbol']
+        if symbol not in self._symbols or 'bid' not in price:
+            return
+        time = price['time'] if 'time' in price else datetime.now()
+        if isinstance(time, str):
+            time = date(time)
+        timestamp = time.timestamp()
+        value = price['bid']
+        for timeframe, seconds in self._timeframes:
+            key = (symbol, timeframe)
+            start = timestamp - timestamp % seconds
+            bar = self._openBars.get(key)
+            if bar is None or start > bar[0]:
+                self._openBars[key] = [start, value, value, value, value, 1]
+                if bar is not None:
+                    self._history[key].append(*bar)
+                    await self._fire_bar_closed(self._to_bar(symbol, timeframe, bar))
+            elif start == bar[0]:
+                if value > bar[2]:
+                    bar[2] = value
+                if value < bar[3]:
+                    bar[3] = value
+                bar[4] = value
+                bar[5] += 1
+
+    def _to_bar(self, symbol: str, timeframe: str, bar: list) -> MetatraderBar:
+        return {
+            'symbol': symbol,
+            'timeframe': timeframe,
+            'time': datetime.fromtimestamp(bar[0], pytz.UTC),
+            'open': bar[1],
+            'high': bar[2],
+            'low': bar[3],
+            'close': bar[4],
+            'tickVolume': bar[5]
+        }
+
+    async def _fire_bar_closed(self, bar: MetatraderBar):
+        for listener in self._listeners:
+            try:
+                await listener.on_bar_closed(bar)
+            except Exception as err:
+                print(f'[{datetime.now().isoformat()}] Failed to notify listener about closed bar', err)
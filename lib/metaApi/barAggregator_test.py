@@ -0,0 +1,83 @@
+from .barAggregator import BarAggregator, timeframe_seconds
+from .barListener import BarListener
+from .models import date
+from mock import AsyncMock
+import pytest
+aggregator = None
+
+
+class MockListener(BarListener):
+    async def on_bar_closed(self, bar):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests():
+    global aggregator
+    aggregator = BarAggregator(['EURUSD'], ['1m', '5m'], 2)
+    yield
+
+
+class TestBarAggregator:
+
+    def test_parse_timeframes(self):
+        """Should parse timeframes."""
+        assert timeframe_seconds('1s') == 1
+        assert timeframe_seconds('5m') == 300
+        assert timeframe_seconds('4h') == 14400
+        assert timeframe_seconds('1d') == 86400
+        with pytest.raises(Exception):
+            timeframe_seconds('0m')
+        with pytest.raises(Exception):
+            timeframe_seconds('1w')
+
+    @pytest.mark.asyncio
+    async def test_update_open_bar(self):
+        """Should update open bar on tick."""
+        await aggregator.on_symbol_price_updated({'symbol': 'EURUSD', 'bid': 1.1,
+                                                  'time': date('2020-04-15T02:45:06.521Z')})
+        await aggregator.on_symbol_price_updated({'symbol': 'EURUSD', 'bid': 1.3,
+                                                  'time': date('2020-04-15T02:45:16.521Z')})
+        await aggregator.on_symbol_price_updated({'symbol': 'EURUSD', 'bid': 1.0,
+                                                  'time': date('2020-04-15T02:45:26.521Z')})
+        await aggregator.on_symbol_price_updated({'symbol': 'EURUSD', 'bid': 1.2,
+                                                  'time': date('2020-04-15T02:45:36.521Z')})
+        await aggregator.on_symbol_price_updated({'symbol': 'GBPUSD', 'bid': 2,
+                                                  'time': date('2020-04-15T02:45:36.521Z')})
+        assert aggregator.current_bar('EURUSD', '1m') == {
+            'symbol': 'EURUSD', 'timeframe': '1m', 'time': date('2020-04-15T02:45:00.000Z'), 'open': 1.1,
+            'high': 1.3, 'low': 1.0, 'close': 1.2, 'tickVolume': 4}
+        assert aggregator.current_bar('EURUSD', '5m')['time'] == date('2020-04-15T02:45:00.000Z')
+        assert aggregator.current_bar('GBPUSD', '1m') is None
+        assert len(aggregator.history('EURUSD', '1m')) == 0
+
+    @pytest.mark.asyncio
+    async def test_close_bars(self):
+        """Should close bars and notify listeners."""
+        listener = MockListener()
+        listener.on_bar_closed = AsyncMock()
+        aggregator.add_listener(listener)
+        await aggregator.on_symbol_price_updated({'symbol': 'EURUSD', 'bid': 1.1,
+                                                  'time': date('2020-04-15T02:45:06.521Z')})
+        await aggregator.on_symbol_price_updated({'symbol': 'EURUSD', 'bid': 1.2,
+                                                  'time': date('2020-04-15T02:46:06.521Z')})
+        await aggregator.on_symbol_price_updated({'symbol': 'EURUSD', 'bid': 1.3,
+                                                  'time': date('2020-04-15T02:45:59.521Z')})
+        listener.on_bar_closed.assert_called_once_with({
+            'symbol': 'EURUSD', 'timeframe': '1m', 'time': date('2020-04-15T02:45:00.000Z'), 'open': 1.1,
+            'high': 1.1, 'low': 1.1, 'close': 1.1, 'tickVolume': 1})
+        await aggregator.on_symbol_price_updated({'symbol': 'EURUSD', 'bid': 1.4,
+                                                  'time': date('2020-04-15T02:47:06.521Z')})
+        await aggregator.on_symbol_price_updated({'symbol': 'EURUSD', 'bid': 1.5,
+                                                  'time': date('2020-04-15T02:50:06.521Z')})
+        history = aggregator.history('EURUSD', '1m')
+        assert len(history) == 2
+        assert history.window()['open'].tolist() == [1.2, 1.4]
+        assert history.window()['time'].tolist() == [date('2020-04-15T02:46:00.000Z').timestamp(),
+                                                     date('2020-04-15T02:47:00.000Z').timestamp()]
+        assert aggregator.history('EURUSD', '5m').last()['close'] == 1.4
+        assert listener.on_bar_closed.call_count == 4
+        aggregator.remove_listener(listener)
+        await aggregator.on_symbol_price_updated({'symbol': 'EURUSD', 'bid': 1.6,
+                                                  'time': date('2020-04-15T02:55:06.521Z')})
+        assert listener.on_bar_closed.call_count == 4
@@ -0,0 +1,18 @@
+from .models import MetatraderBar
+from abc import ABC, abstractmethod
+
+
+class BarListener(ABC):
+    """Defines interface for a bar aggregator listener class."""
+
+    @abstractmethod
+    async def on_bar_closed(self, bar: MetatraderBar):
+        """Invoked when a bar was closed.
+
+        Args:
+            bar: Closed bar.
+
+        Returns:
+            A coroutine which resolves when the asynchronous event is processed.
+        """
+        pass
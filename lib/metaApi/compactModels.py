@@ -0,0 +1,102 @@
+from collections.abc import MutableMapping
+from typing import Iterator
+
+
+class CompactRecord(MutableMapping):
+    """Base class of memory-efficient records which store known fields in __slots__ instead of a per-instance dict
+    while still offering mapping-style access. Fields not declared in __slots__ are kept in an auxiliary dict which
+    is created only when needed. Use dict(record) to get a plain dict."""
+
+    __slots__ = ('_extra',)
+    _fieldNames = ()
+    _fieldSet = frozenset()
+
+    def __init__(self, data: dict = None):
+        """Inits the record.
+
+        Args:
+            data: Record fields.
+        """
+        self._extra = None
+        if data:
+            for key, value in data.items():
+                self[key] = value
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'CompactRecord':
+        """Creates a record from a dict.
+
+        Args:
+            data: Record fields.
+
+        Returns:
+            Compact record.
+        """
+        return cls(data)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fieldNames = tuple(name for klass in reversed(cls.__mro__) for name in klass.__dict__.get('__slots__', ())
+                                if name != '_extra')
+        cls._fieldSet = frozenset(cls._fieldNames)
+
+    def __getitem__(self, key: str):
+        if key in self._fieldSet:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value):
+        if key in self._fieldSet:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key: str):
+        if key in self._fieldSet:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for name in self._fieldNames:
+            if hasattr(self, name):
+                yield name
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for key in self)
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({dict(self)!r})'
+
+
+class CompactSymbolPrice(CompactRecord):
+    """Memory-efficient MetatraderSymbolPrice record."""
+
+    __slots__ = ('symbol', 'bid', 'ask', 'profitTickValue', 'lossTickValue', 'accountCurrencyExchangeRate', 'time',
+                 'brokerTime')
+
+
+class CompactSymbolSpecification(CompactRecord):
+    """Memory-efficient MetatraderSymbolSpecification record."""
+
+    __slots__ = ('symbol', 'tickSize', 'minVolume', 'maxVolume', 'volumeStep', 'fillingModes', 'executionMode',
+                 'contractSize', 'quoteSessions', 'tradeSessions', 'tradeMode', 'bondAccruedInterest',
+                 'bondFaceValue', 'optionStrike', 'optionPriceSensivity', 'liquidityRate', 'initialMargin',
+                 'maintenanceMargin', 'hedgedMargin', 'hedgedMarginUsesLargerLeg', 'marginCurrency',
+                 'priceCalculationMode', 'baseCurrency', 'profitCurrency', 'swapMode', 'swapLong', 'swapShort',
+                 'swapRollover3Days', 'allowedExpirationModes', 'allowedOrderTypes', 'orderGTCMode', 'digits',
+                 'path', 'description', 'startTime', 'expirationTime')
@@ -0,0 +1,52 @@
+from .compactModels import CompactSymbolPrice, CompactSymbolSpecification
+from .terminalState import TerminalState
+import pytest
+
+
+class TestCompactModels:
+
+    def test_provide_mapping_access(self):
+        """Should provide mapping-style access to record fields."""
+        price = CompactSymbolPrice.from_dict({'symbol': 'EURUSD', 'bid': 1, 'ask': 1.1})
+        assert price['symbol'] == 'EURUSD'
+        assert price.get('profitTickValue') is None
+        assert 'bid' in price
+        assert 'lossTickValue' not in price
+        assert len(price) == 3
+        assert list(price.keys()) == ['symbol', 'bid', 'ask']
+        assert price == {'symbol': 'EURUSD', 'bid': 1, 'ask': 1.1}
+        assert dict(price) == {'symbol': 'EURUSD', 'bid': 1, 'ask': 1.1}
+        with pytest.raises(KeyError):
+            price['lossTickValue']
+        price['ask'] = 1.2
+        del price['bid']
+        assert price == {'symbol': 'EURUSD', 'ask': 1.2}
+
+    def test_keep_unknown_fields(self):
+        """Should keep fields which are not declared in the record."""
+        specification = CompactSymbolSpecification({'symbol': 'EURUSD', 'tickSize': 0.00001, 'newField': 'value'})
+        assert specification['newField'] == 'value'
+        assert specification == {'symbol': 'EURUSD', 'tickSize': 0.00001, 'newField': 'value'}
+        assert not hasattr(specification, '__dict__')
+
+    @pytest.mark.asyncio
+    async def test_be_used_by_terminal_state(self):
+        """Should be usable by terminal state."""
+        state = TerminalState()
+        await state.on_position_updated({
+            'id': '1',
+            'symbol': 'EURUSD',
+            'type': 'POSITION_TYPE_BUY',
+            'currentPrice': 9,
+            'currentTickValue': 0.5,
+            'openPrice': 8,
+            'profit': 100,
+            'volume': 2
+        })
+        await state.on_symbol_specification_updated(CompactSymbolSpecification({'symbol': 'EURUSD',
+                                                                                'tickSize': 0.01}))
+        await state.on_symbol_price_updated(CompactSymbolPrice({'symbol': 'EURUSD', 'profitTickValue': 0.5,
+                                                                'lossTickValue': 0.5, 'bid': 10, 'ask': 11}))
+        assert state.positions[0]['profit'] == 200
+        assert state.price('EURUSD')['bid'] == 10
+        assert state.snapshot().specification('EURUSD')['tickSize'] == 0.01
@@ -3,21 +3,25 @@ from ..clients.metaApi.metaApiWebsocket_client import MetaApiWebsocketClient
 from .metatraderAccountModel import MetatraderAccountModel
 from .historyStorage import HistoryStorage
 from .connectionRegistryModel import ConnectionRegistryModel
+from .historyDirectory import HistoryDirectory
 from datetime import datetime
 
 
 class ConnectionRegistry(ConnectionRegistryModel):
     """Manages account connections"""
 
-    def __init__(self, meta_api_websocket_client: MetaApiWebsocketClient, application: str = 'MetaApi'):
+    def __init__(self, meta_api_websocket_client: MetaApiWebsocketClient, application: str = 'MetaApi',
+                 history_directory: HistoryDirectory = None):
         """Inits a MetaTrader connection registry instance.
 
         Args:
             meta_api_websocket_client: MetaApi websocket client.
             application: Application type.
+            history_directory: Directory to store history files of default history storages in.
         """
         self._meta_api_websocket_client = meta_api_websocket_client
         self._application = application
+        self._history_directory = history_directory
         self._connections = {}
 
     async def connect(self, account: MetatraderAccountModel, history_storage: HistoryStorage,
@@ -36,7 +40,7 @@ class ConnectionRegistry(ConnectionRegistryModel):
             return self._connections[account.id]
         else:
             connection = MetaApiConnection(self._meta_api_websocket_client, account, history_storage, self,
-                                           history_start_time)
+                                           history_start_time, self._history_directory)
             await connection.initialize()
             await connection.subscribe()
             self._connections[account.id] = connection
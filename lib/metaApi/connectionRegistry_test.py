@@ -1,4 +1,5 @@
 from .connectionRegistry import ConnectionRegistry
+from .historyDirectory import HistoryDirectory
 from .memoryHistoryStorageModel import MemoryHistoryStorageModel
 from ..clients.metaApi.metaApiWebsocket_client import MetaApiWebsocketClient
 from ..clients.metaApi.reconnectListener import ReconnectListener
@@ -94,6 +95,17 @@ class TestConnectionRegistry:
             assert 'id' in registry._connections
             assert registry._connections['id'] == connection
 
+    @pytest.mark.asyncio
+    async def test_create_history_storage_in_directory(self):
+        """Should create default history storage in the history directory of the registry."""
+        with patch('lib.metaApi.metaApiConnection.MetaApiConnection.initialize', new_callable=AsyncMock):
+            mock_client.add_synchronization_listener = MagicMock()
+            mock_client.subscribe = AsyncMock()
+            directory_registry = ConnectionRegistry(mock_client, history_directory=HistoryDirectory('history', 1))
+            connection = await directory_registry.connect(MockAccount('id'), None)
+            assert connection.history_storage._fileManager._directory.root == 'history'
+            connection.history_storage._fileManager.stop_update_job()
+
     @pytest.mark.asyncio
     async def test_connect_and_return_previous(self):
         """Should return the same connection on second connect if same account id."""
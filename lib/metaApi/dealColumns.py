@@ -0,0 +1,153 @@
+from .models import MetatraderDeal, date
+from array import array
+from datetime import datetime
+from typing import Dict, List
+
+
+class DealColumns:
+    """Columnar representation of history deals. Numeric deal fields are stored in arrays of floats and symbol, type
+    and entry type are stored as integer codes of interned values, so that deal statistics can be computed with
+    vectorized operations without iterating over deal dicts. Missing numeric values are stored as NaN and missing
+    categorical values are stored as -1 code."""
+
+    NUMERIC_FIELDS = ('time', 'volume', 'price', 'profit', 'commission', 'swap')
+    """Names of the numeric deal fields stored. Time is stored as a POSIX timestamp in seconds."""
+
+    CATEGORICAL_FIELDS = ('symbol', 'type', 'entryType')
+    """Names of the categorical deal fields stored."""
+
+    def __init__(self):
+        """Inits the deal columns instance."""
+        self.clear()
+
+    def __len__(self) -> int:
+        """Returns number of deals stored."""
+        return len(self._numericColumns['time'])
+
+    def categories(self, field: str) -> List[str]:
+        """Returns values of a categorical field indexed by their codes.
+
+        Args:
+            field: Categorical field name, one of symbol, type or entryType.
+
+        Returns:
+            Field values indexed by code.
+        """
+        return list(self._categories[field])
+
+    def to_arrays(self) -> Dict[str, 'numpy.ndarray']:
+        """Returns copies of the deal columns as NumPy arrays. Numeric fields are returned as float64 arrays and
+        categorical fields are returned as int32 arrays of codes, use categories method to decode them. Requires
+        numpy package to be installed.
+
+        Returns:
+            Deal field arrays indexed by field name.
+        """
+        import numpy
+        arrays = {field: numpy.array(column, dtype=numpy.float64) for field, column in self._numericColumns.items()}
+        arrays.update({field: numpy.array(column, dtype=numpy.int32) for field, column in self._codeColumns.items()})
+        return arrays
+
+    def append(self, deal: MetatraderDeal):
+        """Appends a deal to the columns.
+
+        Args:
+            deal: Deal to append.
+        """
+        self.insert(len(self), deal)
+
+    def extend(self, deals: List[MetatraderDeal]):
+        """Appends deals to the columns.
+
+        Args:
+            deals: Deals to append.
+        """
+        for deal in deals:
+            self.append(deal)
+
+    def insert(self, index: int, deal: MetatraderDeal):
+        """Inserts a deal into the columns.
+
+        Args:
+            index: Index to insert the deal at.
+            deal: Deal to insert.
+        """
+        for field, column in self._numericColumns.items():
+            column.insert(index, self._get_numeric_value(deal, field))
+        for field, column in self._codeColumns.items():
+            column.insert(index, self._get_code(deal, field))
+
+    def replace(self, index: int, deal: MetatraderDeal):
+        """Replaces a deal in the columns.
+
+        Args:
+            index: Index of the deal to replace.
+            deal: New deal.
+        """
+        for field, column in self._numericColumns.items():
+            column[index] = self._get_numeric_value(deal, field)
+        for field, column in self._codeColumns.items():
+            column[index] = self._get_code(deal, field)
+
+    def truncate(self, count: int):
+        """Removes all deals except the first ones.
+
+        Args:
+            count: Number of first deals to keep.
+        """
+        for column in list(self._numericColumns.values()) + list(self._codeColumns.values()):
+            del column[count:]
+
+    def remove_first(self, count: int):
+        """Removes the first deals.
+
+        Args:
+            count: Number of deals to remove.
+        """
+        for column in list(self._numericColumns.values()) + list(self._codeColumns.values()):
+            del column[:count]
+
+    def clear(self):
+        """Removes all deals and interned categorical values."""
+        self._numericColumns = {field: array('d') for field in self.NUMERIC_FIELDS}
+        self._codeColumns = {field: array('i') for field in self.CATEGORICAL_FIELDS}
+        self._categories = {field: [] for field in self.CATEGORICAL_FIELDS}
+        self._codesByCategory = {field: {} for field in self.CATEGORICAL_FIELDS}
+
+    def _get_numeric_value(self, deal: MetatraderDeal, field: str) -> float:
+        """Returns value of a numeric deal field.
+
+        Args:
+            deal: Deal.
+            field: Numeric field name.
+
+        Returns:
+            Field value or NaN if the value is missing.
+        """
+        value = deal.get(field)
+        if value is None:
+            return float('nan')
+        if field == 'time':
+            return (value if isinstance(value, datetime) else date(value)).timestamp()
+        return value
+
+    def _get_code(self, deal: MetatraderDeal, field: str) -> int:
+        """Returns code of a categorical deal field value, interning the value if it was not seen before.
+
+        Args:
+            deal: Deal.
+            field: Categorical field name.
+
+        Returns:
+            Value code or -1 if the value is missing.
+        """
+        value = deal.get(field)
+        if value is None:
+            return -1
+        codes = self._codesByCategory[field]
+        code = codes.get(value)
+        if code is None:
+            code = len(self._categories[field])
+            codes[value] = code
+            self._categories[field].append(value)
+        return code
@@ -0,0 +1,58 @@
+from .dealColumns import DealColumns
+from .models import date
+import math
+import pytest
+columns = None
+
+
+@pytest.fixture(autouse=True)
+async def run_around_tests():
+    global columns
+    columns = DealColumns()
+    yield
+
+
+class TestDealColumns:
+    def test_store_deal_fields(self):
+        """Should store numeric fields and categorical codes of deals."""
+        columns.append({'id': '1', 'time': '2020-01-01T00:00:00.000Z', 'symbol': 'EURUSD', 'type': 'DEAL_TYPE_BUY',
+                        'entryType': 'DEAL_ENTRY_IN', 'volume': 0.1, 'price': 1.1, 'profit': 0, 'commission': -0.5,
+                        'swap': 0})
+        columns.append({'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'symbol': 'GBPUSD',
+                        'type': 'DEAL_TYPE_SELL', 'entryType': 'DEAL_ENTRY_OUT', 'volume': 0.1, 'price': 1.3,
+                        'profit': 10})
+        columns.insert(1, {'id': '3', 'time': date('2020-01-01T12:00:00.000Z'), 'symbol': 'EURUSD',
+                           'type': 'DEAL_TYPE_BALANCE', 'profit': 100})
+        assert len(columns) == 3
+        assert columns._numericColumns['time'].tolist() == [date('2020-01-01T00:00:00.000Z').timestamp(),
+                                                            date('2020-01-01T12:00:00.000Z').timestamp(),
+                                                            date('2020-01-02T00:00:00.000Z').timestamp()]
+        assert columns._numericColumns['profit'].tolist() == [0, 100, 10]
+        assert math.isnan(columns._numericColumns['swap'][2])
+        assert columns._codeColumns['symbol'].tolist() == [0, 0, 1]
+        assert columns._codeColumns['entryType'].tolist() == [0, -1, 1]
+        assert columns.categories('symbol') == ['EURUSD', 'GBPUSD']
+
+    def test_update_deals(self):
+        """Should replace and remove deals."""
+        columns.extend([{'id': str(i), 'time': date('2020-01-01T00:00:00.000Z'), 'profit': i} for i in range(5)])
+        columns.replace(1, {'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'profit': 10})
+        columns.truncate(4)
+        columns.remove_first(1)
+        assert columns._numericColumns['profit'].tolist() == [10, 2, 3]
+        columns.clear()
+        assert len(columns) == 0
+        assert columns.categories('symbol') == []
+
+    def test_return_numpy_arrays(self):
+        """Should return deal columns as numpy arrays."""
+        numpy = pytest.importorskip('numpy')
+        columns.extend([{'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'symbol': 'EURUSD', 'profit': 5},
+                        {'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'symbol': 'GBPUSD', 'profit': -2}])
+        arrays = columns.to_arrays()
+        assert arrays['profit'].dtype == numpy.float64
+        assert arrays['symbol'].dtype == numpy.int32
+        assert arrays['profit'].sum() == 3
+        assert arrays['profit'][arrays['symbol'] == columns.categories('symbol').index('GBPUSD')].tolist() == [-2]
+        columns.append({'id': '3', 'time': date('2020-01-03T00:00:00.000Z'), 'profit': 1})
+        assert len(arrays['profit']) == 2
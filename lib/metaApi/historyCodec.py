@@ -0,0 +1,339 @@
+from .models import format_date, stringify
+from ..clients.errorHandler import ValidationException
+from abc import ABC, abstractmethod
+from datetime import datetime
+from mmap import mmap
+from typing import List, Tuple, Iterator, BinaryIO
+import json
+import struct
+import zlib
+
+DEFAULT_CODEC = 'zlib'
+"""Name of the codec history files are written with by default."""
+
+COMPRESSION_LEVEL = 1
+"""Zlib compression level of frames. History records are highly repetitive, so the fastest level already reduces
+their size by an order of magnitude."""
+
+FRAME_HEADER = struct.Struct('>II')
+"""Header of a compressed frame holding the size of the frame body in bytes and CRC32 checksum of the body."""
+
+
+class CorruptFrameError(ValueError):
+    """Raised when an entry or a frame of a history log segment can not be decoded, e.g. because the process stopped
+    while it was being written.
+
+    Attributes:
+        offset: Byte offset of the corrupt entry or frame.
+        segment: Number of the segment which contains the corrupt entry or frame, set by the history log.
+    """
+
+    def __init__(self, message: str, offset: int):
+        """Inits the exception.
+
+        Args:
+            message: Exception message.
+            offset: Byte offset of the corrupt entry or frame.
+        """
+        super().__init__(message)
+        self.offset = offset
+        self.segment = None
+
+
+class CodecUnavailableError(ImportError):
+    """Raised when a history codec can not be used because a package it requires is not installed. History files
+    written with the codec are kept intact, so that they can be read once the package is installed."""
+    pass
+
+
+class HistoryCodec(ABC):
+    """Encodes history log entries to bytes and decodes them back. Each codec writes segment files with its own
+    extension, so that segments written with different codecs can be read side by side."""
+
+    name = None
+    """Codec name."""
+
+    extension = None
+    """Extension of segment files written with the codec."""
+
+    frame_size = 1
+    """Maximum number of entries encoded together into a frame. A frame is the smallest unit which can be decoded
+    separately."""
+
+    @abstractmethod
+    def encode(self, entries: List[dict]) -> bytes:
+        """Encodes log entries.
+
+        Args:
+            entries: Log entries to encode.
+
+        Returns:
+            Encoded entries.
+        """
+        pass
+
+    @abstractmethod
+    def decode_frame(self, buffer: bytes or mmap, offset: int) -> List[dict]:
+        """Decodes log entries of a frame.
+
+        Args:
+            buffer: Segment contents.
+            offset: Byte offset of the frame.
+
+        Returns:
+            Entries of the frame.
+        """
+        pass
+
+    @abstractmethod
+    def decode(self, f: BinaryIO) -> Iterator[Tuple[int, dict]]:
+        """Decodes log entries from a segment file one at a time, starting from the current file position. Raises
+        CorruptFrameError when an entry can not be decoded.
+
+        Args:
+            f: Segment file opened in binary mode.
+
+        Returns:
+            Iterator of byte offset of the entry or of the frame containing it and the entry.
+        """
+        pass
+
+
+class JsonCodec(HistoryCodec):
+    """Codec which stores entries as newline-delimited JSON. A line without the trailing newline is treated as an
+    entry which was not written completely."""
+
+    name = 'json'
+    extension = 'log'
+
+    def encode(self, entries: List[dict]) -> bytes:
+        """Encodes log entries.
+
+        Args:
+            entries: Log entries to encode.
+
+        Returns:
+            Encoded entries.
+        """
+        return ''.join(stringify(entry) + '\n' for entry in entries).encode('utf-8')
+
+    def decode_frame(self, buffer: bytes or mmap, offset: int) -> List[dict]:
+        """Decodes the log entry at an offset.
+
+        Args:
+            buffer: Segment contents.
+            offset: Byte offset of the entry.
+
+        Returns:
+            List with the entry.
+        """
+        end = buffer.find(b'\n', offset)
+        return [json.loads(buffer[offset:end if end != -1 else len(buffer)])]
+
+    def decode(self, f: BinaryIO) -> Iterator[Tuple[int, dict]]:
+        """Decodes log entries from a segment file one at a time.
+
+        Args:
+            f: Segment file opened in binary mode.
+
+        Returns:
+            Iterator of byte offset of the entry and the entry.
+        """
+        offset = f.tell()
+        for line in f:
+            if not line.endswith(b'\n'):
+                raise CorruptFrameError(f'Truncated history entry at offset {offset}', offset)
+            if line.strip():
+                try:
+                    entry = json.loads(line)
+                except ValueError as err:
+                    raise CorruptFrameError(f'Corrupt history entry at offset {offset}: {err}', offset) from err
+                yield offset, entry
+            offset += len(line)
+
+
+class FrameCodec(HistoryCodec):
+    """Codec which stores each batch of entries appended as a compressed frame prefixed with its size and checksum,
+    so that appended batches are compressed together, a segment can be read one frame at a time and frames which
+    were not written completely are detected."""
+
+    frame_size = 1000
+
+    def encode(self, entries: List[dict]) -> bytes:
+        """Encodes log entries into a frame.
+
+        Args:
+            entries: Log entries to encode.
+
+        Returns:
+            Encoded frame.
+        """
+        body = zlib.compress(self._encode_body(entries), COMPRESSION_LEVEL)
+        return FRAME_HEADER.pack(len(body), zlib.crc32(body)) + body
+
+    def decode_frame(self, buffer: bytes or mmap, offset: int) -> List[dict]:
+        """Decodes log entries of a frame.
+
+        Args:
+            buffer: Segment contents.
+            offset: Byte offset of the frame.
+
+        Returns:
+            Entries of the frame.
+        """
+        size, checksum = FRAME_HEADER.unpack_from(buffer, offset)
+        return self._decode_frame_body(buffer[offset + FRAME_HEADER.size:offset + FRAME_HEADER.size + size],
+                                       checksum, offset)
+
+    def decode(self, f: BinaryIO) -> Iterator[Tuple[int, dict]]:
+        """Decodes log entries from a segment file, decompressing one frame at a time.
+
+        Args:
+            f: Segment file opened in binary mode.
+
+        Returns:
+            Iterator of byte offset of the frame containing the entry and the entry.
+        """
+        offset = f.tell()
+        while True:
+            header = f.read(FRAME_HEADER.size)
+            if not len(header):
+                break
+            if len(header) < FRAME_HEADER.size:
+                raise CorruptFrameError(f'Truncated history frame header at offset {offset}', offset)
+            size, checksum = FRAME_HEADER.unpack(header)
+            body = f.read(size)
+            if len(body) < size:
+                raise CorruptFrameError(f'Truncated history frame at offset {offset}', offset)
+            for entry in self._decode_frame_body(body, checksum, offset):
+                yield offset, entry
+            offset += FRAME_HEADER.size + size
+
+    def _decode_frame_body(self, body: bytes, checksum: int, offset: int) -> List[dict]:
+        """Verifies the checksum of a frame body and decodes its entries.
+
+        Args:
+            body: Compressed frame body.
+            checksum: CRC32 checksum of the body from the frame header.
+            offset: Byte offset of the frame.
+
+        Returns:
+            Entries of the frame.
+        """
+        if zlib.crc32(body) != checksum:
+            raise CorruptFrameError(f'History frame checksum mismatch at offset {offset}', offset)
+        try:
+            return self._decode_body(zlib.decompress(body))
+        except Exception as err:
+            raise CorruptFrameError(f'Corrupt history frame at offset {offset}: {err}', offset) from err
+
+    @abstractmethod
+    def _encode_body(self, entries: List[dict]) -> bytes:
+        """Serializes log entries before compression.
+
+        Args:
+            entries: Log entries.
+
+        Returns:
+            Serialized entries.
+        """
+        pass
+
+    @abstractmethod
+    def _decode_body(self, body: bytes) -> List[dict]:
+        """Deserializes decompressed log entries.
+
+        Args:
+            body: Serialized entries.
+
+        Returns:
+            Log entries.
+        """
+        pass
+
+
+class ZlibCodec(FrameCodec):
+    """Codec which stores entries as JSON arrays in zlib-compressed frames."""
+
+    name = 'zlib'
+    extension = 'zlog'
+
+    def _encode_body(self, entries: List[dict]) -> bytes:
+        """Serializes log entries before compression.
+
+        Args:
+            entries: Log entries.
+
+        Returns:
+            Serialized entries.
+        """
+        return stringify(entries).encode('utf-8')
+
+    def _decode_body(self, body: bytes) -> List[dict]:
+        """Deserializes decompressed log entries.
+
+        Args:
+            body: Serialized entries.
+
+        Returns:
+            Log entries.
+        """
+        return json.loads(body)
+
+
+class MsgpackCodec(FrameCodec):
+    """Codec which stores entries in MessagePack format in zlib-compressed frames. Requires msgpack package to be
+    installed."""
+
+    name = 'msgpack'
+    extension = 'mlog'
+
+    def __init__(self):
+        """Inits the codec instance."""
+        try:
+            import msgpack
+        except ImportError as err:
+            raise CodecUnavailableError('msgpack history codec requires msgpack package, install it with '
+                                        '`pip install msgpack` to read and write .mlog history files') from err
+        self._msgpack = msgpack
+
+    def _encode_body(self, entries: List[dict]) -> bytes:
+        """Serializes log entries before compression.
+
+        Args:
+            entries: Log entries.
+
+        Returns:
+            Serialized entries.
+        """
+        return self._msgpack.packb(entries, default=lambda value: format_date(value)
+                                   if isinstance(value, datetime) else str(value))
+
+    def _decode_body(self, body: bytes) -> List[dict]:
+        """Deserializes decompressed log entries.
+
+        Args:
+            body: Serialized entries.
+
+        Returns:
+            Log entries.
+        """
+        return self._msgpack.unpackb(body, raw=False)
+
+
+CODECS = {codec.name: codec for codec in [JsonCodec, ZlibCodec, MsgpackCodec]}
+"""History codecs indexed by name."""
+
+
+def get_codec(name: str) -> HistoryCodec:
+    """Creates a history codec.
+
+    Args:
+        name: Codec name, one of json, zlib or msgpack.
+
+    Returns:
+        Codec instance.
+    """
+    if name not in CODECS:
+        raise ValidationException(f'Unknown history codec {name}, supported codecs are {", ".join(CODECS)}')
+    return CODECS[name]()
@@ -0,0 +1,91 @@
+from .historyCodec import JsonCodec, ZlibCodec, MsgpackCodec, CorruptFrameError, CodecUnavailableError, get_codec
+from .models import date
+from ..clients.errorHandler import ValidationException
+from mock import patch
+import io
+import pytest
+entries = None
+
+
+@pytest.fixture(autouse=True)
+async def run_around_tests():
+    global entries
+    entries = [{'id': str(i), 'type': 'DEAL_TYPE_BUY', 'time': '2020-01-01T00:00:00.000Z', 'profit': i / 10}
+               for i in range(3)]
+    yield
+
+
+class TestHistoryCodec:
+    @pytest.mark.parametrize('codec', [JsonCodec(), ZlibCodec()])
+    def test_encode_and_decode_entries(self, codec):
+        """Should decode encoded entries."""
+        data = codec.encode(entries[:2]) + codec.encode(entries[2:])
+        assert [entry for offset, entry in codec.decode(io.BytesIO(data))] == entries
+
+    def test_encode_dates(self):
+        """Should encode dates as strings."""
+        codec = ZlibCodec()
+        data = codec.encode([{'id': '1', 'time': date('2020-01-01T00:00:00.000Z')}])
+        assert list(codec.decode(io.BytesIO(data))) == [(0, {'id': '1', 'time': '2020-01-01T00:00:00.000Z'})]
+
+    def test_return_frame_offsets(self):
+        """Should return offsets of frames containing entries."""
+        codec = ZlibCodec()
+        first_frame = codec.encode(entries[:2])
+        offsets = [offset for offset, entry in codec.decode(io.BytesIO(first_frame + codec.encode(entries[2:])))]
+        assert offsets == [0, 0, len(first_frame)]
+
+    def test_compress_entries(self):
+        """Should compress entries."""
+        deals = [{'id': str(i), 'type': 'DEAL_TYPE_BUY', 'time': '2020-01-01T00:00:00.000Z', 'symbol': 'EURUSD',
+                  'platform': 'mt5', 'commission': 0, 'swap': 0, 'profit': i} for i in range(100)]
+        assert len(ZlibCodec().encode(deals)) * 4 < len(JsonCodec().encode(deals))
+
+    def test_detect_truncated_frames(self):
+        """Should raise an error with the frame offset if a frame is truncated."""
+        codec = ZlibCodec()
+        first_frame = codec.encode(entries[:2])
+        data = first_frame + codec.encode(entries[2:])
+        with pytest.raises(CorruptFrameError) as exc_info:
+            list(codec.decode(io.BytesIO(data[:-1])))
+        assert exc_info.value.offset == len(first_frame)
+
+    def test_detect_corrupt_frames(self):
+        """Should raise an error if a frame does not match its checksum."""
+        codec = ZlibCodec()
+        data = bytearray(codec.encode(entries))
+        data[-1] ^= 0xff
+        with pytest.raises(CorruptFrameError):
+            list(codec.decode(io.BytesIO(bytes(data))))
+        with pytest.raises(CorruptFrameError):
+            codec.decode_frame(bytes(data), 0)
+
+    def test_detect_incomplete_json_lines(self):
+        """Should raise an error if a JSON line is corrupt or was not written completely."""
+        codec = JsonCodec()
+        data = codec.encode(entries)
+        with pytest.raises(CorruptFrameError) as exc_info:
+            list(codec.decode(io.BytesIO(data[:-1])))
+        assert exc_info.value.offset == len(codec.encode(entries[:2]))
+        with pytest.raises(CorruptFrameError):
+            list(codec.decode(io.BytesIO(b'{"id":\n' + data)))
+
+    def test_msgpack_codec(self):
+        """Should encode and decode entries in MessagePack format."""
+        pytest.importorskip('msgpack')
+        codec = MsgpackCodec()
+        data = codec.encode([{'id': '1', 'time': date('2020-01-01T00:00:00.000Z')}])
+        assert list(codec.decode(io.BytesIO(data))) == [(0, {'id': '1', 'time': '2020-01-01T00:00:00.000Z'})]
+
+    def test_msgpack_codec_unavailable(self):
+        """Should raise a codec unavailable error if msgpack is not installed."""
+        with patch.dict('sys.modules', {'msgpack': None}):
+            with pytest.raises(CodecUnavailableError, match='pip install msgpack'):
+                MsgpackCodec()
+
+    def test_get_codec(self):
+        """Should create codecs by name and reject unknown codecs."""
+        assert isinstance(get_codec('json'), JsonCodec)
+        assert isinstance(get_codec('zlib'), ZlibCodec)
+        with pytest.raises(ValidationException):
+            get_codec('lz4')
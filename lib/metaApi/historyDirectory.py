@@ -0,0 +1,76 @@
+from ..clients.errorHandler import ValidationException
+import hashlib
+import os
+
+MAX_SHARD_LEVELS = 4
+"""Maximum number of subdirectory levels history files can be sharded into."""
+
+
+class HistoryDirectory:
+    """Locates history files of MetaTrader accounts on disk. Files are stored in the root directory or, if sharding
+    is enabled, in nested subdirectories named after hash prefixes of account ids, so that each directory holds files
+    of a small number of accounts. Each shard level splits accounts into 256 subdirectories."""
+
+    def __init__(self, root: str = '.metaapi', shard_levels: int = 0):
+        """Inits the history directory instance.
+
+        Args:
+            root: Path to the directory to store history files in, default is .metaapi directory in the working
+            directory.
+            shard_levels: Number of hash prefix subdirectory levels to distribute account files over, from 0 to 4.
+            Default is 0, which stores all files in the root directory.
+        """
+        if not isinstance(shard_levels, int) or not 0 <= shard_levels <= MAX_SHARD_LEVELS:
+            raise ValidationException(f'History shard levels must be an integer from 0 to {MAX_SHARD_LEVELS}')
+        self._root = root
+        self._shardLevels = shard_levels
+
+    @property
+    def root(self) -> str:
+        """Returns path to the root history directory.
+
+        Returns:
+            Root directory path.
+        """
+        return self._root
+
+    @property
+    def shard_levels(self) -> int:
+        """Returns number of hash prefix subdirectory levels.
+
+        Returns:
+            Number of subdirectory levels.
+        """
+        return self._shardLevels
+
+    def get_account_directory(self, account_id: str) -> str:
+        """Returns path to the directory which holds history files of an account.
+
+        Args:
+            account_id: MetaTrader account id.
+
+        Returns:
+            Directory path.
+        """
+        digest = hashlib.md5(account_id.encode('utf-8')).hexdigest()
+        return os.path.join(self._root, *[digest[2 * i:2 * i + 2] for i in range(self._shardLevels)])
+
+    def get_file_path(self, account_id: str, file_name: str) -> str:
+        """Returns path to a history file of an account.
+
+        Args:
+            account_id: MetaTrader account id.
+            file_name: File name.
+
+        Returns:
+            File path.
+        """
+        return os.path.join(self.get_account_directory(account_id), file_name)
+
+    def make_account_directory(self, account_id: str):
+        """Creates the directory which holds history files of an account if it does not exist.
+
+        Args:
+            account_id: MetaTrader account id.
+        """
+        os.makedirs(self.get_account_directory(account_id), exist_ok=True)
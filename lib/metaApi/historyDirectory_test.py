@@ -0,0 +1,35 @@
+from .historyDirectory import HistoryDirectory
+from ..clients.errorHandler import ValidationException
+import os
+import pytest
+
+
+class TestHistoryDirectory:
+
+    def test_store_files_in_root(self):
+        """Should store files in the root directory by default."""
+        assert HistoryDirectory().get_file_path('accountId', 'accountId-MetaApi-deals') == \
+            os.path.join('.metaapi', 'accountId-MetaApi-deals')
+
+    def test_shard_files(self):
+        """Should store files in hash prefix subdirectories."""
+        directory = HistoryDirectory('/var/history', 2)
+        path = directory.get_account_directory('accountId')
+        assert path == directory.get_account_directory('accountId')
+        assert os.path.dirname(os.path.dirname(path)) == '/var/history'
+        assert all(map(lambda name: len(name) == 2, path.split('/')[-2:]))
+        assert len(set(map(directory.get_account_directory, [f'account{i}' for i in range(100)]))) > 90
+
+    def test_create_account_directory(self, tmp_path):
+        """Should create account directory."""
+        directory = HistoryDirectory(str(tmp_path / 'history'), 1)
+        directory.make_account_directory('accountId')
+        directory.make_account_directory('accountId')
+        assert os.path.isdir(directory.get_account_directory('accountId'))
+
+    def test_validate_shard_levels(self):
+        """Should validate shard levels."""
+        with pytest.raises(ValidationException):
+            HistoryDirectory(shard_levels=5)
+        with pytest.raises(ValidationException):
+            HistoryDirectory(shard_levels=-1)
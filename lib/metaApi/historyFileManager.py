@@ -1,185 +1,491 @@
 from .memoryHistoryStorageModel import MemoryHistoryStorageModel
+from .historyLog import HistoryLog, make_tombstone, get_record_identity
+from .historyCodec import DEFAULT_CODEC, CorruptFrameError, CodecUnavailableError, get_codec
+from .historyFlushScheduler import get_flush_scheduler
+from .historyDirectory import HistoryDirectory
+from .models import MetatraderDeal, MetatraderOrder
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
 import json
 import os
 import asyncio
-from typing import List
+from typing import List, Callable, Iterator, AsyncIterator
+import pytz
 from datetime import datetime
 
+MAX_SEGMENTS = 8
+"""Number of log segments after which the log is compacted."""
 
-def stringify(obj: dict or List) -> str:
-    """Helper function to convert an object to string and compress.
+COMPACTION_THRESHOLD = 1000
+"""Number of replaced records and tombstones which have to accumulate in a log before it is compacted."""
+
+MAX_IO_WORKERS = 4
+"""Maximum number of threads reading and writing history files."""
+
+READ_BATCH_SIZE = 1000
+"""Number of log entries parsed in a thread pool task when history is read from disk."""
+
+executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Returns the thread pool executor shared by history file managers to read and write history files without
+    blocking the event loop. The executor is created on first use.
 
     Returns:
-        Stringified and compressed object.
+        Thread pool executor.
     """
-    return json.dumps(obj).replace('": ', '":').replace('}, {', '},{').replace(', "', ',"')
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=MAX_IO_WORKERS, thread_name_prefix='metaapi-history')
+    return executor
 
 
 class HistoryFileManager:
-    """History storage file manager which saves and loads history on disk."""
+    """History storage file manager which saves and loads history on disk. History is stored in append-only logs of
+    deals and history orders, so that saving changes takes time proportional to the number of records changed.
+    Files are read and written in a shared thread pool, so that disk operations do not block the event loop.
+
+    Saved history can be queried by time range or ticket through the log index without loading it, e.g. to inspect
+    the history of an account which is not connected. MemoryHistoryStorage keeps the whole history in memory, so it
+    still reads every log entry when it loads history from disk. Use SqliteHistoryStorage to query history without
+    loading it."""
 
-    def __init__(self, account_id: str, application: str, history_storage: MemoryHistoryStorageModel = None):
-        """Constructs the history file manager instance."""
+    def __init__(self, account_id: str, application: str, history_storage: MemoryHistoryStorageModel = None,
+                 codec: str = DEFAULT_CODEC, history_directory: HistoryDirectory = None):
+        """Constructs the history file manager instance.
+
+        Args:
+            account_id: MetaTrader account id.
+            application: Application id.
+            history_storage: History storage to save.
+            codec: Codec to write history files with, one of json, zlib or msgpack. Files written with other codecs
+            are migrated on load.
+            history_directory: Directory to store history files in, by default files are stored in .metaapi
+            directory.
+        """
         self._accountId = account_id
         self._application = application
         self._historyStorage = history_storage
-        self._dealsSize = []
+        self._directory = history_directory or HistoryDirectory()
+        self._dealsLog = HistoryLog(self._directory.get_file_path(account_id, f'{account_id}-{application}-deals'),
+                                    'time', codec=get_codec(codec))
+        self._historyOrdersLog = HistoryLog(
+            self._directory.get_file_path(account_id, f'{account_id}-{application}-historyOrders'), 'doneTime',
+            codec=get_codec(codec))
+        self._pendingDeals = []
         self._startNewDealIndex = -1
-        self._historyOrdersSize = []
+        self._pendingHistoryOrders = []
         self._startNewOrderIndex = -1
-        self.update_disk_storage_job = None
-        self._isUpdating = False
+        self._flushScheduler = None
+        self._ioLock = None
+        self._readers = 0
+        self._deletions = 0
 
     def start_update_job(self):
-        """Starts a job to periodically save history on disk"""
+        """Starts saving history changes on disk. Changes are saved by the flush scheduler shared by file managers
+        of the process, see get_flush_scheduler."""
+        if not self._flushScheduler:
+            self._flushScheduler = get_flush_scheduler()
+            if len(self._pendingDeals) or len(self._pendingHistoryOrders) or self._startNewDealIndex != -1 or \
+                    self._startNewOrderIndex != -1:
+                self._flushScheduler.schedule_flush(self)
 
-        async def update_job():
-            while True:
-                await asyncio.sleep(60)
-                await self.update_disk_storage()
+    def stop_update_job(self):
+        """Stops saving history changes on disk."""
+        if self._flushScheduler:
+            self._flushScheduler.cancel_flush(self)
+            self._flushScheduler = None
 
-        if not self.update_disk_storage_job:
-            self.update_disk_storage_job = asyncio.create_task(update_job())
+    def add_deals(self, deals: List[MetatraderDeal]):
+        """Schedules deals added or replaced in the history storage to be saved on disk.
 
-    def stop_update_job(self):
-        """Stops a job to periodically save history on disk."""
+        Args:
+            deals: Deals added or replaced.
+        """
+        self._pendingDeals.extend(deals)
+        self._schedule_flush()
 
-        self.update_disk_storage_job.cancel()
-        self.update_disk_storage_job = None
+    def remove_deals(self, deals: List[MetatraderDeal]):
+        """Schedules deals removed from the history storage to be deleted from disk.
 
-    def get_item_size(self, item: dict) -> int:
-        """Helper function to calculate object size in bytes in utf-8 encoding.
+        Args:
+            deals: Deals removed.
+        """
+        self._pendingDeals.extend(map(lambda deal: make_tombstone(deal, 'time'), deals))
+        self._schedule_flush()
 
-        Returns:
-            Size of object in bytes.
+    def add_history_orders(self, history_orders: List[MetatraderOrder]):
+        """Schedules history orders added or replaced in the history storage to be saved on disk.
+
+        Args:
+            history_orders: History orders added or replaced.
+        """
+        self._pendingHistoryOrders.extend(history_orders)
+        self._schedule_flush()
+
+    def remove_history_orders(self, history_orders: List[MetatraderOrder]):
+        """Schedules history orders removed from the history storage to be deleted from disk.
+
+        Args:
+            history_orders: History orders removed.
         """
-        return len(stringify(item).encode('utf-8'))
+        self._pendingHistoryOrders.extend(map(lambda order: make_tombstone(order, 'doneTime'), history_orders))
+        self._schedule_flush()
 
     def set_start_new_order_index(self, index: int):
-        """Sets the index of the earliest changed historyOrder record.
+        """Sets the index of the earliest changed historyOrder record. History orders of the history storage starting
+        from the index will be saved on disk.
 
         Args:
             index: Index of the earliest changed record.
         """
         if self._startNewOrderIndex > index or self._startNewOrderIndex == -1:
             self._startNewOrderIndex = index
+        self._schedule_flush()
 
     def set_start_new_deal_index(self, index: int):
-        """Sets the index of the earliest changed deal record.
+        """Sets the index of the earliest changed deal record. Deals of the history storage starting from the index
+        will be saved on disk.
 
         Args:
             index: Index of the earliest changed record.
         """
         if self._startNewDealIndex > index or self._startNewDealIndex == -1:
             self._startNewDealIndex = index
+        self._schedule_flush()
 
     async def get_history_from_disk(self):
-        """Retrieves history from saved file.
+        """Retrieves history from saved files. History saved by previous SDK versions as JSON arrays is migrated to
+        the log format.
 
         Returns:
             A coroutine resolving with an object with deals and historyOrders.
         """
+        history = {}
+        for history_type, time_field in [('deals', 'time'), ('historyOrders', 'doneTime')]:
+            records = {}
+            async for entries in self.iterate_history_from_disk(history_type):
+                for entry in entries:
+                    key = get_record_identity(entry, time_field)
+                    if entry.get('$deleted'):
+                        records.pop(key, None)
+                    else:
+                        records[key] = entry
+            history[history_type] = list(records.values())
+        return history
 
-        history = {'deals': [], 'historyOrders': []}
-        try:
-            if os.path.isfile(f'.metaapi/{self._accountId}-{self._application}-deals.bin'):
-                deals = json.loads(open(f'.metaapi/{self._accountId}-{self._application}-deals.bin').read())
-                self._dealsSize = list(map(self.get_item_size, deals))
-                history['deals'] = deals
-        except Exception as err:
-            print(f'[{datetime.now().isoformat()}] Failed to read deals history storage of '
-                  f'account {self._accountId}', err)
-            os.remove(f'.metaapi/{self._accountId}-{self._application}-deals.bin')
+    async def iterate_history_from_disk(self, history_type: str) -> AsyncIterator[List[dict]]:
+        """Reads history log entries from disk in batches, so that the history can be loaded while the log is being
+        parsed without keeping the whole log in memory. Entries are parsed in a thread pool one at a time. An entry
+        is a record or a tombstone with $deleted field set which deletes earlier records with the same id, type and
+        time. If the log contains a corrupt entry, e.g. because the process stopped while the log was being written,
+        the log is truncated to the entries preceding it and iteration stops, so that only the history written after
+        the last valid entry has to be synchronized again. If the log can not be read for another reason, iteration
+        stops, the log is deleted and the records of the history storage are saved again on the next update. History
+        saved by previous SDK versions as a JSON array is migrated to the log format and logs written with another
+        codec are rewritten with the file manager codec. If the log was written with a codec which requires a package
+        that is not installed, CodecUnavailableError is raised and the log is kept intact. Each batch is read under
+        the disk operation lock which is released before the batch is returned, so history changes can be saved while
+        the batch is processed. Logs are not compacted until iteration finishes and iteration stops if the history is
+        deleted from disk.
 
+        Args:
+            history_type: History type, deals or historyOrders.
+
+        Returns:
+            Async iterator of log entry batches.
+        """
+        log = self._dealsLog if history_type == 'deals' else self._historyOrdersLog
+        deletions = self._deletions
+        entries = None
+        self._readers += 1
         try:
-            if os.path.isfile(f'.metaapi/{self._accountId}-{self._application}-historyOrders.bin'):
-                history_orders = json.loads(open(f'.metaapi/{self._accountId}-{self._application}-historyOrders.bin')
-                                            .read())
-                self._historyOrdersSize = list(map(self.get_item_size, history_orders))
-                history['historyOrders'] = history_orders
+            async with self._get_io_lock():
+                await self._run_in_executor(self._migrate_files, log, history_type)
+                entries = log.iterate(partial(self._report_truncation, history_type))
+            while True:
+                async with self._get_io_lock():
+                    if self._deletions != deletions:
+                        break
+                    batch = await self._run_in_executor(self._read_batch, entries)
+                if not len(batch):
+                    break
+                yield batch
+        except CodecUnavailableError:
+            raise
         except Exception as err:
-            print(f'[{datetime.now().isoformat()}] Failed to read historyOrders history storage of '
+            print(f'[{datetime.now().isoformat()}] Failed to read {history_type} history storage of '
                   f'account {self._accountId}', err)
-            os.remove(f'.metaapi/{self._accountId}-{self._application}-historyOrders.bin')
-        return history
+            async with self._get_io_lock():
+                await self._run_in_executor(log.delete)
+            if history_type == 'deals':
+                self.set_start_new_deal_index(0)
+            else:
+                self.set_start_new_order_index(0)
+        finally:
+            self._readers -= 1
+            if entries is not None:
+                entries.close()
+
+    async def get_deals_by_time_range(self, start_time: datetime = None, end_time: datetime = None) \
+            -> List[MetatraderDeal]:
+        """Returns deals saved on disk in a time range sorted by time and id. Deals are located using the log index
+        and only the frames containing them are decoded. Changes which are not saved yet are not returned.
+
+        Args:
+            start_time: Time to start from, inclusive. By default starts from the first deal.
+            end_time: Time to end at, exclusive. By default ends at the last deal.
+
+        Returns:
+            A coroutine resolving with deals found.
+        """
+        return await self._query_log(self._dealsLog, 'deals', HistoryLog.get_records_by_time_range,
+                                     start_time.timestamp() if start_time else None,
+                                     end_time.timestamp() if end_time else None)
+
+    async def get_deals_by_ticket(self, ticket: str) -> List[MetatraderDeal]:
+        """Returns deals saved on disk with a ticket sorted by time, decoding only the frames containing them.
+
+        Args:
+            ticket: Deal ticket.
+
+        Returns:
+            A coroutine resolving with deals found.
+        """
+        return await self._query_log(self._dealsLog, 'deals', HistoryLog.get_records_by_id, ticket)
+
+    async def get_history_orders_by_time_range(self, start_time: datetime = None, end_time: datetime = None) \
+            -> List[MetatraderOrder]:
+        """Returns history orders saved on disk in a done time range sorted by done time and id. Orders are located
+        using the log index and only the frames containing them are decoded. Changes which are not saved yet are not
+        returned.
+
+        Args:
+            start_time: Time to start from, inclusive. By default starts from the first order.
+            end_time: Time to end at, exclusive. By default ends at the last order.
+
+        Returns:
+            A coroutine resolving with history orders found.
+        """
+        return await self._query_log(self._historyOrdersLog, 'historyOrders', HistoryLog.get_records_by_time_range,
+                                     start_time.timestamp() if start_time else None,
+                                     end_time.timestamp() if end_time else None)
+
+    async def get_history_orders_by_ticket(self, ticket: str) -> List[MetatraderOrder]:
+        """Returns history orders saved on disk with a ticket sorted by done time, decoding only the frames
+        containing them.
+
+        Args:
+            ticket: Order ticket.
+
+        Returns:
+            A coroutine resolving with history orders found.
+        """
+        return await self._query_log(self._historyOrdersLog, 'historyOrders', HistoryLog.get_records_by_id, ticket)
+
+    async def get_last_deal_time(self) -> datetime:
+        """Returns time of the last deal saved on disk using the log index, without decoding deals.
+
+        Returns:
+            A coroutine resolving with the time of the last deal or the start of epoch if there are no deals.
+        """
+        time = await self._query_log(self._dealsLog, 'deals', HistoryLog.get_last_time)
+        return datetime.fromtimestamp(time or 0, pytz.UTC)
+
+    async def get_last_history_order_time(self) -> datetime:
+        """Returns done time of the last history order saved on disk using the log index, without decoding orders.
+
+        Returns:
+            A coroutine resolving with the done time of the last order or the start of epoch if there are no orders.
+        """
+        time = await self._query_log(self._historyOrdersLog, 'historyOrders', HistoryLog.get_last_time)
+        return datetime.fromtimestamp(time or 0, pytz.UTC)
 
     async def update_disk_storage(self):
-        """Saves unsaved history items to disk storage.
+        """Saves unsaved history items to disk storage. Files are written in a thread pool. An update requested while
+        another one is running waits for it and then saves the changes made in the meantime.
 
         Returns:
             A coroutine resolving when the history is saved to disk.
         """
-        account_id = self._accountId
-        application = self._application
-        if not os.path.exists('.metaapi'):
-            os.mkdir('.metaapi')
-
-        async def replace_records(history_type, start_index: int, replace_items: List, size_array: List) -> List[int]:
-            file_path = f'.metaapi/{account_id}-{application}-{history_type}.bin'
-            file_size = os.path.getsize(file_path)
-            if start_index == 0:
-                f = open(file_path, 'w+')
-                f.write(stringify(replace_items))
-                f.close()
-            else:
-                f = open(file_path, 'a+')
-                replaced_items = size_array[start_index:]
-                start_position = file_size - len(replaced_items) - sum(replaced_items) - 1
-                f.seek(start_position)
-                f.truncate()
-                f.close()
-                f = open(file_path, "a+")
-                f.write(',' + stringify(replace_items)[1:])
-                f.close()
-            return size_array[0:start_index] + list(map(self.get_item_size, replace_items))
-
-        if not self._isUpdating:
-            self._isUpdating = True
-            try:
-                if self._startNewDealIndex != -1:
-                    if not os.path.isfile(f'.metaapi/{account_id}-{application}-deals.bin'):
-                        try:
-                            f = open(f'.metaapi/{account_id}-{application}-deals.bin', "w+")
-                            f.write(stringify(self._historyStorage.deals))
-                            f.close()
-                        except Exception as err:
-                            print(f'[{datetime.now().isoformat()}] Error saving deals on disk for account '
-                                  f'{self._accountId}', err)
-                        self._dealsSize = list(map(self.get_item_size, self._historyStorage.deals))
-                    else:
-                        replace_deals = self._historyStorage.deals[self._startNewDealIndex:]
-                        self._dealsSize = await replace_records('deals', self._startNewDealIndex, replace_deals,
-                                                                self._dealsSize)
+        if self._flushScheduler:
+            self._flushScheduler.cancel_flush(self)
+        try:
+            async with self._get_io_lock():
+                if len(self._pendingDeals) or self._startNewDealIndex != -1:
+                    entries = self._pendingDeals
+                    if self._startNewDealIndex != -1:
+                        entries = entries + self._historyStorage.deals[self._startNewDealIndex:]
+                    self._pendingDeals = []
                     self._startNewDealIndex = -1
-
-                if self._startNewOrderIndex != -1:
-                    if not os.path.isfile(f'.metaapi/{account_id}-{application}-historyOrders.bin'):
-                        try:
-                            f = open(f'.metaapi/{account_id}-{application}-historyOrders.bin', "w+")
-                            f.write(stringify(self._historyStorage.history_orders))
-                            f.close()
-                        except Exception as err:
-                            print(f'[{datetime.now().isoformat()}] Error saving historyOrders on disk for '
-                                  f'account {account_id}', err)
-                        self._historyOrdersSize = list(map(self.get_item_size, self._historyStorage.history_orders))
-                    else:
-                        replace_orders = self._historyStorage.history_orders[self._startNewOrderIndex:]
-                        self._historyOrdersSize = await replace_records('historyOrders', self._startNewOrderIndex,
-                                                                        replace_orders, self._historyOrdersSize)
+                    await self._run_in_executor(self._update_log, self._dealsLog, entries,
+                                                self._get_records_to_compact(self._dealsLog, entries,
+                                                                             self._historyStorage.deals))
+                if len(self._pendingHistoryOrders) or self._startNewOrderIndex != -1:
+                    entries = self._pendingHistoryOrders
+                    if self._startNewOrderIndex != -1:
+                        entries = entries + self._historyStorage.history_orders[self._startNewOrderIndex:]
+                    self._pendingHistoryOrders = []
                     self._startNewOrderIndex = -1
-            except Exception as err:
-                print(f'[{datetime.now().isoformat()}] Error updating disk storage for '
-                      f'account {account_id}', err)
-            self._isUpdating = False
+                    await self._run_in_executor(self._update_log, self._historyOrdersLog, entries,
+                                                self._get_records_to_compact(self._historyOrdersLog, entries,
+                                                                             self._historyStorage.history_orders))
+        except Exception as err:
+            print(f'[{datetime.now().isoformat()}] Error updating disk storage for '
+                  f'account {self._accountId}', err)
+
+    def cancel_pending_changes(self):
+        """Discards history changes which are not saved yet and cancels their scheduled flush."""
+        self._pendingDeals = []
+        self._startNewDealIndex = -1
+        self._pendingHistoryOrders = []
+        self._startNewOrderIndex = -1
+        if self._flushScheduler:
+            self._flushScheduler.cancel_flush(self)
 
     async def delete_storage_from_disk(self):
-        """Deletes storage files from disk.
+        """Deletes storage files from disk, discarding changes which are not saved yet.
 
         Returns:
             A coroutine resolving when the history is deleted from disk.
         """
+        self.cancel_pending_changes()
+        async with self._get_io_lock():
+            self._deletions += 1
+            await self._run_in_executor(self._delete_files)
+
+    def _delete_files(self):
+        """Deletes history logs and history files saved by previous SDK versions."""
+        self._dealsLog.delete()
+        self._historyOrdersLog.delete()
+        for history_type in ['deals', 'historyOrders']:
+            if os.path.isfile(self._get_legacy_file_path(history_type)):
+                os.remove(self._get_legacy_file_path(history_type))
+
+    def _schedule_flush(self):
+        """Schedules history changes to be saved by the flush scheduler if saving is started."""
+        if self._flushScheduler:
+            self._flushScheduler.schedule_flush(self)
+
+    def _get_io_lock(self) -> asyncio.Lock:
+        """Returns the lock which serializes disk operations of the file manager.
+
+        Returns:
+            Disk operation lock.
+        """
+        if self._ioLock is None:
+            self._ioLock = asyncio.Lock()
+        return self._ioLock
+
+    async def _run_in_executor(self, func: Callable, *args):
+        """Runs a blocking function in the history thread pool.
+
+        Args:
+            func: Function to run.
+            args: Function arguments.
+
+        Returns:
+            A coroutine resolving with the function result.
+        """
+        return await asyncio.get_event_loop().run_in_executor(get_executor(), func, *args)
+
+    async def _query_log(self, log: HistoryLog, history_type: str, query: Callable, *args):
+        """Runs a query of a history log in the history thread pool, migrating history files first.
+
+        Args:
+            log: History log.
+            history_type: History type, deals or historyOrders.
+            query: History log method to run.
+            args: Query arguments.
+
+        Returns:
+            A coroutine resolving with the query result.
+        """
+        def run_query():
+            self._migrate_files(log, history_type)
+            return query(log, *args)
+        async with self._get_io_lock():
+            return await self._run_in_executor(run_query)
+
+    def _migrate_files(self, log: HistoryLog, history_type: str):
+        """Migrates history saved as a JSON array by previous SDK versions to a history log and rewrites the log
+        segments written with another codec.
+
+        Args:
+            log: History log.
+            history_type: History type, deals or historyOrders.
+        """
+        legacy_file_path = self._get_legacy_file_path(history_type)
+        if os.path.isfile(legacy_file_path):
+            if not len(log.segment_paths):
+                with open(legacy_file_path) as f:
+                    log.compact(json.loads(f.read()))
+            os.remove(legacy_file_path)
+        log.migrate(partial(self._report_truncation, history_type))
+
+    def _report_truncation(self, history_type: str, err: CorruptFrameError):
+        """Reports a history log truncated at a corrupt entry.
+
+        Args:
+            history_type: History type, deals or historyOrders.
+            err: Decoding error of the corrupt entry.
+        """
+        print(f'[{datetime.now().isoformat()}] Truncated {history_type} history storage of account '
+              f'{self._accountId} at corrupt entry in segment {err.segment}', err)
+
+    def _read_batch(self, entries: Iterator) -> List[dict]:
+        """Parses the next batch of history log entries.
+
+        Args:
+            entries: Log entry iterator.
+
+        Returns:
+            Parsed entries, empty list if the log has been read.
+        """
+        return [entry for segment, offset, entry in islice(entries, READ_BATCH_SIZE)]
 
-        if os.path.isfile(f'.metaapi/{self._accountId}-{self._application}-deals.bin'):
-            os.remove(f'.metaapi/{self._accountId}-{self._application}-deals.bin')
-        if os.path.isfile(f'.metaapi/{self._accountId}-{self._application}-historyOrders.bin'):
-            os.remove(f'.metaapi/{self._accountId}-{self._application}-historyOrders.bin')
+    def _get_records_to_compact(self, log: HistoryLog, entries: List[dict], records: List[dict]) -> List[dict] or None:
+        """Checks if a history log contains too many stale entries and has to be compacted after appending changes.
+
+        Args:
+            log: History log.
+            entries: Changed records and tombstones to append.
+            records: All records of the history storage.
+
+        Returns:
+            Copy of the records to compact the log with or None if the log does not have to be compacted or is being
+            read.
+        """
+        if self._readers:
+            return None
+        if log.entry_count + len(entries) > 2 * len(records) + COMPACTION_THRESHOLD or \
+                len(log.segment_paths) >= MAX_SEGMENTS:
+            return list(records)
+        return None
+
+    def _update_log(self, log: HistoryLog, entries: List[dict], records: List[dict] = None):
+        """Appends changed records to a history log and compacts the log if needed.
+
+        Args:
+            log: History log.
+            entries: Changed records and tombstones.
+            records: Records to compact the log with or None if the log does not have to be compacted.
+        """
+        self._directory.make_account_directory(self._accountId)
+        log.append(entries)
+        if records is not None:
+            log.compact(records)
+
+    def _get_legacy_file_path(self, history_type: str) -> str:
+        """Returns path of a history file saved by previous SDK versions. Such files are stored in the root history
+        directory.
+
+        Args:
+            history_type: History type, deals or historyOrders.
+
+        Returns:
+            File path.
+        """
+        return os.path.join(self._directory.root, f'{self._accountId}-{self._application}-{history_type}.bin')
@@ -1,12 +1,19 @@
 from asyncio import sleep, gather
+import asyncio
 from ..metaApi.historyFileManager import HistoryFileManager
+from .historyLog import HistoryLog
+from .historyCodec import MsgpackCodec, CodecUnavailableError
+from .historyFlushScheduler import HistoryFlushScheduler
+from .historyDirectory import HistoryDirectory
 from .memoryHistoryStorageModel import MemoryHistoryStorageModel
 import pytest
 import json
 import os
-from mock import AsyncMock, patch
+from mock import patch
 from datetime import datetime
 import shutil
+import threading
+import pytz
 file_manager: HistoryFileManager or None = None
 storage = None
 test_deal = None
@@ -47,12 +54,7 @@ class MockStorage(MemoryHistoryStorageModel):
 
 async def read_history_storage_file():
     """Helper function to read saved history storage."""
-    history = {'deals': [], 'historyOrders': []}
-    if os.path.isfile('.metaapi/accountId-application-deals.bin'):
-        history['deals'] = json.loads(open('.metaapi/accountId-application-deals.bin').read())
-    if os.path.isfile('.metaapi/accountId-application-historyOrders.bin'):
-        history['historyOrders'] = json.loads(open('.metaapi/accountId-application-historyOrders.bin').read())
-    return history
+    return await HistoryFileManager('accountId', 'application').get_history_from_disk()
 
 
 @pytest.fixture(scope="module", autouse=True)
@@ -97,37 +99,39 @@ async def run_around_tests():
                    datetime.fromtimestamp(300).isoformat(), 'currentPrice': 1, 'volume': 0.01, 'currentVolume': 0,
                    'positionId': '61206632', 'platform': 'mt5', 'comment': 'AS_AUDNZD_5YyM6KS7Fv:'}
     yield
-    if os.path.isfile('.metaapi/accountId-application-deals.bin'):
-        os.remove('.metaapi/accountId-application-deals.bin')
-    if os.path.isfile('.metaapi/accountId-application-historyOrders.bin'):
-        os.remove('.metaapi/accountId-application-historyOrders.bin')
+    await file_manager.delete_storage_from_disk()
 
 
 class TestHistoryFileManager:
 
     @pytest.mark.asyncio
     async def test_start_stop_job(self):
-        """Should start and stop job."""
-
-        with patch.object(file_manager, 'update_disk_storage', new_callable=AsyncMock):
-            with patch('lib.metaApi.historyFileManager.asyncio.sleep', new=lambda x: sleep(x/120)):
-                file_manager.update_disk_storage = AsyncMock()
-                file_manager.start_update_job()
-                await sleep(0.6)
-                assert file_manager.update_disk_storage.call_count == 1
-                await sleep(0.6)
-                assert file_manager.update_disk_storage.call_count == 2
-                file_manager.stop_update_job()
-                await sleep(0.6)
-                assert file_manager.update_disk_storage.call_count == 2
-                file_manager.start_update_job()
-                await sleep(0.7)
-                assert file_manager.update_disk_storage.call_count == 3
-                file_manager.stop_update_job()
+        """Should schedule changes to be saved by the flush scheduler while the job is started."""
+
+        scheduler = HistoryFlushScheduler(0.2)
+        with patch('lib.metaApi.historyFileManager.get_flush_scheduler', return_value=scheduler):
+            storage._deals = [test_deal]
+            file_manager.add_deals([test_deal])
+            assert scheduler.scheduled_count == 0
+            file_manager.start_update_job()
+            assert scheduler.scheduled_count == 1
+            await sleep(0.25)
+            assert scheduler.scheduled_count == 0
+            assert (await read_history_storage_file())['deals'] == [test_deal]
+            storage._deals = [test_deal, test_deal2]
+            file_manager.add_deals([test_deal2])
+            file_manager.add_deals([test_deal2])
+            assert scheduler.scheduled_count == 1
+            file_manager.stop_update_job()
+            assert scheduler.scheduled_count == 0
+            file_manager.start_update_job()
+            await scheduler.flush_all()
+            assert (await read_history_storage_file())['deals'] == [test_deal, test_deal2]
+            file_manager.stop_update_job()
 
     @pytest.mark.asyncio
     async def test_read_history(self):
-        """Should read history from file."""
+        """Should read history saved by previous versions and migrate it to the log format."""
 
         f = open('.metaapi/accountId-application-deals.bin', "w+")
         f.write(json.dumps([test_deal]))
@@ -140,6 +144,59 @@ class TestHistoryFileManager:
         history = await file_manager.get_history_from_disk()
         assert history['deals'] == [test_deal]
         assert history['historyOrders'] == [test_order]
+        assert not os.path.isfile('.metaapi/accountId-application-deals.bin')
+        assert not os.path.isfile('.metaapi/accountId-application-historyOrders.bin')
+        saved_data = await read_history_storage_file()
+        assert saved_data['deals'] == [test_deal]
+        assert saved_data['historyOrders'] == [test_order]
+
+    @pytest.mark.asyncio
+    async def test_migrate_history_written_with_another_codec(self):
+        """Should rewrite history saved with another codec with the file manager codec on load."""
+
+        json_file_manager = HistoryFileManager('accountId', 'application', storage, 'json')
+        storage._deals = [test_deal, test_deal2]
+        json_file_manager.add_deals([test_deal, test_deal2])
+        await json_file_manager.update_disk_storage()
+        assert json_file_manager._dealsLog.segment_paths[0].endswith('.log')
+        saved_data = await read_history_storage_file()
+        assert saved_data['deals'] == [test_deal, test_deal2]
+        assert HistoryFileManager('accountId', 'application')._dealsLog.segment_paths == \
+            ['.metaapi/accountId-application-deals.000002.zlog']
+
+    @pytest.mark.asyncio
+    async def test_query_saved_history(self):
+        """Should query history saved on disk by time range and ticket."""
+
+        storage._deals = [test_deal, test_deal2, test_deal3]
+        storage._historyOrders = [test_order, test_order2]
+        file_manager.add_deals([test_deal, test_deal2, test_deal3])
+        file_manager.add_history_orders([test_order, test_order2])
+        await file_manager.update_disk_storage()
+        other_file_manager = HistoryFileManager('accountId', 'application')
+        assert await other_file_manager.get_deals_by_time_range(datetime.fromtimestamp(200),
+                                                                datetime.fromtimestamp(300)) == [test_deal2]
+        assert await other_file_manager.get_deals_by_ticket(test_deal3['id']) == [test_deal3]
+        assert await other_file_manager.get_history_orders_by_time_range(datetime.fromtimestamp(150)) == \
+            [test_order2]
+        assert await other_file_manager.get_history_orders_by_ticket('unknown') == []
+        assert await other_file_manager.get_last_deal_time() == datetime.fromtimestamp(300, pytz.UTC)
+        assert await other_file_manager.get_last_history_order_time() == datetime.fromtimestamp(200, pytz.UTC)
+
+    @pytest.mark.asyncio
+    async def test_save_history_in_custom_directory(self, tmp_path):
+        """Should save history in a custom sharded directory."""
+
+        directory = HistoryDirectory(str(tmp_path / 'history'), 2)
+        custom_file_manager = HistoryFileManager('accountId', 'application', storage, history_directory=directory)
+        storage._deals = [test_deal]
+        custom_file_manager.add_deals([test_deal])
+        await custom_file_manager.update_disk_storage()
+        assert os.path.isfile(os.path.join(directory.get_account_directory('accountId'),
+                                           'accountId-application-deals.000001.zlog'))
+        assert not os.path.exists('.metaapi/accountId-application-deals.000001.zlog')
+        assert (await HistoryFileManager('accountId', 'application', history_directory=directory)
+                .get_history_from_disk())['deals'] == [test_deal]
 
     @pytest.mark.asyncio
     async def test_save_items(self):
@@ -147,8 +204,8 @@ class TestHistoryFileManager:
 
         storage._deals = [test_deal]
         storage._historyOrders = [test_order]
-        file_manager.set_start_new_deal_index(0)
-        file_manager.set_start_new_order_index(0)
+        file_manager.add_deals([test_deal])
+        file_manager.add_history_orders([test_order])
         await file_manager.update_disk_storage()
         saved_data = await read_history_storage_file()
         assert saved_data['deals'] == [test_deal]
@@ -160,21 +217,21 @@ class TestHistoryFileManager:
 
         storage._deals = [test_deal, test_deal2]
         storage._historyOrders = [test_order, test_order2]
-        file_manager.set_start_new_deal_index(0)
-        file_manager.set_start_new_order_index(0)
+        file_manager.add_deals([test_deal, test_deal2])
+        file_manager.add_history_orders([test_order, test_order2])
         await file_manager.update_disk_storage()
         test_deal2['magic'] = 100
         test_order2['magic'] = 100
-        file_manager.set_start_new_deal_index(1)
-        file_manager.set_start_new_order_index(1)
+        file_manager.add_deals([test_deal2])
+        file_manager.add_history_orders([test_order2])
         await file_manager.update_disk_storage()
         saved_data = await read_history_storage_file()
         assert saved_data['deals'] == [test_deal, test_deal2]
         assert saved_data['historyOrders'] == [test_order, test_order2]
 
     @pytest.mark.asyncio
-    async def test_replace_all_items(self):
-        """Should replace all items in a file."""
+    async def test_replace_items_from_index(self):
+        """Should save items starting from the earliest changed index."""
 
         storage._deals = [test_deal, test_deal2]
         storage._historyOrders = [test_order, test_order2]
@@ -185,6 +242,7 @@ class TestHistoryFileManager:
         test_deal2['magic'] = 100
         test_order['magic'] = 100
         test_order2['magic'] = 100
+        file_manager.set_start_new_deal_index(1)
         file_manager.set_start_new_deal_index(0)
         file_manager.set_start_new_order_index(0)
         await file_manager.update_disk_storage()
@@ -194,34 +252,214 @@ class TestHistoryFileManager:
 
     @pytest.mark.asyncio
     async def test_append_new_object(self):
-        """Should append a new object to already saved ones."""
+        """Should append a new object to already saved ones without rewriting them."""
 
         storage._deals = [test_deal, test_deal2]
         storage._historyOrders = [test_order, test_order2]
-        file_manager.set_start_new_deal_index(0)
-        file_manager.set_start_new_order_index(0)
+        file_manager.add_deals([test_deal, test_deal2])
+        file_manager.add_history_orders([test_order, test_order2])
         await file_manager.update_disk_storage()
+        segment_path = file_manager._dealsLog.segment_paths[-1]
+        saved_bytes = open(segment_path, 'rb').read()
         storage._deals = [test_deal, test_deal2, test_deal3]
         storage._historyOrders = [test_order, test_order2, test_order3]
-        file_manager.set_start_new_deal_index(2)
-        file_manager.set_start_new_order_index(2)
+        file_manager.add_deals([test_deal3])
+        file_manager.add_history_orders([test_order3])
         await file_manager.update_disk_storage()
+        assert open(segment_path, 'rb').read().startswith(saved_bytes)
         saved_data = await read_history_storage_file()
         assert saved_data['deals'] == [test_deal, test_deal2, test_deal3]
         assert saved_data['historyOrders'] == [test_order, test_order2, test_order3]
 
+    @pytest.mark.asyncio
+    async def test_remove_items(self):
+        """Should remove items from a file."""
+
+        storage._deals = [test_deal, test_deal2]
+        file_manager.add_deals([test_deal, test_deal2])
+        await file_manager.update_disk_storage()
+        storage._deals = [test_deal2]
+        file_manager.remove_deals([test_deal])
+        await file_manager.update_disk_storage()
+        saved_data = await read_history_storage_file()
+        assert saved_data['deals'] == [test_deal2]
+
+    @pytest.mark.asyncio
+    async def test_compact_log(self):
+        """Should compact the log once it contains too many replaced items."""
+
+        storage._deals = [test_deal, test_deal2]
+        with patch('lib.metaApi.historyFileManager.COMPACTION_THRESHOLD', 2):
+            for i in range(4):
+                test_deal['magic'] = i
+                file_manager.add_deals([test_deal, test_deal2])
+                await file_manager.update_disk_storage()
+        assert file_manager._dealsLog.entry_count == 2
+        assert len(file_manager._dealsLog.segment_paths) == 1
+        saved_data = await read_history_storage_file()
+        assert saved_data['deals'] == [test_deal, test_deal2]
+        assert saved_data['deals'][0]['magic'] == 3
+
+    @pytest.mark.asyncio
+    async def test_save_changes_made_during_update(self):
+        """Should save changes made while an update is running when history is flushed during the update."""
+
+        scheduler = HistoryFlushScheduler(0.2)
+        append_started = threading.Event()
+        resume_append = threading.Event()
+        append = HistoryLog.append
+
+        def blocking_append(log, entries):
+            append_started.set()
+            resume_append.wait(5)
+            append(log, entries)
+
+        with patch('lib.metaApi.historyFileManager.get_flush_scheduler', return_value=scheduler), \
+                patch.object(HistoryLog, 'append', blocking_append):
+            file_manager.start_update_job()
+            storage._deals = [test_deal]
+            file_manager.add_deals([test_deal])
+            update = asyncio.ensure_future(file_manager.update_disk_storage())
+            await asyncio.get_event_loop().run_in_executor(None, append_started.wait, 5)
+            storage._deals = [test_deal, test_deal2]
+            file_manager.add_deals([test_deal2])
+            assert scheduler.scheduled_count == 1
+            flush = asyncio.ensure_future(scheduler.flush_all())
+            await sleep(0.05)
+            resume_append.set()
+            await asyncio.wait_for(gather(update, flush), 5)
+            file_manager.stop_update_job()
+        assert (await read_history_storage_file())['deals'] == [test_deal, test_deal2]
+
+    @pytest.mark.asyncio
+    async def test_write_in_thread_pool(self):
+        """Should read and write files in the history thread pool."""
+
+        thread_names = []
+        append = HistoryLog.append
+        iterate = HistoryLog.iterate
+
+        def record_append(log, entries):
+            thread_names.append(threading.current_thread().name)
+            append(log, entries)
+
+        def record_iterate(log, on_truncate=None):
+            thread_names.append(threading.current_thread().name)
+            yield from iterate(log, on_truncate)
+
+        storage._deals = [test_deal]
+        file_manager.add_deals([test_deal])
+        with patch.object(HistoryLog, 'append', record_append), patch.object(HistoryLog, 'iterate', record_iterate):
+            await file_manager.update_disk_storage()
+            assert (await file_manager.get_history_from_disk())['deals'] == [test_deal]
+        assert len(thread_names) == 3
+        assert all(map(lambda name: name.startswith('metaapi-history'), thread_names))
+
+    @pytest.mark.asyncio
+    async def test_iterate_history_in_batches(self):
+        """Should read history log entries in batches including tombstones."""
+
+        storage._deals = [test_deal, test_deal2, test_deal3]
+        file_manager.add_deals([test_deal, test_deal2, test_deal3])
+        file_manager.remove_deals([test_deal2])
+        await file_manager.update_disk_storage()
+        with patch('lib.metaApi.historyFileManager.READ_BATCH_SIZE', 2):
+            batches = [batch async for batch in file_manager.iterate_history_from_disk('deals')]
+        assert batches == [[test_deal, test_deal2], [test_deal3, {'$deleted': True, 'id': test_deal2['id'],
+                                                                  'type': test_deal2['type'],
+                                                                  'time': test_deal2['time']}]]
+        assert [batch async for batch in file_manager.iterate_history_from_disk('historyOrders')] == []
+
+    @pytest.mark.asyncio
+    async def test_release_lock_between_batches(self):
+        """Should save history while a batch is processed and defer compaction until iteration finishes."""
+
+        storage._deals = [test_deal, test_deal2]
+        file_manager.add_deals([test_deal, test_deal2])
+        await file_manager.update_disk_storage()
+        with patch('lib.metaApi.historyFileManager.READ_BATCH_SIZE', 1), \
+                patch('lib.metaApi.historyFileManager.COMPACTION_THRESHOLD', -10):
+            batches = []
+            async for batch in file_manager.iterate_history_from_disk('deals'):
+                batches.append(batch)
+                if len(batches) == 1:
+                    file_manager.add_deals([test_deal3])
+                    await asyncio.wait_for(file_manager.update_disk_storage(), 1)
+            assert batches == [[test_deal], [test_deal2], [test_deal3]]
+            assert file_manager._dealsLog.entry_count == 3
+            file_manager.add_deals([test_deal3])
+            await file_manager.update_disk_storage()
+        assert file_manager._dealsLog.entry_count == 2
+
+    @pytest.mark.asyncio
+    async def test_stop_iteration_if_history_is_deleted(self):
+        """Should stop iterating history if it is deleted from disk between batches."""
+
+        storage._deals = [test_deal, test_deal2]
+        file_manager.add_deals([test_deal, test_deal2])
+        await file_manager.update_disk_storage()
+        with patch('lib.metaApi.historyFileManager.READ_BATCH_SIZE', 1):
+            batches = []
+            async for batch in file_manager.iterate_history_from_disk('deals'):
+                batches.append(batch)
+                await file_manager.delete_storage_from_disk()
+        assert batches == [[test_deal]]
+
+    @pytest.mark.asyncio
+    async def test_truncate_corrupt_log(self):
+        """Should truncate a log to the entries preceding a corrupt entry and keep appending to it."""
+
+        storage._deals = [test_deal, test_deal2]
+        file_manager.add_deals([test_deal, test_deal2])
+        await file_manager.update_disk_storage()
+        segment_path = file_manager._dealsLog.segment_paths[0]
+        size = os.path.getsize(segment_path)
+        with open(segment_path, 'ab') as f:
+            f.write(b'\x00\x00\x01')
+        other_file_manager = HistoryFileManager('accountId', 'application', storage)
+        with patch('lib.metaApi.historyFileManager.READ_BATCH_SIZE', 3):
+            batches = [batch async for batch in other_file_manager.iterate_history_from_disk('deals')]
+        assert batches == [[test_deal, test_deal2]]
+        assert os.path.getsize(segment_path) == size
+        storage._deals = [test_deal, test_deal2, test_deal3]
+        other_file_manager.add_deals([test_deal3])
+        await other_file_manager.update_disk_storage()
+        assert (await read_history_storage_file())['deals'] == [test_deal, test_deal2, test_deal3]
+
+    @pytest.mark.asyncio
+    async def test_resave_history_if_log_can_not_be_read(self):
+        """Should delete a log which can not be read and save the records read before the error again."""
+
+        storage._deals = [test_deal, test_deal2]
+        file_manager.add_deals([test_deal, test_deal2])
+        await file_manager.update_disk_storage()
+        iterate = HistoryLog.iterate
+
+        def failing_iterate(log, on_truncate=None):
+            yield from iterate(log, on_truncate)
+            raise OSError('Input/output error')
+
+        other_file_manager = HistoryFileManager('accountId', 'application', storage)
+        with patch.object(HistoryLog, 'iterate', failing_iterate), \
+                patch('lib.metaApi.historyFileManager.READ_BATCH_SIZE', 2):
+            batches = [batch async for batch in other_file_manager.iterate_history_from_disk('deals')]
+        assert batches == [[test_deal, test_deal2]]
+        assert other_file_manager._dealsLog.segment_paths == []
+        await other_file_manager.update_disk_storage()
+        assert (await read_history_storage_file())['deals'] == [test_deal, test_deal2]
+
     @pytest.mark.asyncio
     async def test_not_corrupt(self):
         """Should not corrupt the disk storage if update called multiple times."""
         storage._deals = [test_deal, test_deal2]
         storage._historyOrders = [test_order, test_order2]
-        file_manager.set_start_new_deal_index(0)
-        file_manager.set_start_new_order_index(0)
+        file_manager.add_deals([test_deal, test_deal2])
+        file_manager.add_history_orders([test_order, test_order2])
         await file_manager.update_disk_storage()
         storage._deals = [test_deal, test_deal2, test_deal3]
         storage._historyOrders = [test_order, test_order2, test_order3]
-        file_manager.set_start_new_deal_index(2)
-        file_manager.set_start_new_order_index(2)
+        file_manager.add_deals([test_deal3])
+        file_manager.add_history_orders([test_order3])
         await gather(*[
             file_manager.update_disk_storage(),
             file_manager.update_disk_storage(),
@@ -229,24 +467,49 @@ class TestHistoryFileManager:
             file_manager.update_disk_storage(),
             file_manager.update_disk_storage()
         ])
-        json.loads(open('.metaapi/accountId-application-historyOrders.bin').read())
+        saved_data = await read_history_storage_file()
+        assert saved_data['historyOrders'] == [test_order, test_order2, test_order3]
 
     @pytest.mark.asyncio
     async def test_remove_history(self):
         """Should remove history from disk."""
 
+        storage._deals = [test_deal]
+        storage._historyOrders = [test_order]
+        file_manager.add_deals([test_deal])
+        file_manager.add_history_orders([test_order])
+        await file_manager.update_disk_storage()
         open('.metaapi/accountId-application-deals.bin', "w+").close()
-        open('.metaapi/accountId-application-historyOrders.bin', "w+").close()
-        assert os.path.isfile('.metaapi/accountId-application-deals.bin')
-        assert os.path.isfile('.metaapi/accountId-application-historyOrders.bin')
+        assert len(file_manager._dealsLog.segment_paths) == 1
+        assert len(file_manager._historyOrdersLog.segment_paths) == 1
         await file_manager.delete_storage_from_disk()
         assert not os.path.isfile('.metaapi/accountId-application-deals.bin')
-        assert not os.path.isfile('.metaapi/accountId-application-historyOrders.bin')
+        assert not any(name.startswith('accountId-application') for name in os.listdir('.metaapi'))
 
     @pytest.mark.asyncio
     async def test_remove_history_if_not_exists(self):
         """Should do nothing on remove history if files don't exist."""
 
-        assert not os.path.isfile('.metaapi/accountId-application-deals.bin')
-        assert not os.path.isfile('.metaapi/accountId-application-historyOrders.bin')
+        assert not any(name.startswith('accountId-application') for name in os.listdir('.metaapi'))
         await file_manager.delete_storage_from_disk()
+
+    @pytest.mark.asyncio
+    async def test_keep_log_if_codec_is_unavailable(self):
+        """Should raise an error and keep a log written with a codec which package is not installed."""
+
+        storage._deals = [test_deal, test_deal2]
+        file_manager.add_deals([test_deal, test_deal2])
+        await file_manager.update_disk_storage()
+        segment_path = file_manager._dealsLog.segment_paths[0]
+        mlog_path = segment_path[:segment_path.rindex('.')] + '.mlog'
+        os.rename(segment_path, mlog_path)
+
+        def unavailable(codec):
+            raise CodecUnavailableError('msgpack history codec requires msgpack package')
+
+        other_file_manager = HistoryFileManager('accountId', 'application', storage)
+        with patch.object(MsgpackCodec, '__init__', unavailable):
+            with pytest.raises(CodecUnavailableError):
+                [batch async for batch in other_file_manager.iterate_history_from_disk('deals')]
+        assert os.path.exists(mlog_path)
+        os.rename(mlog_path, segment_path)
@@ -0,0 +1,149 @@
+from datetime import datetime
+import asyncio
+import heapq
+import random
+
+FLUSH_INTERVAL = 60
+"""Maximum time in seconds a history change waits before it is saved to disk."""
+
+MAX_CONCURRENT_FLUSHES = 4
+"""Maximum number of history file managers saving history at the same time."""
+
+scheduler = None
+
+
+def get_flush_scheduler() -> 'HistoryFlushScheduler':
+    """Returns the flush scheduler shared by history file managers of the process. The scheduler is created on first
+    use.
+
+    Returns:
+        History flush scheduler.
+    """
+    global scheduler
+    if scheduler is None:
+        scheduler = HistoryFlushScheduler()
+    return scheduler
+
+
+class HistoryFlushScheduler:
+    """Saves changed history of history file managers to disk from a single task. A file manager is saved once after
+    it changes no matter how many times it changes until then. Flushes of different file managers are spread randomly
+    over the second half of the flush interval instead of running in lockstep, and the number of concurrent flushes
+    is limited."""
+
+    def __init__(self, interval: float = FLUSH_INTERVAL, max_concurrent_flushes: int = MAX_CONCURRENT_FLUSHES):
+        """Inits the history flush scheduler instance.
+
+        Args:
+            interval: Maximum time in seconds a change waits before it is saved.
+            max_concurrent_flushes: Maximum number of file managers saving history at the same time.
+        """
+        self._interval = interval
+        self._maxConcurrentFlushes = max_concurrent_flushes
+        self._scheduled = {}
+        self._queue = []
+        self._sequence = 0
+        self._flushes = set()
+        self._loop = None
+        self._task = None
+        self._wakeup = None
+        self._semaphore = None
+
+    @property
+    def scheduled_count(self) -> int:
+        """Returns number of file managers waiting to be saved.
+
+        Returns:
+            Number of file managers waiting to be saved.
+        """
+        return len(self._scheduled)
+
+    def schedule_flush(self, file_manager: 'HistoryFileManager'):
+        """Schedules changed history of a file manager to be saved. Does nothing if the file manager is already
+        scheduled.
+
+        Args:
+            file_manager: History file manager with unsaved changes.
+        """
+        if file_manager in self._scheduled:
+            return
+        self._start()
+        self._sequence += 1
+        self._scheduled[file_manager] = self._sequence
+        due_time = self._loop.time() + self._interval * random.uniform(0.5, 1)
+        heapq.heappush(self._queue, (due_time, self._sequence, file_manager))
+        self._wakeup.set()
+
+    def cancel_flush(self, file_manager: 'HistoryFileManager'):
+        """Cancels a scheduled flush of a file manager.
+
+        Args:
+            file_manager: History file manager.
+        """
+        self._scheduled.pop(file_manager, None)
+
+    async def flush_all(self):
+        """Saves history of all scheduled file managers immediately, e.g. before the application exits.
+
+        Returns:
+            A coroutine resolving when the history is saved, including flushes which are already running.
+        """
+        if len(self._scheduled):
+            self._start()
+        for file_manager in list(self._scheduled):
+            del self._scheduled[file_manager]
+            self._start_flush(file_manager)
+        if len(self._flushes):
+            await asyncio.gather(*self._flushes)
+
+    def _start(self):
+        """Starts the scheduler task in the current event loop if it is not running."""
+        loop = asyncio.get_event_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._task = None
+            self._flushes = set()
+            self._wakeup = asyncio.Event()
+            self._semaphore = asyncio.Semaphore(self._maxConcurrentFlushes)
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        """Starts flushes of file managers as they become due. Stops when no file managers are scheduled."""
+        while len(self._scheduled):
+            self._wakeup.clear()
+            now = self._loop.time()
+            while len(self._queue) and self._queue[0][0] <= now:
+                due_time, sequence, file_manager = heapq.heappop(self._queue)
+                if self._scheduled.get(file_manager) == sequence:
+                    del self._scheduled[file_manager]
+                    self._start_flush(file_manager)
+            if len(self._queue):
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._queue[0][0] - now)
+                except asyncio.TimeoutError:
+                    pass
+        self._queue = []
+        self._task = None
+
+    def _start_flush(self, file_manager: 'HistoryFileManager'):
+        """Starts saving history of a file manager.
+
+        Args:
+            file_manager: History file manager.
+        """
+        flush = asyncio.ensure_future(self._flush(file_manager))
+        self._flushes.add(flush)
+        flush.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, file_manager: 'HistoryFileManager'):
+        """Saves history of a file manager, waiting for a free flush slot.
+
+        Args:
+            file_manager: History file manager.
+        """
+        async with self._semaphore:
+            try:
+                await file_manager.update_disk_storage()
+            except Exception as err:
+                print(f'[{datetime.now().isoformat()}] Failed to flush history storage', err)
@@ -0,0 +1,89 @@
+from .historyFlushScheduler import HistoryFlushScheduler
+from asyncio import sleep
+import pytest
+scheduler = None
+flushes = None
+
+
+class MockFileManager:
+
+    def __init__(self, duration=0):
+        self.flush_count = 0
+        self.duration = duration
+
+    async def update_disk_storage(self):
+        flushes['running'] += 1
+        flushes['max_running'] = max(flushes['running'], flushes['max_running'])
+        await sleep(self.duration)
+        self.flush_count += 1
+        flushes['running'] -= 1
+
+
+@pytest.fixture(autouse=True)
+async def run_around_tests():
+    global scheduler
+    global flushes
+    scheduler = HistoryFlushScheduler(0.2, 2)
+    flushes = {'running': 0, 'max_running': 0}
+    yield
+    await scheduler.flush_all()
+
+
+class TestHistoryFlushScheduler:
+
+    @pytest.mark.asyncio
+    async def test_coalesce_flushes(self):
+        """Should flush a file manager scheduled several times once."""
+        file_manager = MockFileManager()
+        for i in range(3):
+            scheduler.schedule_flush(file_manager)
+            await sleep(0.01)
+        assert scheduler.scheduled_count == 1
+        await sleep(0.3)
+        assert file_manager.flush_count == 1
+        assert scheduler.scheduled_count == 0
+        scheduler.schedule_flush(file_manager)
+        await sleep(0.3)
+        assert file_manager.flush_count == 2
+
+    @pytest.mark.asyncio
+    async def test_spread_flushes(self):
+        """Should flush file managers in the second half of the interval."""
+        file_managers = [MockFileManager() for i in range(20)]
+        for file_manager in file_managers:
+            scheduler.schedule_flush(file_manager)
+        await sleep(0.09)
+        assert sum(map(lambda file_manager: file_manager.flush_count, file_managers)) == 0
+        await sleep(0.13)
+        assert all(map(lambda file_manager: file_manager.flush_count == 1, file_managers))
+
+    @pytest.mark.asyncio
+    async def test_limit_concurrent_flushes(self):
+        """Should limit number of concurrent flushes."""
+        file_managers = [MockFileManager(0.05) for i in range(6)]
+        for file_manager in file_managers:
+            scheduler.schedule_flush(file_manager)
+        await scheduler.flush_all()
+        assert all(map(lambda file_manager: file_manager.flush_count == 1, file_managers))
+        assert flushes['max_running'] == 2
+
+    @pytest.mark.asyncio
+    async def test_flush_all(self):
+        """Should flush scheduled file managers immediately."""
+        file_managers = [MockFileManager(0.01) for i in range(3)]
+        for file_manager in file_managers:
+            scheduler.schedule_flush(file_manager)
+        await scheduler.flush_all()
+        assert all(map(lambda file_manager: file_manager.flush_count == 1, file_managers))
+        assert scheduler.scheduled_count == 0
+        await sleep(0.3)
+        assert all(map(lambda file_manager: file_manager.flush_count == 1, file_managers))
+
+    @pytest.mark.asyncio
+    async def test_cancel_flush(self):
+        """Should not flush a file manager after its flush is cancelled."""
+        file_manager = MockFileManager()
+        scheduler.schedule_flush(file_manager)
+        scheduler.cancel_flush(file_manager)
+        await sleep(0.3)
+        assert file_manager.flush_count == 0
@@ -0,0 +1,563 @@
+from .historyStorage import get_record_key
+from .historyCodec import HistoryCodec, CorruptFrameError, CODECS, DEFAULT_CODEC, get_codec
+from bisect import bisect_left
+from mmap import mmap, ACCESS_READ
+from typing import List, Tuple, Iterator, Dict, Optional, Callable
+import glob
+import json
+import os
+
+SEGMENT_SIZE = 16 * 1024 * 1024
+"""Size in bytes after which a new log segment is started."""
+
+
+def get_record_identity(record: dict, time_field: str) -> Tuple[str, str, float]:
+    """Returns the key which identifies a history record in the log. A record replaces an earlier record with the
+    same id, type and time.
+
+    Args:
+        record: History record.
+        time_field: Name of the record time field.
+
+    Returns:
+        Tuple of record id, type and timestamp.
+    """
+    return record.get('id'), record.get('type'), get_record_key(record, time_field)[0]
+
+
+def make_tombstone(record: dict, time_field: str) -> dict:
+    """Creates a log entry which deletes a record from the log.
+
+    Args:
+        record: Record to delete.
+        time_field: Name of the record time field.
+
+    Returns:
+        Tombstone log entry.
+    """
+    tombstone = {'$deleted': True}
+    for field in ('id', 'type', time_field):
+        if field in record:
+            tombstone[field] = record[field]
+    return tombstone
+
+
+def write_file_atomically(path: str, data: bytes):
+    """Writes a file through a temporary file which replaces the file once it is flushed to disk, so that the file
+    keeps either its previous or its new contents if the process stops while writing it.
+
+    Args:
+        path: File path.
+        data: File contents.
+    """
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class HistoryLog:
+    """Append-only log of history records stored in segment files encoded with a history codec. Each entry is a
+    record or a tombstone. A record replaces earlier records with the same id, type and time and a tombstone deletes
+    them, so that changes are persisted by appending only the changed records. Compaction rewrites live records into
+    a new segment and deletes older segments. Segments written with other codecs are read as well and are rewritten
+    with the log codec on migration.
+
+    The log survives the process stopping at any point. Appended entries are checksummed by the codec and a log
+    which ends with an entry that was not written completely is truncated to its last valid entry when it is read.
+    Compacted segments and the index are written to temporary files which atomically replace the previous files.
+
+    Locations of live records are kept in an append-only index file next to the segments, so that records can be
+    queried by time or id without reading the whole log. Queried records are read through memory-mapped segments
+    decoding only the frames which contain them."""
+
+    def __init__(self, path: str, time_field: str, segment_size: int = SEGMENT_SIZE, codec: HistoryCodec = None):
+        """Inits the history log instance.
+
+        Args:
+            path: Path prefix of the segment files, segments are stored as {path}.{number}.{extension} files and
+            the index is stored as {path}.idx file.
+            time_field: Name of the record time field.
+            segment_size: Size in bytes after which a new segment is started.
+            codec: Codec to write segments with, zlib codec by default.
+        """
+        self._path = path
+        self._timeField = time_field
+        self._segmentSize = segment_size
+        self._codec = codec or get_codec(DEFAULT_CODEC)
+        self._codecs = {self._codec.extension: self._codec}
+        self._segments = None
+        self._entryCount = 0
+        self._index = None
+        self._sortedIndex = None
+
+    @property
+    def entry_count(self) -> int:
+        """Returns number of entries in the log including replaced records and tombstones. The count is known after
+        the log was read or compacted.
+
+        Returns:
+            Number of entries in the log.
+        """
+        return self._entryCount
+
+    @property
+    def segment_paths(self) -> List[str]:
+        """Returns paths of the log segments in the order they were written.
+
+        Returns:
+            Segment paths.
+        """
+        return [self._get_segment_path(number, extension) for number, extension in self._get_segments()]
+
+    @property
+    def index_path(self) -> str:
+        """Returns path of the index file.
+
+        Returns:
+            Index file path.
+        """
+        return f'{self._path}.idx'
+
+    def read(self, on_truncate: Callable[[CorruptFrameError], None] = None) -> List[dict]:
+        """Reads live records from the log.
+
+        Args:
+            on_truncate: Function to call if the log is truncated at a corrupt entry, see iterate.
+
+        Returns:
+            Live records in the order they were first written.
+        """
+        records = {}
+        for segment, offset, entry in self.iterate(on_truncate):
+            key = get_record_identity(entry, self._timeField)
+            if entry.get('$deleted'):
+                records.pop(key, None)
+            else:
+                records[key] = entry
+        return list(records.values())
+
+    def iterate(self, on_truncate: Callable[[CorruptFrameError], None] = None) -> Iterator[Tuple[int, int, dict]]:
+        """Iterates over log entries in the order they were written, reading and decoding one entry at a time.
+        Entries are records and tombstones, tombstones have $deleted field set.
+
+        Args:
+            on_truncate: Function to call with the decoding error if a corrupt entry is found. If set, the log is
+            truncated to the entries preceding the corrupt entry, which have already been returned, and the iteration
+            stops. Otherwise CorruptFrameError is raised.
+
+        Returns:
+            Iterator of segment number, byte offset of the entry in the segment and the entry. For compressed codecs
+            the offset is the offset of the frame containing the entry.
+        """
+        count = 0
+        try:
+            for item in self._iterate():
+                count += 1
+                yield item
+        except CorruptFrameError as err:
+            if on_truncate is None:
+                raise
+            self._truncate(err.segment, err.offset)
+            on_truncate(err)
+        self._entryCount = count
+
+    def get_records_by_time_range(self, start_time: float = None, end_time: float = None) -> List[dict]:
+        """Returns live records in a time range sorted by time and id, decoding only the frames which contain them.
+
+        Args:
+            start_time: POSIX timestamp to start from, inclusive. By default starts from the first record.
+            end_time: POSIX timestamp to end at, exclusive. By default ends at the last record.
+
+        Returns:
+            Records found.
+        """
+        keys, locations, locations_by_id = self._get_sorted_index()
+        start = bisect_left(keys, (start_time, '')) if start_time is not None else 0
+        end = bisect_left(keys, (end_time, '')) if end_time is not None else len(keys)
+        return self._read_records(locations[start:end])
+
+    def get_records_by_id(self, id: str) -> List[dict]:
+        """Returns live records with an id sorted by time, decoding only the frames which contain them.
+
+        Args:
+            id: Record id.
+
+        Returns:
+            Records found.
+        """
+        keys, locations, locations_by_id = self._get_sorted_index()
+        return self._read_records(locations_by_id.get(id, []))
+
+    def get_last_time(self) -> Optional[float]:
+        """Returns time of the last live record from the index without decoding records.
+
+        Returns:
+            POSIX timestamp of the last record or None if the log is empty.
+        """
+        keys, locations, locations_by_id = self._get_sorted_index()
+        return keys[-1][0] if len(keys) else None
+
+    def append(self, entries: List[dict]):
+        """Appends records and tombstones to the last segment, starting a new segment if the last one is full or was
+        written with another codec.
+
+        Args:
+            entries: Records and tombstones to append.
+        """
+        if not len(entries):
+            return
+        segments = self._get_segments()
+        new_log = not len(segments)
+        if not len(segments) or segments[-1][1] != self._codec.extension or \
+                os.path.getsize(self._get_segment_path(*segments[-1])) >= self._segmentSize:
+            segments.append((segments[-1][0] + 1 if len(segments) else 1, self._codec.extension))
+        segment_path = self._get_segment_path(*segments[-1])
+        data, locations = self._encode(entries, segments[-1][0],
+                                       os.path.getsize(segment_path) if os.path.isfile(segment_path) else 0)
+        with open(segment_path, 'ab') as f:
+            f.write(data)
+        self._entryCount += len(entries)
+        if new_log:
+            self._index = {}
+            self._update_index(self._index, list(map(self._get_index_line, entries, locations)))
+            self._save_index()
+        elif os.path.isfile(self.index_path):
+            self._write_index(map(self._get_index_line, entries, locations))
+        else:
+            self._index = None
+            self._sortedIndex = None
+
+    def compact(self, records: List[dict]):
+        """Replaces the log contents with live records. Records are written to a new segment which atomically appears
+        complete before older segments are deleted, so that the log stays readable if the process stops during
+        compaction.
+
+        Args:
+            records: Live records.
+        """
+        segments = self._get_segments()
+        old_segments = list(segments)
+        segments.clear()
+        self._index = {}
+        if len(records):
+            segment = (old_segments[-1][0] + 1 if len(old_segments) else 1, self._codec.extension)
+            data, locations = self._encode(records, segment[0], 0)
+            write_file_atomically(self._get_segment_path(*segment), data)
+            segments.append(segment)
+            self._update_index(self._index, list(map(self._get_index_line, records, locations)))
+        self._save_index()
+        for segment in old_segments:
+            os.remove(self._get_segment_path(*segment))
+        self._entryCount = len(records)
+
+    def migrate(self, on_truncate: Callable[[CorruptFrameError], None] = None) -> bool:
+        """Rewrites the log with the log codec if some of its segments were written with other codecs.
+
+        Args:
+            on_truncate: Function to call if the log is truncated at a corrupt entry while it is read, see iterate.
+
+        Returns:
+            True if the log was migrated.
+        """
+        if all(extension == self._codec.extension for number, extension in self._get_segments()):
+            return False
+        self.compact(self.read(on_truncate))
+        return True
+
+    def delete(self):
+        """Deletes all log segments, the index and temporary files left by interrupted writes."""
+        for segment_path in self.segment_paths:
+            os.remove(segment_path)
+        if os.path.isfile(self.index_path):
+            os.remove(self.index_path)
+        for temp_path in glob.glob(glob.escape(self._path) + '.*.tmp'):
+            os.remove(temp_path)
+        self._segments = []
+        self._entryCount = 0
+        self._index = {}
+        self._sortedIndex = None
+
+    def _encode(self, entries: List[dict], segment: int, offset: int) -> Tuple[bytes, List[Tuple[int, int, int]]]:
+        """Encodes entries with the log codec in frames of at most codec frame size entries.
+
+        Args:
+            entries: Entries to encode.
+            segment: Number of the segment the entries are written to.
+            offset: Byte offset the entries are written at.
+
+        Returns:
+            Tuple of encoded entries and locations of the entries, a location is a tuple of segment number, frame
+            offset and position of the entry in the frame.
+        """
+        frames = []
+        locations = []
+        for i in range(0, len(entries), self._codec.frame_size):
+            frame_entries = entries[i:i + self._codec.frame_size]
+            frames.append(self._codec.encode(frame_entries))
+            locations.extend((segment, offset, position) for position in range(len(frame_entries)))
+            offset += len(frames[-1])
+        return b''.join(frames), locations
+
+    def _iterate(self, start: Tuple[int, int] = (0, 0)) -> Iterator[Tuple[int, int, dict]]:
+        """Iterates over log entries written at or after a location.
+
+        Args:
+            start: Segment number and byte offset to start from.
+
+        Returns:
+            Iterator of segment number, byte offset of the entry in the segment and the entry.
+        """
+        for number, extension in list(self._get_segments()):
+            if number < start[0]:
+                continue
+            with open(self._get_segment_path(number, extension), 'rb') as f:
+                if number == start[0]:
+                    f.seek(start[1])
+                try:
+                    for offset, entry in self._get_codec(extension).decode(f):
+                        yield number, offset, entry
+                except CorruptFrameError as err:
+                    err.segment = number
+                    raise
+
+    def _truncate(self, segment: int, offset: int):
+        """Truncates the log to the entries written before a location, deleting the entries at and after it. The
+        index is truncated accordingly.
+
+        Args:
+            segment: Segment number.
+            offset: Byte offset in the segment.
+        """
+        index, end = self._load_index((segment, offset))
+        segments = self._get_segments()
+        for number, extension in list(segments):
+            if number > segment or (number == segment and offset == 0):
+                os.remove(self._get_segment_path(number, extension))
+                segments.remove((number, extension))
+            elif number == segment:
+                os.truncate(self._get_segment_path(number, extension), offset)
+        if end is not None:
+            self._catch_up_index(index, self._get_end() if tuple(end) > (segment, offset) else end)
+        else:
+            if os.path.isfile(self.index_path):
+                os.remove(self.index_path)
+            self._index = None
+            self._sortedIndex = None
+
+    def _get_end(self) -> Optional[List[int]]:
+        """Returns the end of the log.
+
+        Returns:
+            Number and size of the last segment or None if the log is empty.
+        """
+        segments = self._get_segments()
+        if not len(segments):
+            return None
+        return [segments[-1][0], os.path.getsize(self._get_segment_path(*segments[-1]))]
+
+    def _get_index_line(self, entry: dict, location: Tuple[int, int, int]) -> list:
+        """Returns the index line of a log entry.
+
+        Args:
+            entry: Log entry.
+            location: Location of the entry.
+
+        Returns:
+            List of segment number, frame offset, position in the frame, time, id and type of the entry and 1 if the
+            entry is a tombstone or 0 otherwise.
+        """
+        time, id = get_record_key(entry, self._timeField)
+        return [*location, time, id, entry.get('type'), 1 if entry.get('$deleted') else 0]
+
+    def _write_index(self, lines: Iterator[list]):
+        """Appends index lines of entries appended to the log as a single line of the index file together with the
+        end of the log, i.e. number and size of the last segment. The end lets the index be checked against the
+        segments when it is loaded.
+
+        Args:
+            lines: Index lines of entries appended to the log.
+        """
+        lines = list(lines)
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps([*self._get_end(), lines], separators=(',', ':')) + '\n')
+        if self._index is not None:
+            self._update_index(self._index, lines)
+            self._sortedIndex = None
+
+    def _save_index(self):
+        """Rewrites the index file with locations of live records, atomically replacing the previous index file. The
+        index file is deleted if the log is empty."""
+        self._sortedIndex = None
+        end = self._get_end()
+        if end is None:
+            if os.path.isfile(self.index_path):
+                os.remove(self.index_path)
+            return
+        lines = [[*location, time, id, record_type, 0] for (time, id, record_type), location in self._index.items()]
+        write_file_atomically(self.index_path, (json.dumps([*end, lines], separators=(',', ':')) + '\n')
+                              .encode('utf-8'))
+
+    def _update_index(self, index: Dict[tuple, tuple], lines: List[list]):
+        """Applies index lines to the index.
+
+        Args:
+            index: Locations of live records indexed by time, id and type.
+            lines: Index lines.
+        """
+        for segment, offset, position, time, id, record_type, deleted in lines:
+            if deleted:
+                index.pop((time, id, record_type), None)
+            else:
+                index[(time, id, record_type)] = (segment, offset, position)
+
+    def _get_index(self) -> Dict[tuple, tuple]:
+        """Returns locations of live records, loading the index file on first call. Entries written after the end of
+        the index file, e.g. because the process stopped before they were indexed, are indexed from the segments, and
+        the index is rebuilt if the index file is missing or does not match the segments.
+
+        Returns:
+            Locations of live records indexed by time, id and type.
+        """
+        if self._index is None:
+            index, end = self._load_index()
+            if end is None or end != self._get_end():
+                self._catch_up_index(index, end)
+            else:
+                self._index = index
+        return self._index
+
+    def _catch_up_index(self, index: Dict[tuple, tuple], end: Optional[List[int]]):
+        """Indexes entries written after the end of an index and saves the index.
+
+        Args:
+            index: Locations of live records up to the end.
+            end: Number and size of the last segment covered by the index or None to index the whole log.
+        """
+        lines = []
+        position = 0
+        previous = None
+        for segment, offset, entry in self._iterate(tuple(end) if end is not None else (0, 0)):
+            position = position + 1 if (segment, offset) == previous else 0
+            previous = (segment, offset)
+            lines.append(self._get_index_line(entry, (segment, offset, position)))
+        self._update_index(index, lines)
+        self._index = index
+        self._save_index()
+
+    def _load_index(self, until: Tuple[int, int] = None) -> Tuple[Dict[tuple, tuple], Optional[List[int]]]:
+        """Loads the index file up to its first corrupt line.
+
+        Args:
+            until: Segment number and byte offset to load locations of entries written before, by default loads all
+            locations.
+
+        Returns:
+            Tuple of locations of live records indexed by time, id and type and number and size of the last segment
+            covered by the index. The end is None if the index file is missing or does not match the segments.
+        """
+        index = {}
+        end = None
+        if os.path.isfile(self.index_path):
+            with open(self.index_path, 'rb') as f:
+                for line in f:
+                    try:
+                        number, size, lines = json.loads(line)
+                        if until is not None:
+                            lines = [entry_line for entry_line in lines if tuple(entry_line[:2]) < until]
+                        self._update_index(index, lines)
+                    except (ValueError, TypeError):
+                        break
+                    end = [number, size]
+        segments = dict(self._get_segments())
+        if end is None or end[0] not in segments or \
+                end[1] > os.path.getsize(self._get_segment_path(end[0], segments[end[0]])):
+            return {}, None
+        return index, end
+
+    def _get_sorted_index(self) -> Tuple[List[Tuple[float, str]], List[Tuple[int, int, int]],
+                                         Dict[str, List[Tuple[int, int, int]]]]:
+        """Returns sort keys and locations of live records sorted by time and id, and locations of live records
+        grouped by id.
+
+        Returns:
+            Tuple of record sort keys, record locations and record locations sorted by time indexed by id.
+        """
+        if self._sortedIndex is None:
+            items = sorted(self._get_index().items(), key=lambda item: item[0][:2])
+            locations_by_id = {}
+            for (time, id, record_type), location in items:
+                locations_by_id.setdefault(id, []).append(location)
+            self._sortedIndex = ([(time, id) for (time, id, record_type), location in items],
+                                 [location for key, location in items], locations_by_id)
+        return self._sortedIndex
+
+    def _read_records(self, locations: List[Tuple[int, int, int]]) -> List[dict]:
+        """Reads records at locations through memory-mapped segments, decoding each frame once.
+
+        Args:
+            locations: Record locations.
+
+        Returns:
+            Records in the order of locations.
+        """
+        records = []
+        segments = dict(self._get_segments())
+        files = {}
+        frames = {}
+        try:
+            for segment, offset, position in locations:
+                if segment not in files:
+                    with open(self._get_segment_path(segment, segments[segment]), 'rb') as f:
+                        files[segment] = mmap(f.fileno(), 0, access=ACCESS_READ)
+                frame = (segment, offset)
+                if frame not in frames:
+                    frames[frame] = self._get_codec(segments[segment]).decode_frame(files[segment], offset)
+                records.append(frames[frame][position])
+        finally:
+            for buffer in files.values():
+                buffer.close()
+        return records
+
+    def _get_segments(self) -> List[Tuple[int, str]]:
+        """Returns numbers and extensions of the log segments, listing segment files on first call.
+
+        Returns:
+            Segment numbers and extensions in ascending order of numbers.
+        """
+        if self._segments is None:
+            extensions = set(codec.extension for codec in CODECS.values())
+            segments = []
+            for path in glob.glob(glob.escape(self._path) + '.*.*'):
+                number, _, extension = path[len(self._path) + 1:].partition('.')
+                if number.isdigit() and extension in extensions:
+                    segments.append((int(number), extension))
+            self._segments = sorted(segments)
+        return self._segments
+
+    def _get_segment_path(self, number: int, extension: str) -> str:
+        """Returns path of a log segment.
+
+        Args:
+            number: Segment number.
+            extension: Segment file extension.
+
+        Returns:
+            Segment path.
+        """
+        return f'{self._path}.{number:06d}.{extension}'
+
+    def _get_codec(self, extension: str) -> HistoryCodec:
+        """Returns the codec to decode a segment with.
+
+        Args:
+            extension: Segment file extension.
+
+        Returns:
+            Codec which writes segments with the extension.
+        """
+        if extension not in self._codecs:
+            self._codecs[extension] = next(codec for codec in CODECS.values() if codec.extension == extension)()
+        return self._codecs[extension]
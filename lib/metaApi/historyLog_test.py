@@ -0,0 +1,209 @@
+from .historyLog import HistoryLog, make_tombstone
+from .historyCodec import JsonCodec, ZlibCodec, CorruptFrameError
+from mock import patch
+from .models import date
+import json
+import os
+import pytest
+log = None
+
+
+@pytest.fixture(autouse=True)
+async def run_around_tests(tmp_path):
+    global log
+    log = HistoryLog(str(tmp_path / 'accountId-application-deals'), 'time', segment_size=100)
+    yield
+
+
+class TestHistoryLog:
+    def test_replace_and_delete_records(self):
+        """Should replace records with the same id, type and time and delete records with tombstones."""
+        deal = {'id': '1', 'type': 'DEAL_TYPE_BUY', 'time': '2020-01-01T00:00:00.000Z'}
+        log.append([deal, {'id': '2', 'type': 'DEAL_TYPE_BUY', 'time': '2020-01-02T00:00:00.000Z'}])
+        log.append([{'id': '1', 'type': 'DEAL_TYPE_BUY', 'time': date('2020-01-01T00:00:00.000Z'), 'magic': 1},
+                    {'id': '1', 'type': 'DEAL_TYPE_SELL', 'time': '2020-01-01T00:00:00.000Z'}])
+        log.append([make_tombstone({'id': '2', 'type': 'DEAL_TYPE_BUY', 'time': date('2020-01-02T00:00:00.000Z')},
+                                   'time')])
+        assert HistoryLog(log._path, 'time').read() == [
+            {'id': '1', 'type': 'DEAL_TYPE_BUY', 'time': '2020-01-01T00:00:00.000Z', 'magic': 1},
+            {'id': '1', 'type': 'DEAL_TYPE_SELL', 'time': '2020-01-01T00:00:00.000Z'}
+        ]
+
+    def test_split_log_into_segments(self):
+        """Should start a new segment once the last one is full."""
+        deals = [{'id': str(i), 'type': 'DEAL_TYPE_BUY', 'time': '2020-01-01T00:00:00.000Z'} for i in range(6)]
+        for deal in deals:
+            log.append([deal])
+        assert len(log.segment_paths) == 3
+        other_log = HistoryLog(log._path, 'time')
+        assert other_log.read() == deals
+        assert other_log.entry_count == 6
+
+    def test_compact_log(self):
+        """Should replace segments with a segment of live records."""
+        deals = [{'id': str(i), 'type': 'DEAL_TYPE_BUY', 'time': '2020-01-01T00:00:00.000Z'} for i in range(6)]
+        for deal in deals:
+            log.append([deal])
+        old_segment_paths = log.segment_paths
+        log.compact(deals[3:])
+        assert len(log.segment_paths) == 1
+        assert log.segment_paths[0] not in old_segment_paths
+        assert not any(map(os.path.exists, old_segment_paths))
+        assert HistoryLog(log._path, 'time').read() == deals[3:]
+        log.delete()
+        assert log.read() == []
+
+    def test_iterate_entries_with_offsets(self):
+        """Should iterate over entries with their segment numbers and byte offsets."""
+        json_log = HistoryLog(log._path, 'time', segment_size=100, codec=JsonCodec())
+        deals = [{'id': str(i), 'type': 'DEAL_TYPE_BUY', 'time': '2020-01-01T00:00:00.000Z'} for i in range(3)]
+        json_log.append(deals[:2])
+        json_log.append([make_tombstone(deals[0], 'time')])
+        json_log.append(deals[2:])
+        other_log = HistoryLog(log._path, 'time', codec=JsonCodec())
+        entries = list(other_log.iterate())
+        assert [entry for segment, offset, entry in entries] == deals[:2] + [make_tombstone(deals[0], 'time')] + \
+            deals[2:]
+        assert [segment for segment, offset, entry in entries] == [1, 1, 2, 2]
+        assert entries[1][1] == len(json.dumps(deals[0], separators=(',', ':'))) + 1
+        assert other_log.entry_count == 4
+        with open(other_log.segment_paths[0], 'rb') as f:
+            f.seek(entries[1][1])
+            assert json.loads(f.readline()) == deals[1]
+
+    def test_migrate_segments_written_with_another_codec(self):
+        """Should read segments written with another codec and rewrite them with the log codec."""
+        deals = [{'id': str(i), 'type': 'DEAL_TYPE_BUY', 'time': '2020-01-01T00:00:00.000Z'} for i in range(3)]
+        json_log = HistoryLog(log._path, 'time', codec=JsonCodec())
+        json_log.append(deals[:2])
+        log.append(deals[2:])
+        assert [path[-4:] for path in log.segment_paths] == ['.log', 'zlog']
+        assert log.read() == deals
+        assert log.migrate()
+        assert len(log.segment_paths) == 1
+        assert log.segment_paths[0].endswith('.zlog')
+        assert not log.migrate()
+        assert HistoryLog(log._path, 'time').read() == deals
+
+    def test_query_records_using_index(self):
+        """Should query records by time range and id using the index without reading the whole log."""
+        deals = [{'id': str(i % 3), 'type': 'DEAL_TYPE_BUY', 'time': f'2020-01-0{i + 1}T00:00:00.000Z'}
+                 for i in range(6)]
+        log.append(deals[:3])
+        log.append(deals[3:])
+        log.append([dict(deals[1], magic=1), make_tombstone(deals[4], 'time')])
+        other_log = HistoryLog(log._path, 'time')
+        with patch.object(ZlibCodec, 'decode', side_effect=AssertionError):
+            assert other_log.get_records_by_time_range(date('2020-01-02T00:00:00.000Z').timestamp(),
+                                                       date('2020-01-06T00:00:00.000Z').timestamp()) == \
+                [dict(deals[1], magic=1), deals[2], deals[3]]
+            assert other_log.get_records_by_id('0') == [deals[0], deals[3]]
+            assert other_log.get_records_by_time_range() == [deals[0], dict(deals[1], magic=1), deals[2], deals[3],
+                                                             deals[5]]
+            assert other_log.get_last_time() == date('2020-01-06T00:00:00.000Z').timestamp()
+
+    def test_decode_only_frames_queried(self):
+        """Should decode only the frames which contain the records queried."""
+        deals = [{'id': str(i), 'type': 'DEAL_TYPE_BUY', 'time': f'2020-01-0{i + 1}T00:00:00.000Z'}
+                 for i in range(6)]
+        for i in range(0, 6, 2):
+            log.append(deals[i:i + 2])
+        decode_frame = ZlibCodec.decode_frame
+        with patch.object(ZlibCodec, 'decode_frame', side_effect=decode_frame, autospec=True) as mock:
+            assert HistoryLog(log._path, 'time').get_records_by_id('3') == [deals[3]]
+            assert mock.call_count == 1
+
+    def test_update_id_index_on_append(self):
+        """Should find records by id appended after the index was queried."""
+        deals = [{'id': '1', 'type': 'DEAL_TYPE_BUY', 'time': f'2020-01-0{i + 1}T00:00:00.000Z'} for i in range(3)]
+        log.append(deals[:1])
+        assert log.get_records_by_id('1') == deals[:1]
+        assert log.get_records_by_id('2') == []
+        log.append(deals[1:])
+        assert log.get_records_by_id('1') == deals
+        log.append([make_tombstone(deals[1], 'time')])
+        assert log.get_records_by_id('1') == [deals[0], deals[2]]
+
+    def test_rebuild_index(self):
+        """Should rebuild the index if it does not match the segments."""
+        deals = [{'id': str(i), 'type': 'DEAL_TYPE_BUY', 'time': f'2020-01-0{i + 1}T00:00:00.000Z'}
+                 for i in range(3)]
+        log.append(deals[:2])
+        os.remove(log.index_path)
+        log.append(deals[2:])
+        assert not os.path.exists(log.index_path)
+        assert HistoryLog(log._path, 'time').get_records_by_time_range() == deals
+        assert os.path.exists(log.index_path)
+        with open(log.segment_paths[-1], 'ab') as f:
+            f.write(ZlibCodec().encode([make_tombstone(deals[0], 'time')]))
+        assert HistoryLog(log._path, 'time').get_records_by_time_range() == deals[1:]
+        log.compact([])
+        assert not os.path.exists(log.index_path)
+        assert HistoryLog(log._path, 'time').get_records_by_time_range() == []
+
+    def test_truncate_log_at_corrupt_entry(self):
+        """Should truncate the log to the entries preceding a corrupt entry when recovering it."""
+        deals = [{'id': str(i), 'type': 'DEAL_TYPE_BUY', 'time': f'2020-01-0{i + 1}T00:00:00.000Z'}
+                 for i in range(6)]
+        for i in range(0, 6, 2):
+            log.append(deals[i:i + 2])
+        segment, offset, entry = list(log.iterate())[2]
+        segment_path = log.segment_paths[segment - 1]
+        with open(segment_path, 'r+b') as f:
+            f.seek(offset + 10)
+            f.write(b'\xff')
+        with pytest.raises(CorruptFrameError):
+            HistoryLog(log._path, 'time').read()
+        errors = []
+        other_log = HistoryLog(log._path, 'time')
+        assert other_log.read(errors.append) == deals[:2]
+        assert (errors[0].segment, errors[0].offset) == (segment, offset)
+        assert len(other_log.segment_paths) == (segment - 1 if offset == 0 else segment)
+        assert other_log.get_records_by_time_range() == deals[:2]
+        other_log.append(deals[4:])
+        assert HistoryLog(log._path, 'time').read() == deals[:2] + deals[4:]
+        assert HistoryLog(log._path, 'time').get_records_by_time_range() == deals[:2] + deals[4:]
+
+    def test_truncate_json_log_at_incomplete_line(self):
+        """Should truncate a JSON log at a line which was not written completely."""
+        json_log = HistoryLog(log._path, 'time', codec=JsonCodec())
+        deals = [{'id': str(i), 'type': 'DEAL_TYPE_BUY', 'time': f'2020-01-0{i + 1}T00:00:00.000Z'}
+                 for i in range(2)]
+        json_log.append(deals)
+        size = os.path.getsize(json_log.segment_paths[0])
+        with open(json_log.segment_paths[0], 'ab') as f:
+            f.write(b'{"id":"2","type":"DEAL_TYPE_BUY"}')
+        errors = []
+        assert HistoryLog(log._path, 'time', codec=JsonCodec()).read(errors.append) == deals
+        assert errors[0].offset == size
+        assert os.path.getsize(json_log.segment_paths[0]) == size
+
+    def test_catch_up_index(self):
+        """Should index only the entries written after the end of the index file."""
+        deals = [{'id': str(i), 'type': 'DEAL_TYPE_BUY', 'time': f'2020-01-0{i + 1}T00:00:00.000Z'}
+                 for i in range(3)]
+        log.append(deals[:2])
+        with open(log.segment_paths[-1], 'ab') as f:
+            f.write(ZlibCodec().encode(deals[2:]))
+        with open(log.index_path, 'a') as f:
+            f.write('[1,')
+        decode_body = ZlibCodec._decode_body
+        with patch.object(ZlibCodec, '_decode_body', side_effect=decode_body, autospec=True) as mock:
+            assert HistoryLog(log._path, 'time').get_last_time() == date('2020-01-03T00:00:00.000Z').timestamp()
+            assert mock.call_count == 1
+        with open(log.index_path) as f:
+            assert len(f.readlines()) == 1
+        assert HistoryLog(log._path, 'time').get_records_by_time_range() == deals
+
+    def test_compact_log_atomically(self, tmp_path):
+        """Should keep the log contents if the process stops while the log is compacted."""
+        deals = [{'id': str(i), 'type': 'DEAL_TYPE_BUY', 'time': '2020-01-01T00:00:00.000Z'} for i in range(2)]
+        log.append(deals)
+        with patch('lib.metaApi.historyLog.os.replace', side_effect=OSError('No space left on device')):
+            with pytest.raises(OSError):
+                HistoryLog(log._path, 'time').compact(deals[1:])
+        other_log = HistoryLog(log._path, 'time')
+        assert other_log.read() == deals
+        assert other_log.get_records_by_time_range() == deals
+        other_log.delete()
+        assert os.listdir(tmp_path) == []
@@ -1,7 +1,28 @@
 from ..clients.metaApi.synchronizationListener import SynchronizationListener
-from .models import MetatraderOrder, MetatraderDeal
+from .models import MetatraderOrder, MetatraderDeal, date
 from datetime import datetime
 from abc import abstractmethod, ABC
+from typing import Tuple
+
+
+def get_record_key(record: dict, time_field: str) -> Tuple[float, str]:
+    """Returns the key history records are sorted by.
+
+    Args:
+        record: History record.
+        time_field: Name of the record time field.
+
+    Returns:
+        Tuple of record timestamp and record id.
+    """
+    time = record.get(time_field)
+    if time is None:
+        timestamp = 0
+    elif isinstance(time, datetime):
+        timestamp = time.timestamp()
+    else:
+        timestamp = date(time).timestamp()
+    return timestamp, record.get('id', '')
 
 
 class HistoryStorage(SynchronizationListener, ABC):
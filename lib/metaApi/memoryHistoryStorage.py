@@ -1,36 +1,91 @@
 from .models import MetatraderDeal, MetatraderOrder
-from typing import List
+from typing import List, Dict, Tuple, Iterator, AsyncIterator, Callable, Optional
 from .memoryHistoryStorageModel import MemoryHistoryStorageModel
 from .historyFileManager import HistoryFileManager
+from .historyCodec import DEFAULT_CODEC
+from .historyDirectory import HistoryDirectory
+from .sqliteHistoryStorage import SqliteHistoryStorage
+from .dealColumns import DealColumns
+from ..clients.errorHandler import ValidationException
 from datetime import datetime
+from .historyStorage import get_record_key
 from .models import date
+from bisect import bisect_left, bisect_right
+import asyncio
+import heapq
 import pytz
 
+EVICTION_BATCH_SIZE = 1000
+"""Number of records which have to fall out of the retention window before they are evicted on record addition."""
+
 
 class MemoryHistoryStorage(MemoryHistoryStorageModel):
     """History storage which stores MetaTrader history in RAM."""
 
-    def __init__(self, account_id: str, application: str = 'MetaApi'):
-        """Inits the in-memory history store instance"""
+    def __init__(self, account_id: str, application: str = 'MetaApi', retention_days: float = None,
+                 deal_columns: bool = False, file_codec: str = DEFAULT_CODEC,
+                 history_directory: HistoryDirectory = None):
+        """Inits the in-memory history store instance
+
+        Args:
+            account_id: MetaTrader account id.
+            application: Application id.
+            retention_days: Optional number of days to keep history records in memory for. Older records are moved
+            to an archive database on disk and are read back from it by time range queries. By default all records
+            are kept in memory.
+            deal_columns: Whether to keep a columnar copy of deals for vectorized analytics, see deal_columns
+            property.
+            file_codec: Codec to save history files with, one of json, zlib or msgpack. Default is zlib. The msgpack
+            codec requires msgpack package to be installed. History files saved with other codecs are migrated when
+            history is loaded.
+            history_directory: Directory to store history files in, by default files are stored in .metaapi
+            directory.
+        """
         super().__init__()
         self._accountId = account_id
-        self._fileManager = HistoryFileManager(account_id, application, self)
+        self._retentionDays = retention_days
+        self._dealColumns = DealColumns() if deal_columns else None
+        self._archive = None
+        if retention_days is not None:
+            if retention_days <= 0:
+                raise ValidationException('History retention window must be a positive number of days')
+            history_directory = history_directory or HistoryDirectory()
+            history_directory.make_account_directory(account_id)
+            self._archive = SqliteHistoryStorage(account_id, application, history_directory.get_file_path(
+                account_id, f'{account_id}-{application}-archive.db'))
+        self._fileManager = HistoryFileManager(account_id, application, self, file_codec, history_directory)
         self._deals = []
+        self._dealKeys = []
+        self._dealsByIdentity = {}
         self._historyOrders = []
+        self._historyOrderKeys = []
+        self._historyOrdersByIdentity = {}
         self._fileManager.start_update_job()
 
     @property
     def deals(self) -> List[MetatraderDeal]:
-        """Returns all deals stored in history storage.
+        """Returns all deals stored in history storage. If the retention window is set, returns only deals kept in
+        memory, use get_deals_by_time_range to access older deals.
 
         Returns:
             All deals stored in history storage.
         """
         return self._deals
 
+    @property
+    def deal_columns(self) -> Optional[DealColumns]:
+        """Returns columnar copy of deals kept in memory which is updated incrementally as deals are added. Use
+        deal_columns.to_arrays() to get the deals as NumPy arrays.
+
+        Returns:
+            Columnar copy of deals or None if the storage was created without deal_columns option.
+        """
+        return self._dealColumns
+
     @property
     def history_orders(self) -> List[MetatraderOrder]:
-        """Returns all history orders stored in history storage.
+        """Returns all history orders stored in history storage. If the retention window is set, returns only
+        history orders kept in memory, use get_history_orders_by_time_range to access older orders.
 
         Returns:
             All history orders stored in history storage.
@@ -38,39 +93,91 @@ class MemoryHistoryStorage(MemoryHistoryStorageModel):
         return self._historyOrders
 
     def reset(self):
-        """Resets the storage. Intended for use in tests."""
+        """Resets the storage. History changes which are not saved yet are discarded immediately and history files
+        are deleted from disk in the background."""
 
         self._deals = []
+        self._dealKeys = []
+        self._dealsByIdentity = {}
         self._historyOrders = []
-        self._fileManager.delete_storage_from_disk()
+        self._historyOrderKeys = []
+        self._historyOrdersByIdentity = {}
+        if self._archive is not None:
+            self._archive.reset()
+        if self._dealColumns is not None:
+            self._dealColumns.clear()
+        self._fileManager.cancel_pending_changes()
+        asyncio.ensure_future(self._fileManager.delete_storage_from_disk())
 
     async def load_data_from_disk(self):
-        """Loads history data from the file manager.
+        """Loads history data from the file manager. Records are indexed as log entries are parsed, so that the
+        history is loaded without building an intermediate copy of it.
 
         Returns:
             A coroutine which resolves when the history is loaded.
         """
-        history = await self._fileManager.get_history_from_disk()
-        self._deals = history['deals']
-        self._historyOrders = history['historyOrders']
+        self._deals, self._dealKeys, self._dealsByIdentity = \
+            await self._load_records(self._fileManager.iterate_history_from_disk('deals'), 'time')
+        self._historyOrders, self._historyOrderKeys, self._historyOrdersByIdentity = \
+            await self._load_records(self._fileManager.iterate_history_from_disk('historyOrders'), 'doneTime')
+        if self._dealColumns is not None:
+            self._dealColumns.clear()
+            self._dealColumns.extend(self._deals)
+        await self._evict_expired_records(1)
 
     async def update_disk_storage(self):
-        """Saves unsaved history items to disk storage.
+        """Saves unsaved history items to disk storage. Evicts records which fell out of the retention window.
 
         Returns:
             A coroutine which resolves when the history is saved.
         """
+        await self._evict_expired_records(1)
+        if self._archive is not None:
+            await self._archive.update_disk_storage()
         await self._fileManager.update_disk_storage()
 
+    def get_deals_by_time_range(self, start_time: datetime = None, end_time: datetime = None) \
+            -> Iterator[MetatraderDeal]:
+        """Iterates over deals in a time range sorted by time and id, including deals evicted from memory to the
+        archive on disk.
+
+        Args:
+            start_time: Time to start iterating from, inclusive. By default iterates from the first deal.
+            end_time: Time to stop iterating at, exclusive. By default iterates up to the last deal.
+
+        Returns:
+            Iterator of deals found.
+        """
+        get_archived_deals = self._archive.get_deals_by_time_range if self._archive is not None else None
+        return self._get_records_by_time_range(self._deals, self._dealKeys, 'time', start_time, end_time,
+                                               get_archived_deals)
+
+    def get_history_orders_by_time_range(self, start_time: datetime = None, end_time: datetime = None) \
+            -> Iterator[MetatraderOrder]:
+        """Iterates over history orders in a done time range sorted by done time and id, including orders evicted
+        from memory to the archive on disk.
+
+        Args:
+            start_time: Time to start iterating from, inclusive. By default iterates from the first order.
+            end_time: Time to stop iterating at, exclusive. By default iterates up to the last order.
+
+        Returns:
+            Iterator of history orders found.
+        """
+        get_archived_orders = self._archive.get_history_orders_by_time_range if self._archive is not None else None
+        return self._get_records_by_time_range(self._historyOrders, self._historyOrderKeys, 'doneTime', start_time,
+                                               end_time, get_archived_orders)
+
     async def last_history_order_time(self) -> datetime:
         """Returns the time of the last history order record stored in the history storage.
 
         Returns:
             The time of the last history order record stored in the history storage
         """
-        filtered_orders = list(filter(lambda order: 'doneTime' in order, self._historyOrders))
-        return max(order['doneTime'] if isinstance(order['doneTime'], datetime) else date(order['doneTime']) for order
-                   in (filtered_orders + [{'doneTime': datetime.fromtimestamp(0).replace(tzinfo=pytz.UTC)}]))
+        if self._archive is not None:
+            return max(self._get_last_record_time(self._historyOrders, 'doneTime'),
+                       await self._archive.last_history_order_time())
+        return self._get_last_record_time(self._historyOrders, 'doneTime')
 
     async def last_deal_time(self) -> datetime:
         """Returns the time of the last history deal record stored in the history storage.
@@ -78,9 +185,9 @@ class MemoryHistoryStorage(MemoryHistoryStorageModel):
         Returns:
             The time of the last history deal record stored in the history storage.
         """
-        filtered_deals = list(filter(lambda order: 'time' in order, self._deals))
-        return max(deal['time'] if isinstance(deal['time'], datetime) else date(deal['time']) for deal in
-                   (filtered_deals + [{'time': datetime.fromtimestamp(0).replace(tzinfo=pytz.UTC)}]))
+        if self._archive is not None:
+            return max(self._get_last_record_time(self._deals, 'time'), await self._archive.last_deal_time())
+        return self._get_last_record_time(self._deals, 'time')
 
     async def on_history_order_added(self, history_order: MetatraderOrder):
         """Invoked when a new MetaTrader history order is added.
@@ -88,36 +195,10 @@ class MemoryHistoryStorage(MemoryHistoryStorageModel):
         Args:
             history_order: New MetaTrader history order.
         """
-        insert_index = 0
-        replacement_index = -1
-
-        def get_done_time(order):
-            if 'doneTime' in order:
-                return order['doneTime'].timestamp() if (isinstance(order['doneTime'], datetime)) \
-                    else date(order['doneTime']).timestamp()
-            else:
-                return 0
-
-        history_order_time = get_done_time(history_order)
-
-        for i in range(len(self._historyOrders)):
-            index = len(self._historyOrders) - 1 - i
-            order = self._historyOrders[index]
-            order_time = get_done_time(order)
-            if (order_time < history_order_time) or \
-               (order_time == history_order_time and order['id'] <= history_order['id']):
-                if (order_time == history_order_time and order['id'] == history_order['id'] and
-                   order['type'] == history_order['type']):
-                    replacement_index = index
-                else:
-                    insert_index = index + 1
-                break
-        if replacement_index != -1:
-            self._historyOrders[replacement_index] = history_order
-            self._fileManager.set_start_new_order_index(replacement_index)
-        else:
-            self._historyOrders.insert(insert_index, history_order)
-            self._fileManager.set_start_new_order_index(insert_index)
+        self._add_record(self._historyOrders, self._historyOrderKeys, self._historyOrdersByIdentity, history_order,
+                         'doneTime')
+        self._fileManager.add_history_orders([history_order])
+        await self._evict_expired_records(EVICTION_BATCH_SIZE)
 
     async def on_deal_added(self, new_deal: MetatraderDeal):
         """Invoked when a new MetaTrader history deal is added.
@@ -125,32 +206,264 @@ class MemoryHistoryStorage(MemoryHistoryStorageModel):
         Args:
             new_deal: New MetaTrader history deal.
         """
-        insert_index = 0
-        replacement_index = -1
-
-        def get_time(deal):
-            if 'time' in deal:
-                return deal['time'].timestamp() if (isinstance(deal['time'], datetime)) \
-                    else date(deal['time']).timestamp()
+        count = len(self._deals)
+        index = self._add_record(self._deals, self._dealKeys, self._dealsByIdentity, new_deal, 'time')
+        self._fileManager.add_deals([new_deal])
+        if self._dealColumns is not None:
+            if len(self._deals) > count:
+                self._dealColumns.insert(index, new_deal)
             else:
-                return 0
-
-        new_deal_time = get_time(new_deal)
-        for i in range(len(self._deals)):
-            index = len(self._deals) - 1 - i
-            deal = self._deals[index]
-            deal_time = get_time(deal)
-            if (deal_time < new_deal_time) or \
-                    (deal_time == new_deal_time and deal['id'] <= new_deal['id']):
-                if (deal_time == new_deal_time and deal['id'] == new_deal['id'] and
-                        deal['type'] == new_deal['type']):
-                    replacement_index = index
-                else:
-                    insert_index = index + 1
-                break
-        if replacement_index != -1:
-            self._deals[replacement_index] = new_deal
-            self._fileManager.set_start_new_deal_index(replacement_index)
+                self._dealColumns.replace(index, new_deal)
+        await self._evict_expired_records(EVICTION_BATCH_SIZE)
+
+    async def on_history_orders_added(self, history_orders: List[MetatraderOrder]):
+        """Invoked when a batch of new MetaTrader history orders is added. Merges the batch into the storage in one
+        pass.
+
+        Args:
+            history_orders: New MetaTrader history orders.
+        """
+        self._historyOrders, self._historyOrderKeys, _ = \
+            self._add_records(self._historyOrders, self._historyOrderKeys, self._historyOrdersByIdentity,
+                              history_orders, 'doneTime')
+        self._fileManager.add_history_orders(history_orders)
+        await self._evict_expired_records(EVICTION_BATCH_SIZE)
+
+    async def on_deals_added(self, deals: List[MetatraderDeal]):
+        """Invoked when a batch of new MetaTrader history deals is added. Merges the batch into the storage in one
+        pass.
+
+        Args:
+            deals: New MetaTrader history deals.
+        """
+        self._deals, self._dealKeys, index = self._add_records(self._deals, self._dealKeys, self._dealsByIdentity,
+                                                               deals, 'time')
+        self._fileManager.add_deals(deals)
+        if index is not None and self._dealColumns is not None:
+            self._dealColumns.truncate(index)
+            self._dealColumns.extend(self._deals[index:])
+        await self._evict_expired_records(EVICTION_BATCH_SIZE)
+
+    def _add_record(self, records: List[dict], keys: List[Tuple[float, str]], records_by_identity: Dict[Tuple, dict],
+                    record: dict, time_field: str) -> int:
+        """Inserts a record into a list sorted by time and id or replaces a record with the same time, id and type.
+
+        Args:
+            records: Records sorted by time and id.
+            keys: Sort keys of the records.
+            records_by_identity: Records indexed by sort key and type.
+            record: Record to add.
+            time_field: Name of the record time field.
+
+        Returns:
+            Index of the record inserted or replaced.
+        """
+        key = get_record_key(record, time_field)
+        identity = (key, record.get('type'))
+        existing = records_by_identity.get(identity)
+        if existing is not None:
+            index = self._find_record(records, keys, existing, key)
+            records[index] = record
         else:
-            self._deals.insert(insert_index, new_deal)
-            self._fileManager.set_start_new_deal_index(insert_index)
+            index = bisect_right(keys, key)
+            keys.insert(index, key)
+            records.insert(index, record)
+        records_by_identity[identity] = record
+        return index
+
+    def _find_record(self, records: List[dict], keys: List[Tuple[float, str]], record: dict,
+                     key: Tuple[float, str]) -> int:
+        """Finds the index of a stored record among the records with the same sort key.
+
+        Args:
+            records: Records sorted by time and id.
+            keys: Sort keys of the records.
+            record: Stored record to find.
+            key: Sort key of the record.
+
+        Returns:
+            Index of the record.
+
+        Raises:
+            ValueError: If the record is not stored under the key.
+        """
+        for index in range(bisect_left(keys, key), bisect_right(keys, key)):
+            if records[index] is record:
+                return index
+        raise ValueError(f'History record {record.get("id")} is not found in the storage by its time and id')
+
+    def _add_records(self, records: List[dict], keys: List[Tuple[float, str]], records_by_identity: Dict[Tuple, dict],
+                     new_records: List[dict], time_field: str) -> Tuple[List[dict], List[Tuple[float, str]], int]:
+        """Merges a batch of records into a list sorted by time and id. The result is the same as adding the records
+        one by one, but takes a single pass over the stored records. Batches sorted by time are merged fastest.
+
+        Args:
+            records: Records sorted by time and id.
+            keys: Sort keys of the records.
+            records_by_identity: Records indexed by sort key and type.
+            new_records: Records to add.
+            time_field: Name of the record time field.
+
+        Returns:
+            Tuple of merged records, their sort keys and the lowest index changed or None if nothing was changed.
+        """
+        start_index = None
+        batch = []
+        batch_index_by_identity = {}
+        for record in new_records:
+            key = get_record_key(record, time_field)
+            identity = (key, record.get('type'))
+            batch_index = batch_index_by_identity.get(identity)
+            if batch_index is not None:
+                batch[batch_index] = (key, record)
+                continue
+            existing = records_by_identity.get(identity)
+            if existing is not None:
+                index = self._find_record(records, keys, existing, key)
+                records[index] = record
+                records_by_identity[identity] = record
+                start_index = index if start_index is None else min(start_index, index)
+                continue
+            batch_index_by_identity[identity] = len(batch)
+            batch.append((key, record))
+        if not batch:
+            return records, keys, start_index
+        batch.sort(key=lambda item: item[0])
+        index = bisect_right(keys, batch[0][0])
+        start_index = index if start_index is None else min(start_index, index)
+        for key, record in batch:
+            records_by_identity[(key, record.get('type'))] = record
+        if index == len(keys):
+            keys.extend(key for key, record in batch)
+            records.extend(record for key, record in batch)
+            return records, keys, start_index
+        merged_records = records[:index]
+        merged_keys = keys[:index]
+        for key, record in batch:
+            while index < len(keys) and keys[index] <= key:
+                merged_records.append(records[index])
+                merged_keys.append(keys[index])
+                index += 1
+            merged_records.append(record)
+            merged_keys.append(key)
+        merged_records.extend(records[index:])
+        merged_keys.extend(keys[index:])
+        return merged_records, merged_keys, start_index
+
+    async def _evict_expired_records(self, min_count: int):
+        """Moves records older than the retention window from memory to the archive on disk.
+
+        Args:
+            min_count: Minimum number of expired deals or history orders to evict them.
+        """
+        if self._archive is None:
+            return
+        cutoff = datetime.now().timestamp() - self._retentionDays * 86400
+        deals = self._take_expired_records(self._deals, self._dealKeys, self._dealsByIdentity, 'time', cutoff,
+                                           min_count)
+        if len(deals):
+            if self._dealColumns is not None:
+                self._dealColumns.remove_first(len(deals))
+            await self._archive.on_deals_added(deals)
+            await self._archive.update_disk_storage()
+            self._fileManager.remove_deals(deals)
+        history_orders = self._take_expired_records(self._historyOrders, self._historyOrderKeys,
+                                                    self._historyOrdersByIdentity, 'doneTime', cutoff, min_count)
+        if len(history_orders):
+            await self._archive.on_history_orders_added(history_orders)
+            await self._archive.update_disk_storage()
+            self._fileManager.remove_history_orders(history_orders)
+
+    def _take_expired_records(self, records: List[dict], keys: List[Tuple[float, str]],
+                              records_by_identity: Dict[Tuple, dict], time_field: str, cutoff: float,
+                              min_count: int) -> List[dict]:
+        """Removes records older than a cutoff time from the beginning of a sorted record list.
+
+        Args:
+            records: Records sorted by time and id.
+            keys: Sort keys of the records.
+            records_by_identity: Records indexed by sort key and type.
+            time_field: Name of the record time field.
+            cutoff: Cutoff time as a POSIX timestamp in seconds.
+            min_count: Minimum number of expired records to remove them.
+
+        Returns:
+            Records removed.
+        """
+        count = bisect_left(keys, (cutoff, ''))
+        if count == 0 or count < min_count:
+            return []
+        expired = records[:count]
+        for key, record in zip(keys[:count], expired):
+            records_by_identity.pop((key, record.get('type')), None)
+        del records[:count]
+        del keys[:count]
+        return expired
+
+    def _get_records_by_time_range(self, records: List[dict], keys: List[Tuple[float, str]], time_field: str,
+                                   start_time: datetime = None, end_time: datetime = None,
+                                   get_archived_records: Callable[[datetime, datetime], Iterator[dict]] = None) \
+            -> Iterator[dict]:
+        """Iterates over records in a time range, merging records kept in memory with archived records.
+
+        Args:
+            records: Records sorted by time and id.
+            keys: Sort keys of the records.
+            time_field: Name of the record time field.
+            start_time: Time to start iterating from, inclusive.
+            end_time: Time to stop iterating at, exclusive.
+            get_archived_records: Function returning archived records in a time range.
+
+        Returns:
+            Iterator of records found.
+        """
+        start = bisect_left(keys, (start_time.timestamp(), '')) if start_time is not None else 0
+        end = bisect_left(keys, (end_time.timestamp(), '')) if end_time is not None else len(keys)
+        resident_records = records[start:end]
+        if not get_archived_records:
+            return iter(resident_records)
+        return heapq.merge(get_archived_records(start_time, end_time), resident_records,
+                           key=lambda record: get_record_key(record, time_field))
+
+    def _get_last_record_time(self, records: List[dict], time_field: str) -> datetime:
+        """Returns the time of the last record. Records are sorted by time and records without time are sorted
+        first, so the last record has the latest time.
+
+        Args:
+            records: Records sorted by time and id.
+            time_field: Name of the record time field.
+
+        Returns:
+            The time of the last record or the start of epoch if there are no records with time.
+        """
+        time = records[-1].get(time_field) if records else None
+        if time is None:
+            return datetime.fromtimestamp(0, pytz.UTC)
+        return time if isinstance(time, datetime) else date(time)
+
+    async def _load_records(self, batches: AsyncIterator[List[dict]], time_field: str) -> \
+            Tuple[List[dict], List[Tuple[float, str]], Dict[Tuple, dict]]:
+        """Loads records from history log entry batches. A record replaces earlier records with the same id, type
+        and time and a tombstone deletes them. Sort key of each entry is computed once and is used both to match
+        entries and to sort the records.
+
+        Args:
+            batches: Async iterator of log entry batches.
+            time_field: Name of the record time field.
+
+        Returns:
+            Tuple of sorted records, their sort keys and records indexed by sort key and type.
+        """
+        items = {}
+        async for entries in batches:
+            for entry in entries:
+                key = get_record_key(entry, time_field)
+                identity = (key, entry.get('type'))
+                if entry.get('$deleted'):
+                    items.pop(identity, None)
+                else:
+                    items[identity] = (key, entry)
+        items = sorted(items.values(), key=lambda item: item[0])
+        records = [record for key, record in items]
+        keys = [key for key, record in items]
+        return records, keys, {(key, record.get('type')): record for key, record in items}
@@ -1,8 +1,12 @@
 from .memoryHistoryStorage import MemoryHistoryStorage
 from .models import date
+from ..clients.errorHandler import ValidationException
 from mock import AsyncMock, MagicMock, patch
-from datetime import datetime
+from datetime import datetime, timedelta
 import pytest
+import asyncio
+import threading
+import pytz
 storage = None
 
 
@@ -15,6 +19,13 @@ async def run_around_tests(mocker):
         yield
 
 
+def mock_history_from_disk(history):
+    """Mocks history log entries read by the file manager."""
+    async def iterate_history_from_disk(history_type):
+        yield history[history_type]
+    storage._fileManager.iterate_history_from_disk = iterate_history_from_disk
+
+
 class TestMemoryHistoryStorage:
     @pytest.mark.asyncio
     async def test_load_data_from_file_manager(self):
@@ -27,8 +38,7 @@ class TestMemoryHistoryStorage:
                           datetime.fromtimestamp(100).isoformat(), 'currentPrice': 1, 'volume': 0.01,
                       'currentVolume': 0,
                       'positionId': '61206630', 'platform': 'mt5', 'comment': 'AS_AUDNZD_5YyM6KS7Fv:'}
-        storage._fileManager.get_history_from_disk = AsyncMock(return_value={'deals': [test_deal],
-                                                                             'historyOrders': [test_order]})
+        mock_history_from_disk({'deals': [test_deal], 'historyOrders': [test_order]})
         await storage.load_data_from_disk()
         assert storage.deals == [test_deal]
         assert storage.history_orders == [test_order]
@@ -59,6 +69,26 @@ class TestMemoryHistoryStorage:
         await storage.on_deal_added({'id': '3', 'time': date('2020-01-02T00:00:00.000Z')})
         assert await storage.last_deal_time() == date('2020-01-02T00:00:00.000Z',)
 
+    @pytest.mark.asyncio
+    async def test_return_start_of_epoch_if_no_history(self):
+        """Should return start of epoch as last history time if there is no history with time."""
+
+        assert await storage.last_deal_time() == date('1970-01-01T00:00:00.000Z')
+        assert await storage.last_history_order_time() == date('1970-01-01T00:00:00.000Z')
+        await storage.on_deal_added({'id': '1'})
+        assert await storage.last_deal_time() == date('1970-01-01T00:00:00.000Z')
+
+    @pytest.mark.asyncio
+    async def test_return_last_time_of_loaded_history(self):
+        """Should return last history time of history loaded from disk."""
+
+        mock_history_from_disk({
+            'deals': [{'id': '2', 'time': '2020-01-02T00:00:00.000Z'}, {'id': '1', 'time': '2020-01-01T00:00:00.000Z'}],
+            'historyOrders': [{'id': '1', 'doneTime': '2020-01-03T00:00:00.000Z'}]})
+        await storage.load_data_from_disk()
+        assert await storage.last_deal_time() == date('2020-01-02T00:00:00.000Z')
+        assert await storage.last_history_order_time() == date('2020-01-03T00:00:00.000Z')
+
     @pytest.mark.asyncio
     async def test_return_saved_deals(self):
         """Should return saved deals."""
@@ -127,6 +157,188 @@ class TestMemoryHistoryStorage:
             {'id': '6', 'doneTime': date('2020-10-01T00:00:00.000Z'), 'type': 'ORDER_TYPE_BUY'}
                                           ]
 
+    @pytest.mark.asyncio
+    async def test_replace_saved_deals(self):
+        """Should replace deals with the same time, id and type."""
+
+        storage._fileManager.add_deals = MagicMock()
+        await storage.on_deal_added({'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'})
+        await storage.on_deal_added({'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'})
+        await storage.on_deal_added({'id': '1', 'time': '2020-01-01T00:00:00.000Z', 'type': 'DEAL_TYPE_SELL',
+                                     'magic': 1})
+        await storage.on_deal_added({'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_BUY'})
+        assert storage.deals == [
+            {'id': '1', 'time': '2020-01-01T00:00:00.000Z', 'type': 'DEAL_TYPE_SELL', 'magic': 1},
+            {'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_BUY'},
+            {'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'}
+        ]
+        assert storage._fileManager.add_deals.call_args_list[2][0][0] == [storage.deals[0]]
+        assert storage._fileManager.add_deals.call_args_list[3][0][0] == [storage.deals[1]]
+
+    @pytest.mark.asyncio
+    async def test_replace_records_with_same_id_at_different_times(self):
+        """Should replace each of the records with the same id and type stored at different times."""
+        storage._fileManager.add_deals = MagicMock()
+        await storage.on_deal_added({'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'})
+        await storage.on_deal_added({'id': '1', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'})
+        await storage.on_deal_added({'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL',
+                                     'magic': 1})
+        await storage.on_deals_added([{'id': '1', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL',
+                                       'magic': 2}])
+        assert list(map(lambda deal: deal.get('magic'), storage.deals)) == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_fail_to_replace_missing_record(self):
+        """Should fail explicitly without updating the index if a replaced record is not found."""
+        storage._fileManager.add_deals = MagicMock()
+        await storage.on_deal_added({'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'})
+        identity = next(iter(storage._dealsByIdentity))
+        missing = {'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'}
+        storage._dealsByIdentity[identity] = missing
+        with pytest.raises(ValueError):
+            await storage.on_deal_added({'id': '1', 'time': date('2020-01-01T00:00:00.000Z'),
+                                         'type': 'DEAL_TYPE_SELL', 'magic': 1})
+        with pytest.raises(ValueError):
+            await storage.on_deals_added([{'id': '1', 'time': date('2020-01-01T00:00:00.000Z'),
+                                           'type': 'DEAL_TYPE_SELL', 'magic': 1}])
+        assert storage._dealsByIdentity[identity] is missing
+        assert len(storage.deals) == 1 and 'magic' not in storage.deals[0]
+
+    @pytest.mark.asyncio
+    async def test_sort_history_loaded_from_disk(self):
+        """Should sort history loaded from disk and use it for replacements."""
+        deals = [{'id': '2', 'time': '2020-01-02T00:00:00.000Z', 'type': 'DEAL_TYPE_SELL'},
+                 {'id': '1', 'time': '2020-01-01T00:00:00.000Z', 'type': 'DEAL_TYPE_SELL'}]
+        mock_history_from_disk({'deals': deals, 'historyOrders': []})
+        await storage.load_data_from_disk()
+        assert list(map(lambda deal: deal['id'], storage.deals)) == ['1', '2']
+        await storage.on_deal_added({'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL',
+                                     'magic': 1})
+        assert len(storage.deals) == 2
+        assert storage.deals[1]['magic'] == 1
+
+    @pytest.mark.asyncio
+    async def test_apply_replacements_and_tombstones_loaded_from_disk(self):
+        """Should replace and delete records as log entries are loaded from disk."""
+        deals = [{'id': '1', 'time': '2020-01-01T00:00:00.000Z', 'type': 'DEAL_TYPE_SELL'},
+                 {'id': '2', 'time': '2020-01-02T00:00:00.000Z', 'type': 'DEAL_TYPE_SELL'},
+                 {'id': '1', 'time': '2020-01-01T00:00:00.000Z', 'type': 'DEAL_TYPE_SELL', 'magic': 1},
+                 {'$deleted': True, 'id': '2', 'time': '2020-01-02T00:00:00.000Z', 'type': 'DEAL_TYPE_SELL'},
+                 {'id': '1', 'time': '2020-01-01T00:00:00.000Z', 'type': 'DEAL_TYPE_BUY'}]
+        mock_history_from_disk({'deals': deals, 'historyOrders': []})
+        await storage.load_data_from_disk()
+        assert storage.deals == [deals[2], deals[4]]
+        assert storage._dealKeys == [(date('2020-01-01T00:00:00.000Z').timestamp(), '1')] * 2
+
+    @pytest.mark.asyncio
+    async def test_add_deals_in_bulk(self):
+        """Should merge a batch of deals and schedule the batch to be saved once."""
+        storage._fileManager.add_deals = MagicMock()
+        await storage.on_deal_added({'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'})
+        await storage.on_deal_added({'id': '4', 'time': date('2020-01-04T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'})
+        storage._fileManager.add_deals.reset_mock()
+        deals = [
+            {'id': '5', 'time': date('2020-01-05T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'},
+            {'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'},
+            {'id': '4', 'time': date('2020-01-04T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL', 'magic': 1},
+            {'id': '3', 'time': date('2020-01-03T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'},
+            {'id': '3', 'time': date('2020-01-03T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL', 'magic': 2}
+        ]
+        await storage.on_deals_added(deals)
+        assert list(map(lambda deal: deal['id'], storage.deals)) == ['1', '2', '3', '4', '5']
+        assert storage.deals[2]['magic'] == 2
+        assert storage.deals[3]['magic'] == 1
+        storage._fileManager.add_deals.assert_called_once_with(deals)
+        await storage.on_deal_added({'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL',
+                                     'magic': 3})
+        assert len(storage.deals) == 5
+        assert storage.deals[1]['magic'] == 3
+
+    @pytest.mark.asyncio
+    async def test_add_history_orders_in_bulk(self):
+        """Should merge a batch of history orders the same way as adding them one by one."""
+        orders = [{'id': str(i % 7), 'type': 'ORDER_TYPE_BUY',
+                   'doneTime': datetime.fromtimestamp(1000 + (i * 37) % 11).isoformat()} for i in range(30)]
+        for order in orders[:10]:
+            await storage.on_history_order_added(order)
+        await storage.on_history_orders_added(orders[10:])
+        bulk = list(storage.history_orders)
+        storage._fileManager.delete_storage_from_disk = AsyncMock()
+        storage.reset()
+        for order in orders:
+            await storage.on_history_order_added(order)
+        assert bulk == storage.history_orders
+        assert all(a is b for a, b in zip(bulk, storage.history_orders))
+
+    @pytest.mark.asyncio
+    async def test_evict_records_out_of_retention_window(self, tmp_path, monkeypatch):
+        """Should evict records older than the retention window to disk and read them back in range queries."""
+        monkeypatch.chdir(tmp_path)
+        windowed_storage = MemoryHistoryStorage('accountId', retention_days=30)
+        windowed_storage._fileManager.update_disk_storage = AsyncMock()
+        now = datetime.now(pytz.UTC).replace(microsecond=0)
+        await windowed_storage.on_deals_added([
+            {'id': '1', 'time': now - timedelta(days=50), 'type': 'DEAL_TYPE_SELL'},
+            {'id': '2', 'time': now - timedelta(days=40), 'type': 'DEAL_TYPE_SELL'},
+            {'id': '3', 'time': now - timedelta(days=1), 'type': 'DEAL_TYPE_SELL'}
+        ])
+        await windowed_storage.on_history_order_added({'id': '4', 'doneTime': now - timedelta(days=40),
+                                                       'type': 'ORDER_TYPE_BUY'})
+        await windowed_storage.update_disk_storage()
+        assert list(map(lambda deal: deal['id'], windowed_storage.deals)) == ['3']
+        assert windowed_storage.history_orders == []
+        assert list(map(lambda deal: deal['id'], windowed_storage.get_deals_by_time_range())) == ['1', '2', '3']
+        assert list(map(lambda deal: deal['id'], windowed_storage.get_deals_by_time_range(
+            now - timedelta(days=45), now - timedelta(days=1)))) == ['2']
+        assert list(map(lambda order: order['id'], windowed_storage.get_history_orders_by_time_range())) == ['4']
+        assert await windowed_storage.last_deal_time() == now - timedelta(days=1)
+        assert await windowed_storage.last_history_order_time() == now - timedelta(days=40)
+        assert all(isinstance(deal['time'], datetime) for deal in windowed_storage.get_deals_by_time_range())
+        assert all(isinstance(order['doneTime'], datetime)
+                   for order in windowed_storage.get_history_orders_by_time_range())
+        windowed_storage._fileManager.delete_storage_from_disk = AsyncMock()
+        windowed_storage.reset()
+        assert list(windowed_storage.get_deals_by_time_range()) == []
+
+    @pytest.mark.asyncio
+    async def test_evict_records_in_thread_pool(self, tmp_path, monkeypatch):
+        """Should write evicted records to the archive outside the event loop thread."""
+        monkeypatch.chdir(tmp_path)
+        windowed_storage = MemoryHistoryStorage('accountId', retention_days=30)
+        windowed_storage._fileManager.update_disk_storage = AsyncMock()
+        threads = set()
+        flush = windowed_storage._archive._flush
+
+        def tracked_flush():
+            threads.add(threading.get_ident())
+            flush()
+
+        windowed_storage._archive._flush = tracked_flush
+        now = datetime.now(pytz.UTC)
+        await windowed_storage.on_deal_added({'id': '1', 'time': now - timedelta(days=50), 'type': 'DEAL_TYPE_SELL'})
+        await windowed_storage.update_disk_storage()
+        assert windowed_storage.deals == []
+        assert len(threads) and threading.get_ident() not in threads
+
+    @pytest.mark.asyncio
+    async def test_validate_retention_window(self):
+        """Should validate retention window."""
+        with pytest.raises(ValidationException):
+            MemoryHistoryStorage('accountId', retention_days=0)
+
+    @pytest.mark.asyncio
+    async def test_keep_deal_columns_in_sync(self):
+        """Should keep columnar copy of deals in sync with deals."""
+        columnar_storage = MemoryHistoryStorage('accountId', deal_columns=True)
+        deals = [{'id': str(i % 7), 'type': 'DEAL_TYPE_BUY', 'profit': i,
+                  'time': datetime.fromtimestamp(1000 + (i * 37) % 11).isoformat()} for i in range(30)]
+        for deal in deals[:10]:
+            await columnar_storage.on_deal_added(deal)
+        await columnar_storage.on_deals_added(deals[10:])
+        assert columnar_storage.deal_columns._numericColumns['profit'].tolist() == \
+            list(map(lambda deal: deal['profit'], columnar_storage.deals))
+        assert len(storage.deals) == 0 and storage.deal_columns is None
+
     @pytest.mark.asyncio
     async def test_return_saved_order_sync_status(self):
         """Should return saved order synchronization status."""
@@ -154,3 +366,19 @@ class TestMemoryHistoryStorage:
         assert storage.deals == []
         assert storage.history_orders == []
         storage._fileManager.delete_storage_from_disk.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_discard_unsaved_changes_on_reset(self, tmp_path, monkeypatch):
+        """Should discard unsaved changes on reset so that they are not written back to disk."""
+        monkeypatch.chdir(tmp_path)
+        file_storage = MemoryHistoryStorage('accountId')
+        await file_storage.on_deal_added({'id': '1', 'time': date('2020-01-01T00:00:00.000Z'),
+                                          'type': 'DEAL_TYPE_SELL'})
+        await file_storage.update_disk_storage()
+        await file_storage.on_deal_added({'id': '2', 'time': date('2020-01-02T00:00:00.000Z'),
+                                          'type': 'DEAL_TYPE_SELL'})
+        file_storage.reset()
+        assert file_storage._fileManager._pendingDeals == []
+        await asyncio.sleep(0.1)
+        await file_storage.update_disk_storage()
+        assert await file_storage._fileManager.get_history_from_disk() == {'deals': [], 'historyOrders': []}
@@ -1,13 +1,20 @@
-from ..clients.httpClient import HttpClient
+from ..clients.httpClient import HttpClient, run_until_closed
 from ..clients.metaApi.metaApiWebsocket_client import MetaApiWebsocketClient
 from ..metaApi.provisioningProfileApi import ProvisioningProfileApi
 from ..clients.metaApi.provisioningProfile_client import ProvisioningProfileClient
 from ..metaApi.metatraderAccountApi import MetatraderAccountApi
 from ..clients.metaApi.metatraderAccount_client import MetatraderAccountClient
 from ..clients.errorHandler import ValidationException
+from ..clients.retryPolicy import RetryPolicy
+from ..clients.rateLimiter import RateLimiter
+from ..clients.responseCache import ResponseCache
+from ..clients.requestListener import RequestListener
 from ..metaApi.connectionRegistry import ConnectionRegistry
 from .metatraderDemoAccountApi import MetatraderDemoAccountApi
+from .historyDirectory import HistoryDirectory
 from ..clients.metaApi.metatraderDemoAccount_client import MetatraderDemoAccountClient
+from typing import Optional
+import asyncio
 import re
 
 
@@ -15,7 +22,10 @@ class MetaApi:
     """MetaApi MetaTrader API SDK"""
 
     def __init__(self, token: str, application: str = 'MetaApi', domain: str = 'agiliumtrade.agiliumtrade.ai',
-                 request_timeout: float = 60, connect_timeout: float = 60):
+                 request_timeout: float = 60, connect_timeout: float = 60, compact_records: bool = False,
+                 history_directory: HistoryDirectory = None, max_connections_per_host: int = 0,
+                 retry_policy: RetryPolicy = None, rate_limiter: RateLimiter = None,
+                 response_cache: ResponseCache = None):
         """Inits MetaApi class instance.
 
         Args:
@@ -24,15 +34,29 @@ class MetaApi:
             domain: Domain to connect to.
             request_timeout: Timeout for http requests in seconds.
             connect_timeout: Timeout for connecting to server in seconds.
+            compact_records: Whether to store symbol prices and specifications in memory-efficient records which
+            offer mapping-style access instead of dicts, default is False.
+            history_directory: Directory to store history files of default history storages in, by default files
+            are stored in .metaapi directory.
+            max_connections_per_host: Maximum number of pooled HTTP connections to a single host, default is 0
+            which means no limit.
+            retry_policy: Policy of retrying failed http requests, by default requests are retried with default
+            options of RetryPolicy.
+            rate_limiter: Client-side rate limiter of http requests shared by all API clients, by default requests
+            are not limited.
+            response_cache: Cache of http responses shared by all API clients, by default responses are not cached.
         """
         if not re.search(r"[a-zA-Z0-9_]+", application):
             raise ValidationException('Application name must be non-empty string consisting ' +
                                       'from letters, digits and _ only')
-        http_client = HttpClient(request_timeout)
+        http_client = HttpClient(request_timeout, max_connections_per_host=max_connections_per_host,
+                                 retry_policy=retry_policy, rate_limiter=rate_limiter,
+                                 response_cache=response_cache)
+        self._httpClient = http_client
         self._metaApiWebsocketClient = MetaApiWebsocketClient(token, application, domain, request_timeout,
-                                                              connect_timeout)
+                                                              connect_timeout, compact_records)
         self._provisioningProfileApi = ProvisioningProfileApi(ProvisioningProfileClient(http_client, token, domain))
-        self._connectionRegistry = ConnectionRegistry(self._metaApiWebsocketClient, application)
+        self._connectionRegistry = ConnectionRegistry(self._metaApiWebsocketClient, application, history_directory)
         self._metatraderAccountApi = MetatraderAccountApi(MetatraderAccountClient(http_client, token, domain),
                                                           self._metaApiWebsocketClient, self._connectionRegistry)
         self._metatraderDemoAccountApi = MetatraderDemoAccountApi(MetatraderDemoAccountClient(http_client, token,
@@ -65,6 +89,33 @@ class MetaApi:
         """
         return self._metatraderDemoAccountApi
 
-    def close(self):
-        """Closes all clients and connections"""
-        self._metaApiWebsocketClient.close()
+    def add_request_listener(self, listener: RequestListener):
+        """Adds listener which is notified about each attempt of a REST API request.
+
+        Args:
+            listener: Request listener to add.
+        """
+        self._httpClient.add_request_listener(listener)
+
+    def remove_request_listener(self, listener: RequestListener):
+        """Removes request listener.
+
+        Args:
+            listener: Listener to remove.
+        """
+        self._httpClient.remove_request_listener(listener)
+
+    def close(self) -> Optional['asyncio.Future']:
+        """Closes all clients and connections. If the event loop is not running, e.g. the method is invoked after the
+        application has finished, the clients are closed before the method returns.
+
+        Returns:
+            If the event loop is running, a future which resolves when the clients are closed. It can be awaited to
+            make sure the connections are released, e.g. before the event loop is closed.
+        """
+        return run_until_closed(self._close())
+
+    async def _close(self):
+        """Closes the websocket client and pooled HTTP connections."""
+        await self._metaApiWebsocketClient.close()
+        await self._httpClient.close()
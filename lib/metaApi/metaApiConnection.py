@@ -2,10 +2,13 @@ from ..clients.metaApi.synchronizationListener import SynchronizationListener
 from ..clients.metaApi.reconnectListener import ReconnectListener
 from ..clients.metaApi.metaApiWebsocket_client import MetaApiWebsocketClient
 from .terminalState import TerminalState
+from .tickStore import TickStore
+from .specificationStore import specification_store
 from .memoryHistoryStorage import MemoryHistoryStorage
 from .metatraderAccountModel import MetatraderAccountModel
 from .connectionRegistryModel import ConnectionRegistryModel
 from .historyStorage import HistoryStorage
+from .historyDirectory import HistoryDirectory
 from ..clients.timeoutException import TimeoutException
 from .models import random_id, MetatraderSymbolSpecification, MetatraderAccountInformation, \
     MetatraderPosition, MetatraderOrder, MetatraderHistoryOrders, MetatraderDeals, MetatraderTradeResponse, \
@@ -32,7 +35,7 @@ class MetaApiConnection(SynchronizationListener, ReconnectListener):
 
     def __init__(self, websocket_client: MetaApiWebsocketClient, account: MetatraderAccountModel,
                  history_storage: HistoryStorage or None, connection_registry: ConnectionRegistryModel,
-                 history_start_time: datetime = None):
+                 history_start_time: datetime = None, history_directory: HistoryDirectory = None):
         """Inits MetaApi MetaTrader Api connection.
 
         Args:
@@ -41,6 +44,7 @@ class MetaApiConnection(SynchronizationListener, ReconnectListener):
             history_storage: Local terminal history storage. By default an instance of MemoryHistoryStorage
             will be used.
             history_start_time: History start sync time.
+            history_directory: Directory to store history files of the default history storage in.
         """
         super().__init__()
         self._websocketClient = websocket_client
@@ -53,8 +57,10 @@ class MetaApiConnection(SynchronizationListener, ReconnectListener):
         self._lastDisconnectedSynchronizationId = None
         self._connection_registry = connection_registry
         self._history_start_time = history_start_time
-        self._terminalState = TerminalState()
-        self._historyStorage = history_storage or MemoryHistoryStorage(account.id)
+        self._terminalState = TerminalState(account.server, specification_store)
+        self._tickStore = None
+        self._historyStorage = history_storage or MemoryHistoryStorage(account.id,
+                                                                       history_directory=history_directory)
         self._websocketClient.add_synchronization_listener(account.id, self)
         self._websocketClient.add_synchronization_listener(account.id, self._terminalState)
         self._websocketClient.add_synchronization_listener(account.id, self._historyStorage)
@@ -586,6 +592,31 @@ class MetaApiConnection(SynchronizationListener, ReconnectListener):
         """
         return self._historyStorage
 
+    @property
+    def tick_store(self) -> Optional[TickStore]:
+        """Returns local store of recent symbol ticks.
+
+        Returns:
+            Local tick store or None if tick store is not enabled.
+        """
+        return self._tickStore
+
+    def enable_tick_store(self, capacity: int = 1000, symbols: List[str] = None) -> TickStore:
+        """Enables keeping recent ticks of symbols in fixed-capacity ring buffers. Returns existing tick store if
+        it is already enabled.
+
+        Args:
+            capacity: Maximum number of ticks to keep per symbol, default is 1000.
+            symbols: Optional list of symbols to keep ticks for, by default ticks of all symbols are kept.
+
+        Returns:
+            Local tick store.
+        """
+        if not self._tickStore:
+            self._tickStore = TickStore(capacity, symbols)
+            self._websocketClient.add_synchronization_listener(self._account.id, self._tickStore)
+        return self._tickStore
+
     def add_synchronization_listener(self, listener):
         """Adds synchronization listener.
 
@@ -697,5 +728,8 @@ class MetaApiConnection(SynchronizationListener, ReconnectListener):
             self._websocketClient.remove_synchronization_listener(self._account.id, self)
             self._websocketClient.remove_synchronization_listener(self._account.id, self._terminalState)
             self._websocketClient.remove_synchronization_listener(self._account.id, self._historyStorage)
+            self._terminalState.close()
+            if self._tickStore:
+                self._websocketClient.remove_synchronization_listener(self._account.id, self._tickStore)
             self._connection_registry.remove(self._account.id)
             self._closed = True
@@ -765,3 +765,17 @@ class TestMetaApiConnection:
         api._historyStorage.load_data_from_disk = AsyncMock()
         await api.initialize()
         api._historyStorage.load_data_from_disk.assert_called()
+
+    @pytest.mark.asyncio
+    async def test_enable_tick_store(self):
+        """Should enable tick store."""
+        client.add_synchronization_listener = MagicMock()
+        client.remove_synchronization_listener = MagicMock()
+        api = MetaApiConnection(client, account, MagicMock(), MagicMock())
+        assert api.tick_store is None
+        tick_store = api.enable_tick_store(100)
+        assert api.enable_tick_store() == tick_store
+        assert api.tick_store.capacity == 100
+        client.add_synchronization_listener.assert_any_call('accountId', tick_store)
+        api.close()
+        client.remove_synchronization_listener.assert_any_call('accountId', tick_store)
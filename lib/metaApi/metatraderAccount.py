@@ -139,12 +139,13 @@ class MetatraderAccount(MetatraderAccountModel):
         return 'manualTrades' in self._data and self._data['manualTrades']
 
     async def reload(self):
-        """Reloads MetaTrader account from API.
+        """Reloads MetaTrader account from API. The account is always requested from the server, bypassing the
+        response cache, so that waiting for a state change does not observe a stale account.
 
         Returns:
             A coroutine resolving when MetaTrader account is updated.
         """
-        self._data = await self._metatraderAccountClient.get_account(self.id)
+        self._data = await self._metatraderAccountClient.get_account(self.id, False)
 
     async def remove(self):
         """Removes MetaTrader account. Cloud account transitions to DELETING state.
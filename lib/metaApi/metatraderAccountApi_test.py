@@ -230,7 +230,7 @@ class TestMetatraderAccountApi:
         await account.reload()
         assert account.connection_status == 'CONNECTED'
         assert account.state == 'DEPLOYED'
-        client.get_account.assert_called_with('id')
+        client.get_account.assert_called_with('id', False)
         assert client.get_account.call_count == 2
 
     @pytest.mark.asyncio
@@ -270,7 +270,7 @@ class TestMetatraderAccountApi:
             registry.remove.assert_called_with('id')
             assert account.state == 'DELETING'
             client.delete_account.assert_called_with('id')
-            client.get_account.assert_called_with('id')
+            client.get_account.assert_called_with('id', False)
             assert client.get_account.call_count == 2
 
     @pytest.mark.asyncio
@@ -304,7 +304,7 @@ class TestMetatraderAccountApi:
         await account.deploy()
         assert account.state == 'DEPLOYING'
         client.deploy_account.assert_called_with('id')
-        client.get_account.assert_called_with('id')
+        client.get_account.assert_called_with('id', False)
         assert client.get_account.call_count == 2
 
     @pytest.mark.asyncio
@@ -339,7 +339,7 @@ class TestMetatraderAccountApi:
         registry.remove.assert_called_with('id')
         assert account.state == 'UNDEPLOYING'
         client.undeploy_account.assert_called_with('id')
-        client.get_account.assert_called_with('id')
+        client.get_account.assert_called_with('id', False)
         assert client.get_account.call_count == 2
 
     @pytest.mark.asyncio
@@ -373,7 +373,7 @@ class TestMetatraderAccountApi:
         await account.redeploy()
         assert account.state == 'UNDEPLOYING'
         client.redeploy_account.assert_called_with('id')
-        client.get_account.assert_called_with('id')
+        client.get_account.assert_called_with('id', False)
         assert client.get_account.call_count == 2
 
     @pytest.mark.asyncio
@@ -408,7 +408,7 @@ class TestMetatraderAccountApi:
         account = await api.get_account('id')
         await account.wait_deployed(1, 50)
         assert account.state == 'DEPLOYED'
-        client.get_account.assert_called_with('id')
+        client.get_account.assert_called_with('id', False)
         assert client.get_account.call_count == 3
 
     @pytest.mark.asyncio
@@ -434,7 +434,7 @@ class TestMetatraderAccountApi:
         except Exception as err:
             assert err.__class__.__name__ == 'TimeoutException'
             assert account.state == 'DEPLOYING'
-        client.get_account.assert_called_with('id')
+        client.get_account.assert_called_with('id', False)
 
     @pytest.mark.asyncio
     async def test_wait_for_undeployment(self):
@@ -468,7 +468,7 @@ class TestMetatraderAccountApi:
         account = await api.get_account('id')
         await account.wait_undeployed(1, 50)
         assert account.state == 'UNDEPLOYED'
-        client.get_account.assert_called_with('id')
+        client.get_account.assert_called_with('id', False)
         assert client.get_account.call_count == 3
 
     @pytest.mark.asyncio
@@ -494,7 +494,7 @@ class TestMetatraderAccountApi:
         except Exception as err:
             assert err.__class__.__name__ == 'TimeoutException'
             assert account.state == 'UNDEPLOYING'
-        client.get_account.assert_called_with('id')
+        client.get_account.assert_called_with('id', False)
 
     @pytest.mark.asyncio
     async def test_wait_until_removed(self):
@@ -514,7 +514,7 @@ class TestMetatraderAccountApi:
         client.get_account = AsyncMock(side_effect=[deleting_account, deleting_account, NotFoundException('')])
         account = await api.get_account('id')
         await account.wait_removed(1, 50)
-        client.get_account.assert_called_with('id')
+        client.get_account.assert_called_with('id', False)
         assert client.get_account.call_count == 3
 
     @pytest.mark.asyncio
@@ -539,7 +539,7 @@ class TestMetatraderAccountApi:
             raise Exception('TimeoutException is expected')
         except Exception as err:
             assert err.__class__.__name__ == 'TimeoutException'
-        client.get_account.assert_called_with('id')
+        client.get_account.assert_called_with('id', False)
 
     @pytest.mark.asyncio
     async def test_wait_until_broker_connection(self):
@@ -572,7 +572,7 @@ class TestMetatraderAccountApi:
         account = await api.get_account('id')
         await account.wait_connected(1, 50)
         assert account.connection_status == 'CONNECTED'
-        client.get_account.assert_called_with('id')
+        client.get_account.assert_called_with('id', False)
         assert client.get_account.call_count == 3
 
     @pytest.mark.asyncio
@@ -598,7 +598,7 @@ class TestMetatraderAccountApi:
         except Exception as err:
             assert err.__class__.__name__ == 'TimeoutException'
             assert account.connection_status == 'DISCONNECTED'
-        client.get_account.assert_called_with('id')
+        client.get_account.assert_called_with('id', False)
 
     @pytest.mark.asyncio
     async def test_connect_to_mt_terminal(self):
@@ -652,5 +652,5 @@ class TestMetatraderAccountApi:
           'password': 'moreSecurePass',
           'server': 'OtherMarkets-Demo',
         })
-        client.get_account.assert_called_with('id')
+        client.get_account.assert_called_with('id', False)
         assert client.get_account.call_count == 2
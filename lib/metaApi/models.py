@@ -2,6 +2,7 @@ from datetime import datetime
 from typing_extensions import TypedDict
 from typing import List, Optional
 import iso8601
+import json
 import random
 import string
 import pytz
@@ -17,6 +18,19 @@ def format_date(date: datetime) -> str:
     return date.astimezone(pytz.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
 
 
+def stringify(obj: dict or List) -> str:
+    """Converts an object to a compact JSON string. Dates are converted to strings.
+
+    Args:
+        obj: Object to convert.
+
+    Returns:
+        Stringified object.
+    """
+    return json.dumps(obj, separators=(',', ':'),
+                      default=lambda value: format_date(value) if isinstance(value, datetime) else str(value))
+
+
 def random_id(length: int = 32) -> str:
     """Generates a random id of 32 symbols."""
     return ''.join(random.choice(string.ascii_lowercase) for i in range(length))
@@ -427,6 +441,27 @@ class MetatraderSymbolPrice(TypedDict):
     """Quote time, in broker timezone, YYYY-MM-DD HH:mm:ss.SSS format."""
 
 
+class MetatraderBar(TypedDict):
+    """OHLC bar aggregated locally from symbol bid prices."""
+
+    symbol: str
+    """Symbol (e.g. a currency pair or an index)."""
+    timeframe: str
+    """Bar timeframe, e.g. 1s, 1m, 5m, 1h or 1d."""
+    time: datetime
+    """Bar open time."""
+    open: float
+    """Open price."""
+    high: float
+    """High price."""
+    low: float
+    """Low price."""
+    close: float
+    """Close price."""
+    tickVolume: int
+    """Number of ticks aggregated into the bar."""
+
+
 class MetatraderTradeResponse(TypedDict):
     """MetaTrader trade response."""
 
@@ -69,12 +69,13 @@ class ProvisioningProfile:
         return self._data['brokerDSTSwitchTimezone']
 
     async def reload(self):
-        """Reloads provisioning profile from API.
+        """Reloads provisioning profile from API. The profile is always requested from the server, bypassing the
+        response cache.
 
         Returns:
             A coroutine resolving when provisioning profile is updated.
         """
-        self._data = await self._provisioningProfileClient.get_provisioning_profile(self.id)
+        self._data = await self._provisioningProfileClient.get_provisioning_profile(self.id, False)
 
     async def remove(self) -> Response:
         """Removes provisioning profile. The current object instance should be discarded after returned promise
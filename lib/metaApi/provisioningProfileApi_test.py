@@ -93,7 +93,7 @@ class TestProvisioningProfileApi:
         profile = await api.get_provisioning_profile('id')
         await profile.reload()
         assert profile.status == 'active'
-        client.get_provisioning_profile.assert_called_with('id')
+        client.get_provisioning_profile.assert_called_with('id', False)
         assert client.get_provisioning_profile.call_count == 2
 
     @pytest.mark.asyncio
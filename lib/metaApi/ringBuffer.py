@@ -0,0 +1,100 @@
+from ..clients.errorHandler import ValidationException
+from array import array
+from typing import Dict, List, Optional
+
+
+class RingBuffer:
+    """Fixed-capacity ring buffer of records with float fields backed by arrays. Each value is written twice, at its
+    ring position and at the same position shifted by capacity, so that any window of recent records is a contiguous
+    slice of the array and can be returned without copying."""
+
+    def __init__(self, fields: List[str], capacity: int):
+        """Inits the ring buffer instance.
+
+        Args:
+            fields: Names of record fields.
+            capacity: Maximum number of records to keep.
+        """
+        if capacity < 1:
+            raise ValidationException('Ring buffer capacity must be a positive number')
+        self._fields = tuple(fields)
+        self._capacity = capacity
+        self._next = 0
+        self._size = 0
+        self._columns = [array('d', bytes(16 * capacity)) for field in self._fields]
+
+    @property
+    def fields(self) -> List[str]:
+        """Returns names of record fields.
+
+        Returns:
+            Names of record fields.
+        """
+        return list(self._fields)
+
+    @property
+    def capacity(self) -> int:
+        """Returns maximum number of records kept in the buffer.
+
+        Returns:
+            Buffer capacity.
+        """
+        return self._capacity
+
+    def __len__(self) -> int:
+        """Returns number of records stored in the buffer."""
+        return self._size
+
+    def append(self, *values: float):
+        """Appends a record to the buffer, overwriting the oldest record if the buffer is full.
+
+        Args:
+            values: Record field values in the order of buffer fields.
+        """
+        index = self._next
+        mirror_index = index + self._capacity
+        for column, value in zip(self._columns, values):
+            column[index] = value
+            column[mirror_index] = value
+        self._next = (index + 1) % self._capacity
+        if self._size < self._capacity:
+            self._size += 1
+
+    def window(self, count: int = None) -> Dict[str, memoryview]:
+        """Returns zero-copy views of the most recent records in chronological order. Views reference buffer memory
+        and will reflect records appended later once the buffer wraps around, copy the data if you need to keep it.
+
+        Args:
+            count: Number of most recent records to return, by default all records stored are returned.
+
+        Returns:
+            Read-only views of record fields indexed by field name.
+        """
+        count = self._size if count is None else max(0, min(count, self._size))
+        end = self._next + self._capacity
+        return {field: memoryview(column).toreadonly()[end - count:end]
+                for field, column in zip(self._fields, self._columns)}
+
+    def numpy_window(self, count: int = None) -> Dict[str, 'numpy.ndarray']:
+        """Returns zero-copy read-only NumPy arrays over the most recent records in chronological order. Requires
+        numpy package to be installed.
+
+        Args:
+            count: Number of most recent records to return, by default all records stored are returned.
+
+        Returns:
+            Record field arrays indexed by field name.
+        """
+        import numpy
+        return {field: numpy.frombuffer(view, dtype=numpy.float64) for field, view in self.window(count).items()}
+
+    def last(self) -> Optional[Dict[str, float]]:
+        """Returns the most recent record.
+
+        Returns:
+            The most recent record or None if the buffer is empty.
+        """
+        if not self._size:
+            return None
+        index = self._next - 1 + self._capacity
+        return {field: column[index] for field, column in zip(self._fields, self._columns)}
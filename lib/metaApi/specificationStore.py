@@ -0,0 +1,74 @@
+from .models import MetatraderSymbolSpecification
+from typing import Dict, List, Tuple
+
+
+class SpecificationStore:
+    """Reference-counted store which deduplicates symbol specifications of accounts hosted on the same broker server.
+    Terminal states acquire a shared instance equal to the specification received and release it when the
+    specification is replaced. An account with a specification different from other accounts gets its own instance,
+    so shared specifications are never modified and must be treated as read-only."""
+
+    def __init__(self):
+        """Inits the specification store instance."""
+        self._entries: Dict[Tuple[str, str], List[list]] = {}
+
+    def __len__(self) -> int:
+        """Returns number of distinct specifications stored."""
+        return sum(len(variants) for variants in self._entries.values())
+
+    def acquire(self, server: str, specification: MetatraderSymbolSpecification) -> MetatraderSymbolSpecification:
+        """Returns a shared instance of a specification, adding the specification to the store if there is no equal
+        specification stored for the server yet.
+
+        Args:
+            server: MetaTrader server which hosts the account.
+            specification: MetaTrader symbol specification.
+
+        Returns:
+            Shared specification instance.
+        """
+        variants = self._entries.setdefault((server, specification['symbol']), [])
+        for entry in variants:
+            if entry[0] is specification or entry[0] == specification:
+                entry[1] += 1
+                return entry[0]
+        variants.append([specification, 1])
+        return specification
+
+    def release(self, server: str, specification: MetatraderSymbolSpecification):
+        """Releases a shared specification instance acquired before. The specification is removed from the store
+        once it is not referenced anymore.
+
+        Args:
+            server: MetaTrader server which hosts the account.
+            specification: Shared specification instance.
+        """
+        key = (server, specification['symbol'])
+        variants = self._entries.get(key, [])
+        for i in range(len(variants)):
+            if variants[i][0] is specification:
+                variants[i][1] -= 1
+                if variants[i][1] <= 0:
+                    del variants[i]
+                    if not variants:
+                        del self._entries[key]
+                break
+
+    def reference_count(self, server: str, specification: MetatraderSymbolSpecification) -> int:
+        """Returns number of references to a shared specification instance.
+
+        Args:
+            server: MetaTrader server which hosts the account.
+            specification: Shared specification instance.
+
+        Returns:
+            Number of references or 0 if the instance is not stored.
+        """
+        for entry in self._entries.get((server, specification['symbol']), []):
+            if entry[0] is specification:
+                return entry[1]
+        return 0
+
+
+specification_store = SpecificationStore()
+"""Process-wide specification store used by terminal states by default."""
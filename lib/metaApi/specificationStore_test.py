@@ -0,0 +1,49 @@
+from .specificationStore import SpecificationStore
+from .terminalState import TerminalState
+import pytest
+store = None
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests():
+    global store
+    store = SpecificationStore()
+    yield
+
+
+class TestSpecificationStore:
+
+    def test_share_equal_specifications(self):
+        """Should share equal specifications of the same server."""
+        specification = store.acquire('server', {'symbol': 'EURUSD', 'tickSize': 0.00001})
+        assert store.acquire('server', {'symbol': 'EURUSD', 'tickSize': 0.00001}) is specification
+        assert store.acquire('server2', {'symbol': 'EURUSD', 'tickSize': 0.00001}) is not specification
+        assert store.acquire('server', {'symbol': 'EURUSD', 'tickSize': 0.0001}) is not specification
+        assert store.reference_count('server', specification) == 2
+        assert len(store) == 3
+
+    def test_remove_released_specifications(self):
+        """Should remove specifications which are not referenced anymore."""
+        specification = store.acquire('server', {'symbol': 'EURUSD', 'tickSize': 0.00001})
+        store.acquire('server', {'symbol': 'EURUSD', 'tickSize': 0.00001})
+        store.release('server', specification)
+        assert store.reference_count('server', specification) == 1
+        store.release('server', specification)
+        assert store.reference_count('server', specification) == 0
+        assert len(store) == 0
+
+    @pytest.mark.asyncio
+    async def test_share_specifications_between_terminal_states(self):
+        """Should share specifications between terminal states of the same server."""
+        state = TerminalState('server', store)
+        state2 = TerminalState('server', store)
+        await state.on_symbol_specification_updated({'symbol': 'EURUSD', 'tickSize': 0.00001})
+        await state2.on_symbol_specification_updated({'symbol': 'EURUSD', 'tickSize': 0.00001})
+        assert state.specification('EURUSD') is state2.specification('EURUSD')
+        await state2.on_symbol_specification_updated({'symbol': 'EURUSD', 'tickSize': 0.0001})
+        assert state.specification('EURUSD') == {'symbol': 'EURUSD', 'tickSize': 0.00001}
+        assert state2.specification('EURUSD') == {'symbol': 'EURUSD', 'tickSize': 0.0001}
+        assert store.reference_count('server', state.specification('EURUSD')) == 1
+        await state2.on_synchronization_started()
+        state.close()
+        assert len(store) == 0
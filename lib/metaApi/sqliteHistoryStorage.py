@@ -0,0 +1,390 @@
+from .historyStorage import HistoryStorage, get_record_key
+from .historyDirectory import HistoryDirectory
+from .historyFileManager import get_executor
+from .models import MetatraderDeal, MetatraderOrder, date, stringify
+from datetime import datetime
+from typing import List, Iterator, Callable
+import asyncio
+import heapq
+import json
+import sqlite3
+import threading
+import pytz
+
+TABLES = ('deals', 'historyOrders')
+
+TIME_FIELDS = {'deals': 'time', 'historyOrders': 'doneTime'}
+
+
+class SqliteHistoryStorage(HistoryStorage):
+    """History storage which stores MetaTrader history in an SQLite database on disk. Records are indexed by time,
+    id and position id, so that history does not have to be kept in RAM. Records added one by one during
+    synchronization are inserted in batches in the history thread pool, so that database writes do not block the
+    event loop. Queries read the database through a separate connection and merge records which are not inserted
+    yet, so that they do not wait for the writes."""
+
+    def __init__(self, account_id: str, application: str = 'MetaApi', file_path: str = None,
+                 batch_size: int = 1000, history_directory: HistoryDirectory = None):
+        """Inits the SQLite history storage instance.
+
+        Args:
+            account_id: MetaTrader account id.
+            application: Application id.
+            file_path: Path to the database file, by default {account_id}-{application}-history.db file in the
+            history directory.
+            batch_size: Maximum number of records to buffer before inserting them into the database, default is 1000.
+            history_directory: Directory to store the database in if file path is not set, by default .metaapi
+            directory.
+        """
+        super().__init__()
+        self._accountId = account_id
+        if file_path is None:
+            history_directory = history_directory or HistoryDirectory()
+            history_directory.make_account_directory(account_id)
+            file_path = history_directory.get_file_path(account_id, f'{account_id}-{application}-history.db')
+        self._filePath = file_path
+        self._batchSize = batch_size
+        self._pending = {table: [] for table in TABLES}
+        self._inserting = {table: [] for table in TABLES}
+        self._resetCount = 0
+        self._appliedResetCount = 0
+        self._pendingLock = threading.Lock()
+        self._dbLock = threading.Lock()
+        self._db = sqlite3.connect(file_path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        for table in TABLES:
+            self._db.execute(f'CREATE TABLE IF NOT EXISTS {table} (id TEXT NOT NULL, type TEXT NOT NULL, '
+                             'time REAL NOT NULL, positionId TEXT, data TEXT NOT NULL, PRIMARY KEY (id, type, time))')
+            self._db.execute(f'CREATE INDEX IF NOT EXISTS {table}_time ON {table} (time, id)')
+            self._db.execute(f'CREATE INDEX IF NOT EXISTS {table}_positionId ON {table} (positionId)')
+        self._db.commit()
+        self._readDb = sqlite3.connect(file_path, check_same_thread=False)
+
+    @property
+    def file_path(self) -> str:
+        """Returns path to the database file.
+
+        Returns:
+            Path to the database file.
+        """
+        return self._filePath
+
+    async def load_data_from_disk(self):
+        """Invoked when the connection is initialized. History is read from the database on demand, so nothing is
+        loaded in advance.
+
+        Returns:
+            A coroutine which resolves when the history is loaded.
+        """
+        pass
+
+    async def update_disk_storage(self):
+        """Inserts buffered history records into the database.
+
+        Returns:
+            A coroutine which resolves when the history is saved.
+        """
+        await self._run_in_executor(self._flush)
+
+    def reset(self):
+        """Deletes all history records from the storage. Records are removed from query results immediately and
+        deleted from the database in the history thread pool."""
+        with self._pendingLock:
+            self._pending = {table: [] for table in TABLES}
+            self._inserting = {table: [] for table in TABLES}
+            self._resetCount += 1
+        asyncio.ensure_future(self._run_in_executor(self._flush))
+
+    async def close(self):
+        """Inserts buffered history records and closes the database. The instance of the class should no longer be
+        used after this method is invoked.
+
+        Returns:
+            A coroutine which resolves when the database is closed.
+        """
+        await self._run_in_executor(self._close)
+        self._readDb.close()
+
+    async def last_history_order_time(self) -> datetime:
+        """Returns the time of the last history order record stored in the history storage.
+
+        Returns:
+            The time of the last history order record stored in the history storage.
+        """
+        return await self._run_in_executor(self._get_last_record_time, 'historyOrders')
+
+    async def last_deal_time(self) -> datetime:
+        """Returns the time of the last history deal record stored in the history storage.
+
+        Returns:
+            The time of the last history deal record stored in the history storage.
+        """
+        return await self._run_in_executor(self._get_last_record_time, 'deals')
+
+    async def on_history_order_added(self, history_order: MetatraderOrder):
+        """Invoked when a new MetaTrader history order is added.
+
+        Args:
+            history_order: New MetaTrader history order.
+        """
+        await self._add_records('historyOrders', [history_order])
+
+    async def on_history_orders_added(self, history_orders: List[MetatraderOrder]):
+        """Invoked when a batch of new MetaTrader history orders is added.
+
+        Args:
+            history_orders: New MetaTrader history orders.
+        """
+        await self._add_records('historyOrders', history_orders)
+
+    async def on_deal_added(self, deal: MetatraderDeal):
+        """Invoked when a new MetaTrader history deal is added.
+
+        Args:
+            deal: New MetaTrader history deal.
+        """
+        await self._add_records('deals', [deal])
+
+    async def on_deals_added(self, deals: List[MetatraderDeal]):
+        """Invoked when a batch of new MetaTrader history deals is added.
+
+        Args:
+            deals: New MetaTrader history deals.
+        """
+        await self._add_records('deals', deals)
+
+    async def on_deal_synchronization_finished(self, synchronization_id: str):
+        """Invoked when a synchronization of history deals on a MetaTrader account have finished.
+
+        Args:
+            synchronization_id: Synchronization request id.
+        """
+        await self._run_in_executor(self._flush)
+        await super().on_deal_synchronization_finished(synchronization_id)
+
+    async def on_order_synchronization_finished(self, synchronization_id: str):
+        """Invoked when a synchronization of history orders on a MetaTrader account have finished.
+
+        Args:
+            synchronization_id: Synchronization request id.
+        """
+        await self._run_in_executor(self._flush)
+        await super().on_order_synchronization_finished(synchronization_id)
+
+    def get_deals_by_time_range(self, start_time: datetime = None, end_time: datetime = None) \
+            -> Iterator[MetatraderDeal]:
+        """Iterates over deals in a time range sorted by time and id. Deals are read from the database while
+        iterating.
+
+        Args:
+            start_time: Time to start iterating from, inclusive. By default iterates from the first deal.
+            end_time: Time to stop iterating at, exclusive. By default iterates up to the last deal.
+
+        Returns:
+            Iterator of deals found.
+        """
+        return self._get_records_by_time_range('deals', start_time, end_time)
+
+    def get_deals_by_position(self, position_id: str) -> Iterator[MetatraderDeal]:
+        """Iterates over deals of a position sorted by time and id.
+
+        Args:
+            position_id: Position id.
+
+        Returns:
+            Iterator of deals found.
+        """
+        return self._query('deals', 'positionId = ?', (position_id,), lambda row: row[3] == position_id)
+
+    def get_deals_by_ticket(self, ticket: str) -> Iterator[MetatraderDeal]:
+        """Iterates over deals with a ticket number.
+
+        Args:
+            ticket: Ticket number (deal id for MT5 or transaction id for MT4).
+
+        Returns:
+            Iterator of deals found.
+        """
+        return self._query('deals', 'id = ?', (ticket,), lambda row: row[0] == ticket)
+
+    def get_history_orders_by_time_range(self, start_time: datetime = None, end_time: datetime = None) \
+            -> Iterator[MetatraderOrder]:
+        """Iterates over history orders in a done time range sorted by done time and id. Orders are read from the
+        database while iterating.
+
+        Args:
+            start_time: Time to start iterating from, inclusive. By default iterates from the first order.
+            end_time: Time to stop iterating at, exclusive. By default iterates up to the last order.
+
+        Returns:
+            Iterator of history orders found.
+        """
+        return self._get_records_by_time_range('historyOrders', start_time, end_time)
+
+    def get_history_orders_by_position(self, position_id: str) -> Iterator[MetatraderOrder]:
+        """Iterates over history orders of a position sorted by done time and id.
+
+        Args:
+            position_id: Position id.
+
+        Returns:
+            Iterator of history orders found.
+        """
+        return self._query('historyOrders', 'positionId = ?', (position_id,), lambda row: row[3] == position_id)
+
+    def get_history_orders_by_ticket(self, ticket: str) -> Iterator[MetatraderOrder]:
+        """Iterates over history orders with a ticket number.
+
+        Args:
+            ticket: Ticket number (order id).
+
+        Returns:
+            Iterator of history orders found.
+        """
+        return self._query('historyOrders', 'id = ?', (ticket,), lambda row: row[0] == ticket)
+
+    async def _add_records(self, table: str, records: List[dict]):
+        """Buffers records for insertion, inserting buffered records once the batch is full. A batch of several
+        records received at once is inserted immediately.
+
+        Args:
+            table: Table name.
+            records: Records to add.
+        """
+        rows = [(str(record.get('id', '')), str(record.get('type', '')),
+                 get_record_key(record, TIME_FIELDS[table])[0], record.get('positionId'), stringify(record))
+                for record in records]
+        with self._pendingLock:
+            self._pending[table].extend(rows)
+            pending_count = len(self._pending[table])
+        if pending_count >= self._batchSize or len(records) > 1:
+            await self._run_in_executor(self._flush)
+
+    def _flush(self):
+        """Inserts buffered records into the database, deleting stored records first if the storage was reset. A
+        record replaces a stored record with the same id, type and time. Buffers are taken while the database lock
+        is held, so that batches are inserted in the order they were buffered. Records being inserted remain visible
+        to queries until they are committed."""
+        with self._dbLock:
+            with self._pendingLock:
+                pending = self._pending
+                self._pending = {table: [] for table in TABLES}
+                self._inserting = pending
+                reset_count = self._resetCount
+            if reset_count != self._appliedResetCount:
+                for table in TABLES:
+                    self._db.execute(f'DELETE FROM {table}')
+            elif not any(len(rows) for rows in pending.values()):
+                return
+            for table in TABLES:
+                if len(pending[table]):
+                    self._db.executemany(f'INSERT OR REPLACE INTO {table} (id, type, time, positionId, data) '
+                                         'VALUES (?, ?, ?, ?, ?)', pending[table])
+            self._db.commit()
+            with self._pendingLock:
+                if self._inserting is pending:
+                    self._inserting = {table: [] for table in TABLES}
+                self._appliedResetCount = reset_count
+
+    def _close(self):
+        """Inserts buffered records and closes the database connection used for writes."""
+        self._flush()
+        with self._dbLock:
+            self._db.close()
+
+    async def _run_in_executor(self, func: Callable, *args):
+        """Runs a blocking database function in the history thread pool.
+
+        Args:
+            func: Function to run.
+            args: Function arguments.
+
+        Returns:
+            A coroutine resolving with the function result.
+        """
+        return await asyncio.get_event_loop().run_in_executor(get_executor(), func, *args)
+
+    def _get_last_record_time(self, table: str) -> datetime:
+        """Returns the latest record time using the time index.
+
+        Args:
+            table: Table name.
+
+        Returns:
+            The latest record time or the start of epoch if there are no records with time.
+        """
+        self._flush()
+        with self._dbLock:
+            timestamp = self._db.execute(f'SELECT MAX(time) FROM {table}').fetchone()[0]
+        return datetime.fromtimestamp(timestamp or 0, pytz.UTC)
+
+    def _get_records_by_time_range(self, table: str, start_time: datetime = None, end_time: datetime = None) \
+            -> Iterator[dict]:
+        """Iterates over records in a time range.
+
+        Args:
+            table: Table name.
+            start_time: Time to start iterating from, inclusive.
+            end_time: Time to stop iterating at, exclusive.
+
+        Returns:
+            Iterator of records found.
+        """
+        conditions = []
+        parameters = []
+        if start_time is not None:
+            conditions.append('time >= ?')
+            parameters.append(start_time.timestamp())
+        if end_time is not None:
+            conditions.append('time < ?')
+            parameters.append(end_time.timestamp())
+        start = start_time.timestamp() if start_time is not None else None
+        end = end_time.timestamp() if end_time is not None else None
+        return self._query(table, ' AND '.join(conditions) or '1', tuple(parameters),
+                           lambda row: (start is None or row[2] >= start) and (end is None or row[2] < end))
+
+    def _query(self, table: str, condition: str, parameters: tuple, matches: Callable[[tuple], bool]) \
+            -> Iterator[dict]:
+        """Iterates over records matching a condition sorted by time and id. Stored records are read from the
+        database lazily through the read connection and merged with matching records which are not inserted yet.
+
+        Args:
+            table: Table name.
+            condition: SQL condition.
+            parameters: Condition parameters.
+            matches: Function which checks if a row of a record which is not inserted yet matches the condition.
+
+        Returns:
+            Iterator of records found.
+        """
+        with self._pendingLock:
+            unsaved_rows = self._inserting[table] + self._pending[table]
+            include_stored = self._resetCount == self._appliedResetCount
+        unsaved = {}
+        for row in unsaved_rows:
+            if matches(row):
+                unsaved[(row[0], row[1], row[2])] = row
+        rows = sorted(unsaved.values(), key=lambda row: (row[2], row[0]))
+        if include_stored:
+            cursor = self._readDb.execute(f'SELECT id, type, time, positionId, data FROM {table} WHERE {condition} '
+                                          'ORDER BY time, id', parameters)
+            stored = (row for row in cursor if (row[0], row[1], row[2]) not in unsaved)
+            rows = heapq.merge(stored, rows, key=lambda row: (row[2], row[0]))
+        return (self._decode_record(row[4], TIME_FIELDS[table]) for row in rows)
+
+    def _decode_record(self, data: str, time_field: str) -> dict:
+        """Deserializes a stored record, converting its times to datetime.
+
+        Args:
+            data: Serialized record.
+            time_field: Name of the record time field.
+
+        Returns:
+            History record.
+        """
+        record = json.loads(data)
+        for field in {'time', time_field}:
+            if isinstance(record.get(field), str):
+                record[field] = date(record[field])
+        return record
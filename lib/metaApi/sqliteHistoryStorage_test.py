@@ -0,0 +1,169 @@
+from .sqliteHistoryStorage import SqliteHistoryStorage
+from .models import date
+from datetime import datetime
+import pytest
+import threading
+from mock import MagicMock
+import pytz
+storage = None
+file_path = None
+
+
+@pytest.fixture(autouse=True)
+async def run_around_tests(tmp_path):
+    global storage
+    global file_path
+    file_path = str(tmp_path / 'history.db')
+    storage = SqliteHistoryStorage('accountId', file_path=file_path, batch_size=2)
+    await storage.on_connected()
+    yield
+    await storage.close()
+
+
+class TestSqliteHistoryStorage:
+    @pytest.mark.asyncio
+    async def test_return_start_of_epoch_if_no_history(self):
+        """Should return start of epoch if there is no history."""
+        assert await storage.last_deal_time() == datetime.fromtimestamp(0, pytz.UTC)
+        assert await storage.last_history_order_time() == datetime.fromtimestamp(0, pytz.UTC)
+
+    @pytest.mark.asyncio
+    async def test_return_last_deal_time(self):
+        """Should return last deal time including buffered deals."""
+        await storage.on_deal_added({'id': '1', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'})
+        await storage.on_deal_added({'id': '2', 'time': '2020-01-01T00:00:00.000Z', 'type': 'DEAL_TYPE_SELL'})
+        await storage.on_deal_added({'id': '3', 'time': date('2020-01-03T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'})
+        assert await storage.last_deal_time() == date('2020-01-03T00:00:00.000Z')
+
+    @pytest.mark.asyncio
+    async def test_return_last_history_order_time(self):
+        """Should return last history order time."""
+        await storage.on_history_orders_added([
+            {'id': '1', 'doneTime': date('2020-01-02T00:00:00.000Z'), 'type': 'ORDER_TYPE_BUY'},
+            {'id': '2', 'type': 'ORDER_TYPE_BUY'},
+            {'id': '3', 'doneTime': date('2020-01-01T00:00:00.000Z'), 'type': 'ORDER_TYPE_BUY'}
+        ])
+        assert await storage.last_history_order_time() == date('2020-01-02T00:00:00.000Z')
+
+    @pytest.mark.asyncio
+    async def test_iterate_deals_by_time_range(self):
+        """Should iterate over deals in a time range sorted by time."""
+        await storage.on_deals_added([
+            {'id': '3', 'time': date('2020-01-03T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'},
+            {'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'},
+            {'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'}
+        ])
+        assert list(map(lambda deal: deal['id'], storage.get_deals_by_time_range())) == ['1', '2', '3']
+        assert list(storage.get_deals_by_time_range(date('2020-01-02T00:00:00.000Z'),
+                                                    date('2020-01-03T00:00:00.000Z'))) == \
+            [{'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'}]
+
+    @pytest.mark.asyncio
+    async def test_replace_deals(self):
+        """Should replace deals with the same time, id and type."""
+        await storage.on_deal_added({'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'})
+        await storage.on_deal_added({'id': '1', 'time': '2020-01-01T00:00:00.000Z', 'type': 'DEAL_TYPE_SELL',
+                                     'magic': 1})
+        await storage.on_deal_added({'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_BUY'})
+        deals = list(storage.get_deals_by_ticket('1'))
+        assert len(deals) == 2
+        assert {'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL', 'magic': 1} in deals
+
+    @pytest.mark.asyncio
+    async def test_query_by_position(self):
+        """Should query deals and history orders by position id."""
+        await storage.on_deal_added({'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL',
+                                     'positionId': '10'})
+        await storage.on_deal_added({'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_BUY',
+                                     'positionId': '20'})
+        await storage.on_history_order_added({'id': '3', 'doneTime': date('2020-01-01T00:00:00.000Z'),
+                                              'type': 'ORDER_TYPE_BUY', 'positionId': '20'})
+        assert list(map(lambda deal: deal['id'], storage.get_deals_by_position('20'))) == ['2']
+        assert list(map(lambda order: order['id'], storage.get_history_orders_by_position('20'))) == ['3']
+
+    @pytest.mark.asyncio
+    async def test_return_times_as_datetime(self):
+        """Should return record times as datetime."""
+        await storage.on_deal_added({'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'})
+        await storage.on_history_order_added({'id': '2', 'time': date('2020-01-01T00:00:00.000Z'),
+                                              'doneTime': date('2020-01-02T00:00:00.000Z'), 'type': 'ORDER_TYPE_BUY'})
+        assert isinstance(next(storage.get_deals_by_time_range())['time'], datetime)
+        order = next(storage.get_history_orders_by_ticket('2'))
+        assert isinstance(order['time'], datetime) and order['doneTime'] == date('2020-01-02T00:00:00.000Z')
+
+    @pytest.mark.asyncio
+    async def test_write_database_in_thread_pool(self):
+        """Should insert records and query last time in the history thread pool."""
+        threads = set()
+        flush = storage._flush
+
+        def tracked_flush():
+            threads.add(threading.get_ident())
+            flush()
+
+        storage._flush = tracked_flush
+        await storage.on_deals_added([
+            {'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'},
+            {'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'}
+        ])
+        assert await storage.last_deal_time() == date('2020-01-02T00:00:00.000Z')
+        assert len(threads) and threading.get_ident() not in threads
+
+    @pytest.mark.asyncio
+    async def test_query_buffered_records_without_writing(self):
+        """Should return records which are not inserted yet without writing the database on the event loop."""
+        storage._flush = MagicMock(side_effect=lambda: threads.add(threading.get_ident()))
+        threads = set()
+        await storage.on_deal_added({'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL',
+                                     'positionId': '10'})
+        await storage.on_deal_added({'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'})
+        await storage.on_deal_added({'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL',
+                                     'positionId': '10', 'magic': 1})
+        assert list(map(lambda deal: deal['id'], storage.get_deals_by_time_range())) == ['1', '2']
+        assert list(storage.get_deals_by_position('10')) == \
+            [{'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL', 'positionId': '10',
+              'magic': 1}]
+        assert threading.get_ident() not in threads
+
+    @pytest.mark.asyncio
+    async def test_merge_buffered_and_stored_records(self):
+        """Should merge buffered records with stored records, buffered records replacing stored ones."""
+        await storage.on_deals_added([
+            {'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'},
+            {'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'},
+            {'id': '3', 'time': date('2020-01-03T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'}
+        ])
+        await storage.on_deal_added({'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL',
+                                     'magic': 1})
+        assert len(storage._pending['deals']) == 1
+        deals = list(storage.get_deals_by_time_range())
+        assert list(map(lambda deal: deal['id'], deals)) == ['1', '2', '3']
+        assert deals[1]['magic'] == 1
+
+    @pytest.mark.asyncio
+    async def test_persist_history(self):
+        """Should keep history in the database file."""
+        await storage.on_deal_added({'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'})
+        await storage.on_deal_synchronization_finished('synchronizationId')
+        assert storage.deal_synchronization_finished
+        other_storage = SqliteHistoryStorage('accountId', file_path=file_path)
+        await other_storage.load_data_from_disk()
+        assert await other_storage.last_deal_time() == date('2020-01-01T00:00:00.000Z')
+        await other_storage.close()
+
+    @pytest.mark.asyncio
+    async def test_reset_storage(self):
+        """Should reset storage."""
+        await storage.on_deal_added({'id': '1', 'time': date('2020-01-01T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'})
+        await storage.on_history_order_added({'id': '1', 'doneTime': date('2020-01-01T00:00:00.000Z'),
+                                              'type': 'ORDER_TYPE_SELL'})
+        await storage.update_disk_storage()
+        await storage.on_deal_added({'id': '2', 'time': date('2020-01-02T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'})
+        storage.reset()
+        assert list(storage.get_deals_by_time_range()) == []
+        assert list(storage.get_history_orders_by_time_range()) == []
+        await storage.on_deal_added({'id': '3', 'time': date('2020-01-03T00:00:00.000Z'), 'type': 'DEAL_TYPE_SELL'})
+        assert list(map(lambda deal: deal['id'], storage.get_deals_by_time_range())) == ['3']
+        await storage.update_disk_storage()
+        assert list(map(lambda deal: deal['id'], storage.get_deals_by_time_range())) == ['3']
+        assert await storage.last_history_order_time() == datetime.fromtimestamp(0, pytz.UTC)
@@ -1,18 +1,31 @@
 from ..clients.metaApi.synchronizationListener import SynchronizationListener
 from .models import MetatraderAccountInformation, MetatraderPosition, MetatraderOrder, \
     MetatraderSymbolSpecification, MetatraderSymbolPrice
+from .terminalStateSnapshot import TerminalStateSnapshot
+from .specificationStore import SpecificationStore
 import functools
+from copy import copy
 from typing import List
 import asyncio
+import weakref
 from threading import Timer
 
 
 class TerminalState(SynchronizationListener):
     """Responsible for storing a local copy of remote terminal state."""
 
-    def __init__(self):
-        """Inits the instance of terminal state class"""
+    def __init__(self, server: str = None, specification_store: SpecificationStore = None):
+        """Inits the instance of terminal state class
+
+        Args:
+            server: MetaTrader server which hosts the account, used to share symbol specifications with other accounts
+            hosted on the same server.
+            specification_store: Store to share symbol specifications in. Specifications are not shared if the store
+            or the server is not specified.
+        """
         super().__init__()
+        self._server = server
+        self._specificationStore = specification_store if server else None
         self._connected = False
         self._connectedToBroker = False
         self._accountInformation = None
@@ -21,6 +34,20 @@ class TerminalState(SynchronizationListener):
         self._specifications = []
         self._specificationsBySymbol = {}
         self._pricesBySymbol = {}
+        self._version = 0
+        self._snapshots = weakref.WeakSet()
+        self._sharedFields = set()
+        self._ownedItems = set()
+
+    @property
+    def version(self) -> int:
+        """Returns terminal state version which is incremented on every state change. Can be used to cheaply detect
+        changes without copying the state.
+
+        Returns:
+            Terminal state version.
+        """
+        return self._version
 
     @property
     def connected(self) -> bool:
@@ -98,14 +125,36 @@ class TerminalState(SynchronizationListener):
         """
         return self._pricesBySymbol[symbol] if (symbol in self._pricesBySymbol) else None
 
+    def snapshot(self) -> TerminalStateSnapshot:
+        """Returns an immutable consistent view of the terminal state. Taking a snapshot does not copy the state,
+        the snapshot shares containers with the terminal state which copies a container on first modification after
+        the snapshot was taken. Snapshot is reused while the state version does not change.
+
+        Returns:
+            Terminal state snapshot.
+        """
+        for snapshot in self._snapshots:
+            if snapshot.version == self._version:
+                return snapshot
+        snapshot = TerminalStateSnapshot(self._version, self._connected, self._connectedToBroker,
+                                         self._accountInformation, self._positions, self._orders,
+                                         self._specifications, self._specificationsBySymbol, self._pricesBySymbol)
+        self._snapshots.add(snapshot)
+        self._sharedFields = {'_accountInformation', '_positions', '_orders', '_specifications',
+                              '_specificationsBySymbol', '_pricesBySymbol'}
+        self._ownedItems = set()
+        return snapshot
+
     async def on_connected(self):
         """Invoked when connection to MetaTrader terminal established."""
         self._connected = True
+        self._version += 1
 
     async def on_disconnected(self):
         """Invoked when connection to MetaTrader terminal terminated."""
         self._connected = False
         self._connectedToBroker = False
+        self._version += 1
 
     async def on_broker_connection_status_changed(self, connected: bool):
         """Invoked when broker connection status have changed.
@@ -116,6 +165,7 @@ class TerminalState(SynchronizationListener):
         def disconnect():
             asyncio.run(self.on_disconnected())
         self._connectedToBroker = connected
+        self._version += 1
         if hasattr(self, '_status_timer'):
             self._status_timer.cancel()
         self._status_timer = Timer(60, disconnect)
@@ -127,12 +177,15 @@ class TerminalState(SynchronizationListener):
         Returns:
             A coroutine which resolves when the asynchronous event is processed.
         """
+        self._release_specifications()
         self._accountInformation = None
         self._positions = []
         self._orders = []
         self._specifications = []
         self._specificationsBySymbol = {}
         self._pricesBySymbol = {}
+        self._sharedFields = set()
+        self._version += 1
 
     async def on_account_information_updated(self, account_information: MetatraderAccountInformation):
         """Invoked when MetaTrader account information is updated.
@@ -141,6 +194,8 @@ class TerminalState(SynchronizationListener):
             account_information: Updated MetaTrader account information.
         """
         self._accountInformation = account_information
+        self._sharedFields.discard('_accountInformation')
+        self._version += 1
 
     async def on_positions_replaced(self, positions: List[MetatraderPosition]):
         """Invoked when the positions are replaced as a result of initial terminal state synchronization.
@@ -152,6 +207,8 @@ class TerminalState(SynchronizationListener):
             A coroutine which resolves when the asynchronous event is processed.
         """
         self._positions = positions
+        self._sharedFields.discard('_positions')
+        self._version += 1
 
     async def on_position_updated(self, position: MetatraderPosition):
         """Invoked when MetaTrader position is updated.
@@ -159,12 +216,14 @@ class TerminalState(SynchronizationListener):
         Args:
             position: Updated MetaTrader position.
         """
+        self._detach('_positions')
         for i in range(len(self._positions)):
             if self._positions[i]['id'] == position['id']:
                 self._positions[i] = position
                 break
         else:
             self._positions.append(position)
+        self._version += 1
 
     async def on_position_removed(self, position_id: str):
         """Invoked when MetaTrader position is removed.
@@ -173,6 +232,8 @@ class TerminalState(SynchronizationListener):
             position_id: Removed MetaTrader position id.
         """
         self._positions = list(filter(lambda position: position['id'] != position_id, self._positions))
+        self._sharedFields.discard('_positions')
+        self._version += 1
 
     async def on_orders_replaced(self, orders: List[MetatraderOrder]):
         """Invoked when the orders are replaced as a result of initial terminal state synchronization.
@@ -184,6 +245,8 @@ class TerminalState(SynchronizationListener):
             A coroutine which resolves when the asynchronous event is processed.
         """
         self._orders = orders
+        self._sharedFields.discard('_orders')
+        self._version += 1
 
     async def on_order_updated(self, order: MetatraderOrder):
         """Invoked when MetaTrader order is updated
@@ -191,12 +254,14 @@ class TerminalState(SynchronizationListener):
         Args:
             order: Updated MetaTrader order.
         """
+        self._detach('_orders')
         for i in range(len(self._orders)):
             if self._orders[i]['id'] == order['id']:
                 self._orders[i] = order
                 break
         else:
             self._orders.append(order)
+        self._version += 1
 
     async def on_order_completed(self, order_id: str):
         """Invoked when MetaTrader order is completed (executed or canceled).
@@ -205,6 +270,8 @@ class TerminalState(SynchronizationListener):
             order_id: Completed MetaTrader order id.
         """
         self._orders = list(filter(lambda order: order['id'] != order_id, self._orders))
+        self._sharedFields.discard('_orders')
+        self._version += 1
 
     async def on_symbol_specification_updated(self, specification: MetatraderSymbolSpecification):
         """Invoked when a symbol specification was updated.
@@ -212,13 +279,19 @@ class TerminalState(SynchronizationListener):
         Args:
             specification: Updated MetaTrader symbol specification.
         """
+        if self._specificationStore is not None:
+            specification = self._specificationStore.acquire(self._server, specification)
+        self._detach('_specifications', '_specificationsBySymbol')
         for i in range(len(self._specifications)):
             if self._specifications[i]['symbol'] == specification['symbol']:
+                if self._specificationStore is not None:
+                    self._specificationStore.release(self._server, self._specifications[i])
                 self._specifications[i] = specification
                 break
         else:
             self._specifications.append(specification)
         self._specificationsBySymbol[specification['symbol']] = specification
+        self._version += 1
 
     async def on_symbol_price_updated(self, price: MetatraderSymbolPrice):
         """Invoked when a symbol price was updated.
@@ -226,12 +299,15 @@ class TerminalState(SynchronizationListener):
         Args:
             price: Updated MetaTrader symbol price.
         """
+        self._detach('_pricesBySymbol')
         self._pricesBySymbol[price['symbol']] = price
-        positions = list(filter(lambda p: p['symbol'] == price['symbol'], self._positions))
-        orders = list(filter(lambda o: o['symbol'] == price['symbol'], self._orders))
         specification = self.specification(price['symbol'])
         if specification:
-            for position in positions:
+            self._detach('_positions', '_orders')
+            for i in range(len(self._positions)):
+                if self._positions[i]['symbol'] != price['symbol']:
+                    continue
+                position = self._detach_item(self._positions, i)
                 if 'unrealizedProfit' not in position or 'realizedProfit' not in position:
                     position['unrealizedProfit'] = (1 if (position['type'] == 'POSITION_TYPE_BUY') else -1) * \
                                                    (position['currentPrice'] - position['openPrice']) * \
@@ -248,10 +324,56 @@ class TerminalState(SynchronizationListener):
                 position['profit'] = position['unrealizedProfit'] + position['realizedProfit']
                 position['currentPrice'] = new_position_price
                 position['currentTickValue'] = current_tick_value
-            for order in orders:
+            for i in range(len(self._orders)):
+                if self._orders[i]['symbol'] != price['symbol']:
+                    continue
+                order = self._detach_item(self._orders, i)
                 order['currentPrice'] = price['ask'] if (order['type'] == 'ORDER_TYPE_BUY_LIMIT' or
                                                          order['type'] == 'ORDER_TYPE_BUY_STOP' or
                                                          order['type'] == 'ORDER_TYPE_BUY_STOP_LIMIT') else price['bid']
             if self._accountInformation:
+                self._detach('_accountInformation')
                 self._accountInformation['equity'] = self._accountInformation['balance'] + \
-                                                     functools.reduce(lambda a, b: a + b['profit'], self._positions, 0)
+                    functools.reduce(lambda a, b: a + b['profit'], self._positions, 0)
+        self._version += 1
+
+    def close(self):
+        """Releases symbol specifications shared with other terminal states. The instance of the class should no
+        longer be used after this method is invoked."""
+        self._release_specifications()
+        self._specifications = []
+        self._specificationsBySymbol = {}
+
+    def _release_specifications(self):
+        if self._specificationStore is not None:
+            for specification in self._specifications:
+                self._specificationStore.release(self._server, specification)
+
+    def _detach(self, *fields: str):
+        """Copies containers shared with live snapshots so that they can be modified.
+
+        Args:
+            fields: Names of the container attributes to be modified.
+        """
+        for field in fields:
+            if field in self._sharedFields:
+                self._sharedFields.discard(field)
+                if len(self._snapshots):
+                    setattr(self, field, copy(getattr(self, field)))
+
+    def _detach_item(self, items: List[dict], index: int) -> dict:
+        """Copies a list item shared with live snapshots so that it can be modified. The list must be detached.
+
+        Args:
+            items: Detached list containing the item.
+            index: Item index.
+
+        Returns:
+            Item which can be modified.
+        """
+        item = items[index]
+        if id(item) not in self._ownedItems and len(self._snapshots):
+            item = dict(item)
+            items[index] = item
+            self._ownedItems.add(id(item))
+        return item
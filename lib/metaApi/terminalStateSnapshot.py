@@ -0,0 +1,132 @@
+from .models import MetatraderAccountInformation, MetatraderPosition, MetatraderOrder, \
+    MetatraderSymbolSpecification, MetatraderSymbolPrice
+from types import MappingProxyType
+from typing import List, Tuple, Dict, Optional
+
+
+class TerminalStateSnapshot:
+    """Immutable point-in-time view of a terminal state. Snapshots share containers with the terminal state they
+    were taken from, the terminal state copies a container before modifying it while a snapshot is alive."""
+
+    def __init__(self, version: int, connected: bool, connected_to_broker: bool,
+                 account_information: Optional[MetatraderAccountInformation], positions: List[MetatraderPosition],
+                 orders: List[MetatraderOrder], specifications: List[MetatraderSymbolSpecification],
+                 specifications_by_symbol: Dict[str, MetatraderSymbolSpecification],
+                 prices_by_symbol: Dict[str, MetatraderSymbolPrice]):
+        """Inits the terminal state snapshot instance.
+
+        Args:
+            version: Terminal state version the snapshot was taken at.
+            connected: Whether MetaApi has connected to MetaTrader terminal.
+            connected_to_broker: Whether MetaTrader terminal is connected to broker.
+            account_information: Account information.
+            positions: Positions opened.
+            orders: Orders opened.
+            specifications: Symbol specifications.
+            specifications_by_symbol: Symbol specifications indexed by symbol.
+            prices_by_symbol: Symbol prices indexed by symbol.
+        """
+        self._version = version
+        self._connected = connected
+        self._connectedToBroker = connected_to_broker
+        self._accountInformation = account_information
+        self._positions = positions
+        self._orders = orders
+        self._specifications = specifications
+        self._specificationsBySymbol = specifications_by_symbol
+        self._pricesBySymbol = prices_by_symbol
+        self._positionsView = None
+        self._ordersView = None
+        self._specificationsView = None
+
+    @property
+    def version(self) -> int:
+        """Returns terminal state version the snapshot was taken at.
+
+        Returns:
+            Terminal state version.
+        """
+        return self._version
+
+    @property
+    def connected(self) -> bool:
+        """Returns true if MetaApi was connected to MetaTrader terminal.
+
+        Returns:
+            Whether MetaApi was connected to MetaTrader terminal.
+        """
+        return self._connected
+
+    @property
+    def connected_to_broker(self) -> bool:
+        """Returns true if MetaTrader terminal was connected to broker.
+
+        Returns:
+            Whether MetaTrader terminal was connected to broker.
+        """
+        return self._connectedToBroker
+
+    @property
+    def account_information(self) -> Optional[MetatraderAccountInformation]:
+        """Returns a read-only view of account information.
+
+        Returns:
+            Read-only view of account information.
+        """
+        return MappingProxyType(self._accountInformation) if self._accountInformation is not None else None
+
+    @property
+    def positions(self) -> Tuple[MetatraderPosition]:
+        """Returns read-only views of MetaTrader positions opened.
+
+        Returns:
+            Read-only views of MetaTrader positions opened.
+        """
+        if self._positionsView is None:
+            self._positionsView = tuple(map(MappingProxyType, self._positions))
+        return self._positionsView
+
+    @property
+    def orders(self) -> Tuple[MetatraderOrder]:
+        """Returns read-only views of MetaTrader orders opened.
+
+        Returns:
+            Read-only views of MetaTrader orders opened.
+        """
+        if self._ordersView is None:
+            self._ordersView = tuple(map(MappingProxyType, self._orders))
+        return self._ordersView
+
+    @property
+    def specifications(self) -> Tuple[MetatraderSymbolSpecification]:
+        """Returns read-only views of symbol specifications.
+
+        Returns:
+            Read-only views of symbol specifications.
+        """
+        if self._specificationsView is None:
+            self._specificationsView = tuple(map(MappingProxyType, self._specifications))
+        return self._specificationsView
+
+    def specification(self, symbol: str) -> Optional[MetatraderSymbolSpecification]:
+        """Returns a read-only view of MetaTrader symbol specification by symbol.
+
+        Args:
+            symbol: Symbol (e.g. currency pair or an index).
+
+        Returns:
+            MetatraderSymbolSpecification found or None if specification for a symbol is not found.
+        """
+        return MappingProxyType(self._specificationsBySymbol[symbol]) if (symbol in self._specificationsBySymbol) \
+            else None
+
+    def price(self, symbol: str) -> Optional[MetatraderSymbolPrice]:
+        """Returns a read-only view of MetaTrader symbol price by symbol.
+
+        Args:
+            symbol: Symbol (e.g. currency pair or an index).
+
+        Returns:
+            MetatraderSymbolPrice found or None if price for a symbol is not found.
+        """
+        return MappingProxyType(self._pricesBySymbol[symbol]) if (symbol in self._pricesBySymbol) else None
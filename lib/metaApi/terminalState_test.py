@@ -160,3 +160,72 @@ class TestTerminalState:
           'ask': 11
         })
         assert list(map(lambda o: o['currentPrice'], state.orders)) == [11, 9]
+
+    @pytest.mark.asyncio
+    async def test_increment_version_on_change(self):
+        """Should increment version on state change."""
+        version = state.version
+        await state.on_position_updated({'id': '1', 'symbol': 'EURUSD'})
+        assert state.version > version
+        version = state.version
+        await state.on_symbol_price_updated({'symbol': 'EURUSD', 'bid': 1, 'ask': 1.1})
+        assert state.version > version
+
+    @pytest.mark.asyncio
+    async def test_reuse_snapshot_if_state_not_changed(self):
+        """Should return the same snapshot while state is not changed."""
+        await state.on_position_updated({'id': '1', 'symbol': 'EURUSD'})
+        snapshot = state.snapshot()
+        assert state.snapshot() is snapshot
+        assert snapshot.version == state.version
+        await state.on_position_updated({'id': '2', 'symbol': 'EURUSD'})
+        assert state.snapshot() is not snapshot
+
+    @pytest.mark.asyncio
+    async def test_not_change_snapshot_on_state_update(self):
+        """Should not change snapshot contents when terminal state is updated."""
+        await state.on_account_information_updated({'equity': 900, 'balance': 800})
+        await state.on_position_updated({
+            'id': '1',
+            'symbol': 'EURUSD',
+            'type': 'POSITION_TYPE_BUY',
+            'currentPrice': 9,
+            'currentTickValue': 0.5,
+            'openPrice': 8,
+            'profit': 100,
+            'volume': 2
+        })
+        await state.on_order_updated({'id': '1', 'symbol': 'EURUSD', 'type': 'ORDER_TYPE_BUY_LIMIT',
+                                      'currentPrice': 9})
+        await state.on_symbol_specification_updated({'symbol': 'EURUSD', 'tickSize': 0.01})
+        snapshot = state.snapshot()
+        await state.on_symbol_price_updated({
+            'symbol': 'EURUSD',
+            'profitTickValue': 0.5,
+            'lossTickValue': 0.5,
+            'bid': 10,
+            'ask': 11
+        })
+        await state.on_position_updated({'id': '2', 'symbol': 'AUDUSD'})
+        await state.on_symbol_specification_updated({'symbol': 'AUDUSD', 'tickSize': 0.01})
+        assert state.positions[0]['profit'] == 200
+        assert state.orders[0]['currentPrice'] == 11
+        assert state.account_information['equity'] == 1000
+        assert len(state.positions) == 2
+        assert list(map(lambda p: p['profit'], snapshot.positions)) == [100]
+        assert snapshot.orders[0]['currentPrice'] == 9
+        assert snapshot.account_information['equity'] == 900
+        assert len(snapshot.specifications) == 1
+        assert snapshot.specification('AUDUSD') is None
+        assert snapshot.price('EURUSD') is None
+        assert state.snapshot().price('EURUSD')['bid'] == 10
+
+    @pytest.mark.asyncio
+    async def test_return_read_only_snapshot(self):
+        """Should return read-only snapshot views."""
+        await state.on_position_updated({'id': '1', 'symbol': 'EURUSD'})
+        snapshot = state.snapshot()
+        with pytest.raises(TypeError):
+            snapshot.positions[0]['symbol'] = 'GBPUSD'
+        with pytest.raises(AttributeError):
+            snapshot.positions.append({'id': '2'})
@@ -0,0 +1,100 @@
+from ..clients.metaApi.synchronizationListener import SynchronizationListener
+from .models import MetatraderSymbolPrice, date
+from .ringBuffer import RingBuffer
+from ..clients.errorHandler import ValidationException
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class TickBuffer(RingBuffer):
+    """Fixed-capacity ring buffer of symbol ticks. Stores tick time as a POSIX timestamp in seconds, bid, ask,
+    profitTickValue and lossTickValue fields."""
+
+    FIELDS = ('time', 'bid', 'ask', 'profitTickValue', 'lossTickValue')
+    """Names of the tick fields stored."""
+
+    def __init__(self, capacity: int):
+        """Inits the tick buffer instance.
+
+        Args:
+            capacity: Maximum number of ticks to keep.
+        """
+        super().__init__(self.FIELDS, capacity)
+
+    def append(self, time: float, bid: float, ask: float, profit_tick_value: float, loss_tick_value: float):
+        """Appends a tick to the buffer, overwriting the oldest tick if the buffer is full.
+
+        Args:
+            time: Tick time as a POSIX timestamp in seconds.
+            bid: Bid price.
+            ask: Ask price.
+            profit_tick_value: Tick value for a profitable position.
+            loss_tick_value: Tick value for a loosing position.
+        """
+        super().append(time, bid, ask, profit_tick_value, loss_tick_value)
+
+
+class TickStore(SynchronizationListener):
+    """Keeps recent ticks of symbols in fixed-capacity ring buffers, so that memory used is bounded per symbol."""
+
+    def __init__(self, capacity: int = 1000, symbols: List[str] = None):
+        """Inits the tick store instance.
+
+        Args:
+            capacity: Maximum number of ticks to keep per symbol, default is 1000.
+            symbols: Optional list of symbols to keep ticks for, by default ticks of all symbols are kept.
+        """
+        super().__init__()
+        if capacity < 1:
+            raise ValidationException('Tick store capacity must be a positive number')
+        self._capacity = capacity
+        self._symbols = set(symbols) if symbols else None
+        self._buffers: Dict[str, TickBuffer] = {}
+
+    @property
+    def capacity(self) -> int:
+        """Returns maximum number of ticks kept per symbol.
+
+        Returns:
+            Maximum number of ticks kept per symbol.
+        """
+        return self._capacity
+
+    @property
+    def symbols(self) -> List[str]:
+        """Returns symbols which have ticks stored.
+
+        Returns:
+            Symbols which have ticks stored.
+        """
+        return list(self._buffers.keys())
+
+    def buffer(self, symbol: str) -> Optional[TickBuffer]:
+        """Returns tick buffer of a symbol.
+
+        Args:
+            symbol: Symbol (e.g. currency pair or an index).
+
+        Returns:
+            Tick buffer found or None if no ticks of the symbol were received.
+        """
+        return self._buffers[symbol] if (symbol in self._buffers) else None
+
+    async def on_symbol_price_updated(self, price: MetatraderSymbolPrice):
+        """Invoked when a symbol price was updated.
+
+        Args:
+            price: Updated MetaTrader symbol price.
+        """
+        symbol = price['symbol']
+        if self._symbols is not None and symbol not in self._symbols:
+            return
+        buffer = self._buffers.get(symbol)
+        if buffer is None:
+            buffer = TickBuffer(self._capacity)
+            self._buffers[symbol] = buffer
+        time = price['time'] if 'time' in price else datetime.now()
+        if isinstance(time, str):
+            time = date(time)
+        buffer.append(time.timestamp(), price.get('bid', 0), price.get('ask', 0), price.get('profitTickValue', 0),
+                      price.get('lossTickValue', 0))
@@ -0,0 +1,69 @@
+from .tickStore import TickStore, TickBuffer
+from .models import date
+from datetime import datetime
+import pytest
+store = None
+
+
+@pytest.fixture(autouse=True)
+def run_around_tests():
+    global store
+    store = TickStore(3)
+    yield
+
+
+class TestTickStore:
+
+    @pytest.mark.asyncio
+    async def test_store_ticks(self):
+        """Should store ticks of symbols."""
+        assert store.buffer('EURUSD') is None
+        await store.on_symbol_price_updated({'symbol': 'EURUSD', 'bid': 1, 'ask': 1.1, 'profitTickValue': 0.5,
+                                             'lossTickValue': 0.6, 'time': date('2020-04-15T02:45:06.521Z')})
+        await store.on_symbol_price_updated({'symbol': 'GBPUSD', 'bid': 2, 'ask': 2.1,
+                                             'time': date('2020-04-15T02:45:07.521Z')})
+        assert store.symbols == ['EURUSD', 'GBPUSD']
+        assert len(store.buffer('EURUSD')) == 1
+        assert store.buffer('EURUSD').last() == {
+            'time': date('2020-04-15T02:45:06.521Z').timestamp(), 'bid': 1, 'ask': 1.1, 'profitTickValue': 0.5,
+            'lossTickValue': 0.6}
+
+    @pytest.mark.asyncio
+    async def test_keep_ticks_within_capacity(self):
+        """Should keep only the most recent ticks within capacity."""
+        for i in range(5):
+            await store.on_symbol_price_updated({'symbol': 'EURUSD', 'bid': i, 'ask': i + 0.5,
+                                                 'time': datetime.fromtimestamp(i)})
+        buffer = store.buffer('EURUSD')
+        assert len(buffer) == 3
+        window = buffer.window()
+        assert window['bid'].tolist() == [2, 3, 4]
+        assert window['ask'].tolist() == [2.5, 3.5, 4.5]
+        assert buffer.window(2)['time'].tolist() == [3, 4]
+        assert buffer.window(10)['bid'].tolist() == [2, 3, 4]
+        assert buffer.window(0)['bid'].tolist() == []
+
+    @pytest.mark.asyncio
+    async def test_keep_ticks_of_selected_symbols(self):
+        """Should keep ticks of selected symbols only."""
+        store = TickStore(3, ['EURUSD'])
+        await store.on_symbol_price_updated({'symbol': 'EURUSD', 'bid': 1, 'ask': 1.1})
+        await store.on_symbol_price_updated({'symbol': 'GBPUSD', 'bid': 2, 'ask': 2.1})
+        assert store.symbols == ['EURUSD']
+
+    def test_return_numpy_views(self):
+        """Should return zero-copy numpy views of ticks."""
+        numpy = pytest.importorskip('numpy')
+        buffer = TickBuffer(4)
+        for i in range(6):
+            buffer.append(i, i, i + 1, 1, 1)
+        arrays = buffer.numpy_window(3)
+        assert arrays['bid'].tolist() == [3, 4, 5]
+        assert not arrays['bid'].flags.writeable
+        assert isinstance(arrays['ask'], numpy.ndarray)
+        assert numpy.shares_memory(arrays['bid'], buffer.numpy_window()['bid'])
+
+    def test_not_create_empty_buffer(self):
+        """Should not create a buffer with non-positive capacity."""
+        with pytest.raises(Exception):
+            TickBuffer(0)